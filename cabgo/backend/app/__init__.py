@@ -3,9 +3,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate # Import Migrate
 from flask_cors import CORS
 from config import config_by_name # Updated import
+from .db_routing import RoutingSession
 import os
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Reads may go to a 'replica' bind, see db_routing
 migrate = Migrate() # Initialize Migrate instance
 
 def create_app(config_name=None, config_class=None): # Modified signature
@@ -24,6 +25,42 @@ def create_app(config_name=None, config_class=None): # Modified signature
     db.init_app(app)
     migrate.init_app(app, db) # Initialize Migrate with app and db
 
+    from . import sqlite_pragmas
+    sqlite_pragmas.init_app(app) # WAL etc. on SQLite connections, per SQLITE_PRAGMAS
+
+    from .query_stats import query_stats
+    query_stats.init_app(app) # Query count/time per request; X-DB-* headers in debug
+
+    from .db_routing import recent_writers
+    recent_writers.init_app(app)
+
+    from .user_cache import user_cache
+    user_cache.init_app(app)
+
+    from .hashing import password_hasher
+    password_hasher.init_app(app) # Worker processes start on first use
+
+    from .tokens import token_revocations
+    token_revocations.init_app(app)
+
+    from .geo_index import driver_index
+    driver_index.init_app(app) # Loaded lazily from the DB on first lookup
+
+    from .location_buffer import location_buffer
+    location_buffer.init_app(app) # Flushes on an interval and at shutdown
+
+    from .location_cache import location_interner
+    location_interner.init_app(app)
+
+    from .surge import surge_engine
+    surge_engine.init_app(app)
+
+    from .routing import eta_engine
+    eta_engine.init_app(app) # Falls back to straight-line ETAs when ROAD_GRAPH_PATH is unset
+
+    from .speed_profiles import speed_profiles
+    speed_profiles.init_app(app) # Loads the persisted table if present
+
     # Import models here so Flask-Migrate can detect them
     from .models import User, Location, Ride, DriverProfile, Vehicle
 
@@ -43,6 +80,18 @@ def create_app(config_name=None, config_class=None): # Modified signature
     from .admin import admin_bp
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
+    from .platform_stats import platform_counters
+    platform_counters.init_app(app)
+
+    from .rollups import ride_rollups
+    ride_rollups.init_app(app)
+
+    from .dispatch import dispatch_engine
+    dispatch_engine.init_app(app)
+
+    from .metrics import metrics
+    metrics.init_app(app) # Serves /metrics
+
     # from .main import main_bp # Example for other general routes
     # app.register_blueprint(main_bp, url_prefix='/api')
 
@@ -1,42 +1,40 @@
 from flask import Blueprint, jsonify, current_app
 from flask import request # Import request
+from sqlalchemy import func
 import datetime # Import datetime for setting cancelled_at
 from datetime import timezone # Import timezone for UTC
-from .models import User, DriverProfile, Ride, Location, Vehicle
+from .models import User, DriverProfile, Ride, Vehicle
 from . import db # Import db for session management
 from .decorators import admin_required
+from .db_routing import read_replica
+from .geo_index import driver_index
+from .drivers import availability_committed, release_driver
+from .tokens import token_revocations
+from .platform_stats import build_stats, bucket_name, platform_counters
+from .rollups import DIMENSIONS, query_timeseries, stream_watermarks
+from .pagination import decode_cursor, parse_limit, paginate, before_cursor
+from .utils import parse_iso_datetime
+from .exports import export_response
+from .serializers import (
+    USER_WITH_PROFILE, USER_DETAIL, VEHICLE_SUMMARY, DRIVER_EXPORT, ADMIN_RIDE, ADMIN_RIDE_DETAIL,
+    json_response, passenger_user, driver_user, pickup_location, dropoff_location
+)
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
+@read_replica
 def list_users(current_admin_user):
-    """Lists all users in the system. Accessible only by admins."""
+    """Lists all users in the system. Accessible only by admins. GET /export/users streams the same data."""
     try:
-        users = User.query.all()
-        users_data = []
-        for user in users:
-            user_info = {
-                'id': user.id,
-                'email': user.email,
-                'full_name': user.full_name,
-                'phone_number': user.phone_number,
-                'is_driver': user.is_driver,
-                'is_admin': user.is_admin,
-                'created_at': user.created_at.isoformat() if user.created_at else None,
-                'updated_at': user.updated_at.isoformat() if user.updated_at else None
-            }
-            # Add driver profile info if user is a driver
-            if user.is_driver and hasattr(user, 'driver_profile') and user.driver_profile:
-                user_info['driver_profile'] = {
-                    'id': user.driver_profile.id,
-                    'license_number': user.driver_profile.license_number,
-                    'is_verified': user.driver_profile.is_verified,
-                    'availability_status': user.driver_profile.availability_status
-                }
-            users_data.append(user_info)
-        
-        return jsonify({'users': users_data}), 200
+        # driver_profile is included for drivers only (see serializers.USER_WITH_PROFILE)
+        users = USER_WITH_PROFILE.dump_all(
+            db.session.query(*USER_WITH_PROFILE.columns)
+            .outerjoin(DriverProfile, DriverProfile.user_id == User.id)
+            .order_by(User.id)
+        )
+        return json_response({'users': users})
 
     except Exception as e:
         current_app.logger.error(f"Error listing users (admin): {e}")
@@ -67,13 +65,18 @@ def verify_driver_profile(current_admin_user, driver_profile_id):
         
         # If verifying, ensure the associated User's is_driver flag is True
         # (It should have been set during driver registration, but this is a safeguard)
+        role_changed = False
         if driver_profile.is_verified and driver_profile.user:
             if not driver_profile.user.is_driver:
                 driver_profile.user.is_driver = True
                 db.session.add(driver_profile.user) # Add user to session if modified
+                role_changed = True
 
         db.session.add(driver_profile)
+        if role_changed:
+            token_revocations.revoke_user(driver_profile.user_id) # Access tokens carry a stale is_driver claim
         db.session.commit()
+        driver_index.sync_profile(driver_profile)
 
         profile_data = {
             'id': driver_profile.id,
@@ -93,47 +96,24 @@ def verify_driver_profile(current_admin_user, driver_profile_id):
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
 @admin_required
+@read_replica
 def get_user_details(current_admin_user, user_id):
     """Gets detailed information for a specific user. Accessible only by admins."""
     try:
-        user = db.session.get(User, user_id)
-        if not user:
+        row = db.session.query(*USER_DETAIL.columns)\
+            .outerjoin(DriverProfile, DriverProfile.user_id == User.id)\
+            .filter(User.id == user_id).first()
+        if not row:
             return jsonify({'message': 'User not found.'}), 404
 
-        user_info = {
-            'id': user.id,
-            'email': user.email,
-            'full_name': user.full_name,
-            'phone_number': user.phone_number,
-            'is_driver': user.is_driver,
-            'is_admin': user.is_admin,
-            'created_at': user.created_at.isoformat() if user.created_at else None,
-            'updated_at': user.updated_at.isoformat() if user.updated_at else None
-        }
-        if user.is_driver and hasattr(user, 'driver_profile') and user.driver_profile:
-            user_info['driver_profile'] = {
-                'id': user.driver_profile.id,
-                'license_number': user.driver_profile.license_number,
-                'is_verified': user.driver_profile.is_verified,
-                'availability_status': user.driver_profile.availability_status,
-                'license_expiry_date': user.driver_profile.license_expiry_date.isoformat() if user.driver_profile.license_expiry_date else None,
-                'verification_notes': user.driver_profile.verification_notes
-            }
-        
+        user_info = USER_DETAIL.dump(row)
         # Include vehicles if the user is a driver
-        if user.is_driver and hasattr(user, 'vehicles'):
-            user_info['vehicles'] = [
-                {
-                    'id': v.id,
-                    'make': v.make,
-                    'model': v.model,
-                    'license_plate': v.license_plate,
-                    'vehicle_type': v.vehicle_type,
-                    'is_active': v.is_active
-                } for v in user.vehicles
-            ]
-
-        return jsonify({'user': user_info}), 200
+        if user_info['is_driver']:
+            user_info['vehicles'] = VEHICLE_SUMMARY.dump_all(
+                db.session.query(*VEHICLE_SUMMARY.columns).filter(Vehicle.driver_id == user_id).order_by(Vehicle.id)
+            )
+
+        return json_response({'user': user_info})
     except Exception as e:
         current_app.logger.error(f"Error fetching user {user_id} (admin): {e}")
         return jsonify({'message': 'Failed to fetch user details due to an internal error'}), 500
@@ -177,6 +157,8 @@ def update_user_details(current_admin_user, user_id):
             user_to_update.is_admin = data['is_admin']
 
         db.session.add(user_to_update)
+        if 'is_driver' in data or 'is_admin' in data:
+            token_revocations.revoke_user(user_to_update.id) # Outstanding access tokens carry the old role claims
         db.session.commit()
 
         # Return updated user details (similar to get_user_details)
@@ -212,6 +194,8 @@ def delete_user(current_admin_user, user_id):
             if admin_count <= 1:
                 return jsonify({'message': 'Cannot delete the last admin account.'}), 403
 
+        deleted_profile_id = None
+
         # Check for rides as a passenger
         passenger_rides_count = Ride.query.filter_by(passenger_id=user_to_delete.id).count()
         if passenger_rides_count > 0:
@@ -227,15 +211,24 @@ def delete_user(current_admin_user, user_id):
                 # For simplicity, just nullifying driver_id for now.
                 db.session.add(ride)
 
-            # Delete Vehicles associated with the user
-            Vehicle.query.filter_by(driver_id=user_to_delete.id).delete()
+            # Delete Vehicles associated with the user. The bulk delete skips ORM events, so adjust the counters here
+            vehicles = Vehicle.query.filter_by(driver_id=user_to_delete.id)
+            platform_counters.adjust(db.session, {
+                bucket_name(Vehicle, is_active): -count
+                for is_active, count in vehicles.with_entities(Vehicle.is_active, func.count()).group_by(Vehicle.is_active)
+            })
+            vehicles.delete()
             
             # Delete DriverProfile
             if user_to_delete.driver_profile:
+                deleted_profile_id = user_to_delete.driver_profile.id
                 db.session.delete(user_to_delete.driver_profile)
         
         db.session.delete(user_to_delete)
+        token_revocations.revoke_user(user_to_delete.id)
         db.session.commit()
+        if deleted_profile_id is not None:
+            driver_index.remove(deleted_profile_id)
 
         return jsonify({'message': f'User {user_to_delete.email} and associated driver data deleted successfully.'}), 200
 
@@ -245,58 +238,73 @@ def delete_user(current_admin_user, user_id):
         return jsonify({'message': 'Failed to delete user due to an internal error.'}), 500
 
 
+def _join_ride_parties(query):
+    """Outer-joins the passenger, driver and both locations under the aliases the ride shapes read."""
+    return query.outerjoin(passenger_user, Ride.passenger_id == passenger_user.id)\
+        .outerjoin(driver_user, Ride.driver_id == driver_user.id)\
+        .outerjoin(pickup_location, Ride.pickup_location_id == pickup_location.id)\
+        .outerjoin(dropoff_location, Ride.dropoff_location_id == dropoff_location.id)
+
+def build_admin_rides_query(status=None, date_from=None, date_to=None, driver_id=None, cursor=None):
+    """One joined, column-projected query (serializers.ADMIN_RIDE) for the admin ride listing, newest first."""
+    query = _join_ride_parties(db.session.query(*ADMIN_RIDE.columns))
+
+    if status:
+        query = query.filter(Ride.status == status)
+    if driver_id is not None:
+        query = query.filter(Ride.driver_id == driver_id)
+    if date_from is not None:
+        query = query.filter(Ride.requested_at >= date_from)
+    if date_to is not None:
+        query = query.filter(Ride.requested_at < date_to)
+    if cursor is not None:
+        query = query.filter(before_cursor(Ride.requested_at, Ride.id, cursor))
+    return query.order_by(Ride.requested_at.desc(), Ride.id.desc())
+
+def _ride_filters():
+    """?status=, ?driver_id=, ?from= and ?to= as build_admin_rides_query arguments. Raises ValueError."""
+    status = request.args.get('status')
+    valid_statuses = [choice[0] for choice in Ride.status_choices]
+    if status and status not in valid_statuses:
+        raise ValueError(f'Invalid status. Must be one of: {valid_statuses}')
+    return {
+        'status': status,
+        'driver_id': request.args.get('driver_id', type=int),
+        'date_from': parse_iso_datetime(request.args['from']) if request.args.get('from') else None,
+        'date_to': parse_iso_datetime(request.args['to']) if request.args.get('to') else None,
+    }
+
 @admin_bp.route('/rides', methods=['GET'])
 @admin_required
+@read_replica
 def list_all_rides(current_admin_user):
-    """Lists all rides in the system. Accessible only by admins."""
+    """
+    Lists rides, newest first. Accessible only by admins.
+
+    Filters: ?status=, ?driver_id=, ?from= and ?to= (ISO 8601, on requested_at).
+    Paginate with ?limit= and ?before=<next_cursor>, or pass ?format=ndjson to
+    stream every matching ride as newline-delimited JSON.
+    """
     try:
-        rides = Ride.query.order_by(Ride.requested_at.desc()).all()
-        if not rides:
-            return jsonify({'message': 'No rides found in the system.', 'rides': []}), 200
-
-        rides_data = []
-        for ride in rides:
-            pickup_loc = Location.query.get(ride.pickup_location_id)
-            dropoff_loc = Location.query.get(ride.dropoff_location_id)
-            passenger = User.query.get(ride.passenger_id)
-            driver = User.query.get(ride.driver_id) if ride.driver_id else None
-
-            ride_info = {
-                'id': ride.id,
-                'status': ride.status,
-                'passenger': {
-                    'id': passenger.id if passenger else None,
-                    'full_name': passenger.full_name if passenger else None,
-                    'email': passenger.email if passenger else None
-                },
-                'driver': {
-                    'id': driver.id if driver else None,
-                    'full_name': driver.full_name if driver else None,
-                    'email': driver.email if driver else None
-                } if driver else None,
-                'pickup_location': {
-                    'latitude': pickup_loc.latitude if pickup_loc else None,
-                    'longitude': pickup_loc.longitude if pickup_loc else None,
-                    'address': pickup_loc.address_line1 if pickup_loc else None
-                },
-                'dropoff_location': {
-                    'latitude': dropoff_loc.latitude if dropoff_loc else None,
-                    'longitude': dropoff_loc.longitude if dropoff_loc else None,
-                    'address': dropoff_loc.address_line1 if dropoff_loc else None
-                },
-                'requested_at': ride.requested_at.isoformat() if ride.requested_at else None,
-                'accepted_at': ride.accepted_at.isoformat() if ride.accepted_at else None,
-                'started_at': ride.started_at.isoformat() if ride.started_at else None,
-                'completed_at': ride.completed_at.isoformat() if ride.completed_at else None,
-                'cancelled_at': ride.cancelled_at.isoformat() if ride.cancelled_at else None,
-                'estimated_fare': ride.estimated_fare,
-                'actual_fare': ride.actual_fare,
-                'payment_status': ride.payment_status,
-                'vehicle_type_requested': ride.vehicle_type_requested
-            }
-            rides_data.append(ride_info)
-        
-        return jsonify({'rides': rides_data}), 200
+        filters = _ride_filters()
+        before = request.args.get('before')
+        cursor = decode_cursor(before) if before else None
+        limit = parse_limit(request.args.get('limit'), default=100, maximum=1000)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    query = build_admin_rides_query(**filters, cursor=cursor)
+
+    if request.args.get('format') == 'ndjson':
+        return export_response(ADMIN_RIDE, query, 'ndjson', None)
+
+    try:
+        rides = ADMIN_RIDE.dump_all(query.limit(limit + 1))
+        rides, next_cursor = paginate(rides, limit, key=lambda ride: (ride['requested_at'], ride['id']))
+        if not rides and cursor is None:
+            return jsonify({'message': 'No rides found in the system.', 'rides': [], 'next_cursor': None}), 200
+
+        return json_response({'rides': rides, 'next_cursor': next_cursor})
 
     except Exception as e:
         current_app.logger.error(f"Error listing all rides (admin): {e}")
@@ -304,60 +312,15 @@ def list_all_rides(current_admin_user):
 
 @admin_bp.route('/rides/<int:ride_id>', methods=['GET'])
 @admin_required
+@read_replica
 def get_ride_details_admin(current_admin_user, ride_id):
     """Gets detailed information for a specific ride. Accessible only by admins."""
     try:
-        ride = db.session.get(Ride, ride_id) # MODIFIED
-        if not ride:
+        row = _join_ride_parties(db.session.query(*ADMIN_RIDE_DETAIL.columns)).filter(Ride.id == ride_id).first()
+        if not row:
             return jsonify({'message': 'Ride not found.'}), 404
 
-        pickup_loc = db.session.get(Location, ride.pickup_location_id) # MODIFIED
-        dropoff_loc = db.session.get(Location, ride.dropoff_location_id) # MODIFIED
-        passenger = db.session.get(User, ride.passenger_id) # MODIFIED
-        driver = db.session.get(User, ride.driver_id) if ride.driver_id else None # MODIFIED
-
-        ride_info = {
-            'id': ride.id,
-            'status': ride.status,
-            'passenger': {
-                'id': passenger.id if passenger else None,
-                'full_name': passenger.full_name if passenger else None,
-                'email': passenger.email if passenger else None
-            },
-            'driver': {
-                'id': driver.id if driver else None,
-                'full_name': driver.full_name if driver else None,
-                'email': driver.email if driver else None
-            } if driver else None,
-            'pickup_location': {
-                'id': pickup_loc.id if pickup_loc else None,
-                'latitude': pickup_loc.latitude if pickup_loc else None,
-                'longitude': pickup_loc.longitude if pickup_loc else None,
-                'address_line1': pickup_loc.address_line1 if pickup_loc else None,
-                'city': pickup_loc.city if pickup_loc else None,
-                'postal_code': pickup_loc.postal_code if pickup_loc else None
-            },
-            'dropoff_location': {
-                'id': dropoff_loc.id if dropoff_loc else None,
-                'latitude': dropoff_loc.latitude if dropoff_loc else None,
-                'longitude': dropoff_loc.longitude if dropoff_loc else None,
-                'address_line1': dropoff_loc.address_line1 if dropoff_loc else None,
-                'city': dropoff_loc.city if dropoff_loc else None,
-                'postal_code': dropoff_loc.postal_code if dropoff_loc else None
-            },
-            'requested_at': ride.requested_at.isoformat() if ride.requested_at else None,
-            'accepted_at': ride.accepted_at.isoformat() if ride.accepted_at else None,
-            'started_at': ride.started_at.isoformat() if ride.started_at else None,
-            'completed_at': ride.completed_at.isoformat() if ride.completed_at else None,
-            'cancelled_at': ride.cancelled_at.isoformat() if ride.cancelled_at else None,
-            'estimated_fare': ride.estimated_fare,
-            'actual_fare': ride.actual_fare,
-            'payment_status': ride.payment_status,
-            'payment_intent_id': ride.payment_intent_id,
-            'vehicle_type_requested': ride.vehicle_type_requested,
-            'notes_for_driver': ride.notes_for_driver
-        }
-        return jsonify({'ride': ride_info}), 200
+        return json_response({'ride': ADMIN_RIDE_DETAIL.dump(row)})
     except Exception as e:
         current_app.logger.error(f"Error fetching ride {ride_id} (admin): {e}")
         return jsonify({'message': 'Failed to fetch ride details due to an internal error'}), 500
@@ -378,9 +341,12 @@ def cancel_ride_by_admin(current_admin_user, ride_id):
         ride.status = 'CANCELLED_ADMIN' # New status for admin cancellation
         ride.cancelled_at = datetime.datetime.now(timezone.utc)
         # Potentially add a field for cancellation_reason_admin
+        released = release_driver(ride.driver_id, ride.cancelled_at)
         
         db.session.add(ride)
         db.session.commit()
+        if released:
+            availability_committed(released)
 
         # TODO: Notify passenger and driver if applicable
 
@@ -391,46 +357,105 @@ def cancel_ride_by_admin(current_admin_user, ride_id):
         current_app.logger.error(f"Error cancelling ride {ride_id} by admin: {e}")
         return jsonify({'message': 'Failed to cancel ride due to an internal error.'}), 500
 
+@admin_bp.route('/export/users', methods=['GET'])
+@admin_required
+@read_replica
+def export_users(current_admin_user):
+    """Streams every user, ordered by id, as ?format=ndjson (default) or csv."""
+    query = db.session.query(*USER_WITH_PROFILE.columns)\
+        .outerjoin(DriverProfile, DriverProfile.user_id == User.id)\
+        .order_by(User.id)
+    try:
+        return export_response(USER_WITH_PROFILE, query, request.args.get('format', 'ndjson'), 'users')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@admin_bp.route('/export/drivers', methods=['GET'])
+@admin_required
+@read_replica
+def export_drivers(current_admin_user):
+    """Streams every driver profile with its user, ordered by profile id, as ?format=ndjson (default) or csv."""
+    query = db.session.query(*DRIVER_EXPORT.columns)\
+        .join(User, DriverProfile.user_id == User.id)\
+        .order_by(DriverProfile.id)
+    try:
+        return export_response(DRIVER_EXPORT, query, request.args.get('format', 'ndjson'), 'drivers')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@admin_bp.route('/export/rides', methods=['GET'])
+@admin_required
+@read_replica
+def export_rides(current_admin_user):
+    """
+    Streams every matching ride, newest first, as ?format=ndjson (default) or csv.
+    Takes the same filters as GET /rides.
+    """
+    try:
+        query = build_admin_rides_query(**_ride_filters())
+        return export_response(ADMIN_RIDE, query, request.args.get('format', 'ndjson'), 'rides')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+
 @admin_bp.route('/stats', methods=['GET'])
 @admin_required
+@read_replica
 def get_platform_stats(current_admin_user):
     """Provides basic platform statistics. Accessible only by admins."""
     try:
-        total_users = User.query.count()
-        total_drivers = User.query.filter_by(is_driver=True).count()
-        verified_drivers = DriverProfile.query.filter_by(is_verified=True).count()
-        
-        total_rides = Ride.query.count()
-        rides_by_status = {}
-        for status_tuple in Ride.status_choices:
-            status_code = status_tuple[0]
-            count = Ride.query.filter_by(status=status_code).count()
-            rides_by_status[status_code.lower()] = count
-            
-        total_vehicles = Vehicle.query.count()
-        active_vehicles = Vehicle.query.filter_by(is_active=True).count()
-
-        stats = {
-            'total_users': total_users,
-            'drivers': {
-                'total': total_drivers,
-                'verified': verified_drivers,
-                'unverified': total_drivers - verified_drivers
-            },
-            'rides': {
-                'total': total_rides,
-                'by_status': rides_by_status
-            },
-            'vehicles': {
-                'total': total_vehicles,
-                'active': active_vehicles,
-                'inactive': total_vehicles - active_vehicles
-            }
-        }
+        stats = build_stats(platform_counters.snapshot())
         return jsonify({'platform_statistics': stats}), 200
 
     except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Error fetching platform stats (admin): {e}")
         return jsonify({'message': 'Failed to fetch platform statistics due to an internal error'}), 500
 
+@admin_bp.route('/analytics/timeseries', methods=['GET'])
+@admin_required
+@read_replica
+def get_analytics_timeseries(current_admin_user):
+    """
+    Ride counts and fare totals per hour (or ?granularity=day) from the rollup tables.
+
+    ?from= / ?to= (ISO 8601, default: the last 30 days), ?group_by= any of
+    city,vehicle_type,status (default status), and ?city=, ?vehicle_type=,
+    ?status= filters. Status is the event counted: REQUESTED, COMPLETED or a
+    CANCELLED_* status. Rides newer than each stream's watermark are not included yet.
+    """
+    try:
+        date_to = parse_iso_datetime(request.args['to']) if request.args.get('to') else \
+            datetime.datetime.now(timezone.utc).replace(tzinfo=None)
+        date_from = parse_iso_datetime(request.args['from']) if request.args.get('from') else \
+            date_to - datetime.timedelta(days=30)
+        granularity = request.args.get('granularity', 'hour')
+        if granularity not in ('hour', 'day'):
+            raise ValueError('granularity must be hour or day')
+        group_by = tuple(dim for dim in request.args.get('group_by', 'status').split(',') if dim)
+        invalid = [dim for dim in group_by if dim not in DIMENSIONS]
+        if invalid:
+            raise ValueError(f'Invalid group_by {invalid}. Must be any of: {list(DIMENSIONS)}')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        series = query_timeseries(
+            date_from, date_to, granularity=granularity, group_by=group_by,
+            city=request.args.get('city'), vehicle_type=request.args.get('vehicle_type'),
+            status=request.args.get('status')
+        )
+        watermarks = {stream: ts.isoformat() for stream, ts in stream_watermarks().items()}
+        return jsonify({
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'granularity': granularity,
+            'group_by': list(group_by),
+            'watermarks': watermarks,
+            'series': series
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching analytics timeseries (admin): {e}")
+        return jsonify({'message': 'Failed to fetch analytics due to an internal error'}), 500
+
 # More admin routes will be added here
@@ -1,14 +1,21 @@
 from flask import Blueprint, request, jsonify
 from .models import User
 from . import db # Import db from the current app package's __init__.py
-import datetime
-from datetime import timezone # Import timezone
 import jwt # PyJWT
 from flask import current_app # To access app.config
 from .decorators import token_required
+from .hashing import PasswordHashingBusy
+from .tokens import REFRESH, decode_token, issue_tokens
+from .user_cache import AuthenticatedUser, user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
+def _hashing_busy_response():
+    # Shed load quickly instead of queueing behind a burst of password hashes
+    response = jsonify({'message': 'Authentication is temporarily overloaded, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -36,8 +43,11 @@ def register():
         phone_number=phone_number
         # is_driver=is_driver # Uncomment if you want to set this at registration
     )
-    new_user.set_password(password)
-    
+    try:
+        new_user.set_password(password)
+    except PasswordHashingBusy:
+        return _hashing_busy_response()
+
     try:
         db.session.add(new_user)
         db.session.commit()
@@ -61,21 +71,54 @@ def login():
 
     user = User.query.filter_by(email=email).first()
 
-    if not user or not user.check_password(password):
+    try:
+        password_ok = user is not None and user.check_password(password)
+    except PasswordHashingBusy:
+        return _hashing_busy_response()
+    if not password_ok:
         return jsonify({'message': 'Invalid email or password'}), 401 # Unauthorized
 
-    # Generate JWT token
-    token_payload = {
-        'user_id': user.id,
-        'exp': datetime.datetime.now(timezone.utc) + datetime.timedelta(hours=current_app.config.get('JWT_EXPIRATION_HOURS', 24))
-    }
-    token = jwt.encode(
-        token_payload,
-        current_app.config['SECRET_KEY'],
-        algorithm='HS256'
+    # Short-lived access token with role claims, long-lived refresh token to renew it
+    token, refresh_token = issue_tokens(
+        user.id, user.is_admin, user.is_driver, user.driver_profile.id if user.driver_profile else None
     )
 
-    return jsonify({'message': 'Login successful', 'token': token}), 200
+    return jsonify({
+        'message': 'Login successful',
+        'token': token,
+        'refresh_token': refresh_token,
+        'expires_in': int(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+    }), 200
+
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Exchanges a refresh token for a new access token carrying the user's current claims."""
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get('refresh_token')
+    if not refresh_token:
+        return jsonify({'message': 'refresh_token is required'}), 400
+
+    try:
+        claims = decode_token(refresh_token)
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'Refresh token has expired, please log in again'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Refresh token is invalid!'}), 401
+    if claims.get('type') != REFRESH:
+        return jsonify({'message': 'Refresh token is invalid!'}), 401
+
+    # Fresh from the database: the per-process cache may predate a role change made by another worker
+    row = db.session.execute(user_cache.load_statement(claims['user_id'])).first()
+    user = AuthenticatedUser(*row) if row else None
+    if not user:
+        return jsonify({'message': 'Refresh token is invalid, user not found'}), 401
+
+    token, _ = issue_tokens(user.id, user.is_admin, user.is_driver, user.driver_profile_id)
+    return jsonify({
+        'message': 'Token refreshed',
+        'token': token,
+        'expires_in': int(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+    }), 200
 
 # Logout route can be added later (often handled client-side by discarding the token)
 
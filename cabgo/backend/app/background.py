@@ -0,0 +1,65 @@
+"""Small helper for running periodic jobs on a daemon thread inside an app context."""
+import threading
+
+
+class PeriodicTask:
+    """Calls `func` every `interval` seconds with an app context pushed.
+
+    Exceptions are logged and do not stop the loop. `wake()` runs the job now
+    instead of at the end of the interval, without blocking the caller. `stop()`
+    wakes the thread immediately, and when `run_on_stop` is set the job runs one
+    last time so buffered work is not lost on shutdown.
+    """
+
+    def __init__(self, app, interval, func, name=None, run_on_stop=False):
+        self.app = app
+        self.interval = interval
+        self.func = func
+        self.name = name or getattr(func, '__name__', 'periodic-task')
+        self.run_on_stop = run_on_stop
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._wake_event.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wake(self):
+        self._wake_event.set()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        from . import db
+
+        with self.app.app_context():
+            try:
+                return self.func()
+            except Exception as e:
+                self.app.logger.error(f"Periodic task {self.name} failed: {e}")
+            finally:
+                db.session.remove()
+
+    def _loop(self):
+        while True:
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            self.run_once()
+        if self.run_on_stop:
+            self.run_once()
@@ -0,0 +1,117 @@
+"""Routes read-only handlers to a read replica bind while writes stay on the primary."""
+import contextlib
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+_READS_KEY = 'replica_reads'       # Set by @read_replica for the duration of a handler
+_PRIMARY_KEY = 'primary_only'      # Set once the handler writes; later reads see its own writes
+_TX_WROTE_KEY = 'transaction_wrote'
+
+
+class RoutingSession(FlaskSession):
+    """
+    Sends reads to the 'replica' bind (SQLALCHEMY_BINDS) while a @read_replica
+    handler runs, unless the session has written. Flushes and INSERT/UPDATE/DELETE
+    statements always go to the primary and pin the rest of the handler to it.
+    Without a replica bind this behaves exactly like the default session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+                self.info[_PRIMARY_KEY] = True
+                self.info[_TX_WROTE_KEY] = True
+            elif self.info.get(_READS_KEY) and not self.info.get(_PRIMARY_KEY):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class RecentWriters:
+    """
+    Users who committed a write in the last `window_seconds` in this process.
+    Their reads stay on the primary so they see their own changes while the
+    replica catches up.
+    """
+
+    def __init__(self, window_seconds=5, max_entries=100000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._last_write = {}  # user_id -> monotonic time
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.window_seconds = app.config.get('READ_REPLICA_STICKY_SECONDS', self.window_seconds)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._last_write.clear()
+
+    def record(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[user_id] = now
+            if len(self._last_write) > self.max_entries:
+                cutoff = now - self.window_seconds
+                self._last_write = {uid: at for uid, at in self._last_write.items() if at >= cutoff}
+
+    def wrote_recently(self, user_id):
+        at = self._last_write.get(user_id)
+        return at is not None and time.monotonic() - at < self.window_seconds
+
+
+recent_writers = RecentWriters()
+
+
+def use_primary(session):
+    """Pins the rest of the current handler's reads to the primary (e.g. before read-modify-write work)."""
+    session.info[_PRIMARY_KEY] = True
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """Routes the enclosed reads to the replica, unless the current user wrote moments ago."""
+    from . import db
+
+    session = db.session()
+    user_id = g.get('current_user_id') if has_request_context() else None
+    if user_id is not None and recent_writers.wrote_recently(user_id):
+        yield
+        return
+    session.info[_READS_KEY] = True
+    session.info[_PRIMARY_KEY] = False
+    try:
+        yield
+    finally:
+        session.info.pop(_READS_KEY, None)
+        session.info.pop(_PRIMARY_KEY, None)
+
+
+def read_replica(f):
+    """Lets a read-only handler's queries go to the replica. Place below the auth decorator."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        with replica_reads():
+            return f(*args, **kwargs)
+    return decorated
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_writer(session):
+    if session.info.pop(_TX_WROTE_KEY, False) and has_request_context():
+        user_id = g.get('current_user_id')
+        if user_id is not None:
+            recent_writers.record(user_id)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_rolled_back_write(session):
+    session.info.pop(_TX_WROTE_KEY, None)
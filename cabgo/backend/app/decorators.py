@@ -1,44 +1,88 @@
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g
 import jwt
-from .models import User
-from . import db
+from .tokens import ACCESS, decode_token, principal_from_claims, token_revocations
+from .user_cache import user_cache
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                return jsonify({'message': 'Bearer token malformed'}), 401
+def verify_access_token(authorization):
+    """
+    Checks an Authorization header value. Returns (claims, None) for a valid access
+    token, or (None, (message, status)). Needs an app context, not a request.
+    """
+    token = None
+    if authorization is not None:
+        try:
+            token = authorization.split(" ")[1]
+        except IndexError:
+            return None, ('Bearer token malformed', 401)
 
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
+    if not token:
+        return None, ('Token is missing!', 401)
 
-        try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = db.session.get(User, data['user_id'])
-            if not current_user:
-                return jsonify({'message': 'Token is invalid, user not found'}), 401
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired!'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token is invalid!'}), 401
-        except Exception as e:
-            current_app.logger.error(f"Error decoding token: {e}")
-            return jsonify({'message': 'Error processing token'}), 500
+    try:
+        data = decode_token(token)
+    except jwt.ExpiredSignatureError:
+        return None, ('Token has expired!', 401)
+    except jwt.InvalidTokenError:
+        return None, ('Token is invalid!', 401)
+    except Exception as e:
+        current_app.logger.error(f"Error decoding token: {e}")
+        return None, ('Error processing token', 500)
+
+    # Legacy tokens carry no 'type'; refresh tokens are only accepted by /api/auth/refresh
+    if 'user_id' not in data or data.get('type', ACCESS) != ACCESS:
+        return None, ('Token is invalid!', 401)
+    if token_revocations.is_revoked(data):
+        return None, ('Token has been revoked, please refresh it', 401)
+    return data, None
 
+def _verified_claims():
+    """Returns (claims, None) for a valid access token in the request, or (None, error response)."""
+    data, error = verify_access_token(request.headers.get('Authorization'))
+    if error:
+        message, status = error
+        return None, (jsonify({'message': message}), status)
+    return data, None
+
+def _load_user(user_id):
+    try:
+        # Served from the per-process cache; a SELECT only on a miss
+        current_user = user_cache.get(user_id)
+    except Exception as e:
+        current_app.logger.error(f"Error loading user for token: {e}")
+        return None, (jsonify({'message': 'Error processing token'}), 500)
+    if not current_user:
+        return None, (jsonify({'message': 'Token is invalid, user not found'}), 401)
+    return current_user, None
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        data, error = _verified_claims()
+        if error:
+            return error
+        current_user, error = _load_user(data['user_id'])
+        if error:
+            return error
+        g.current_user_id = current_user.id # Lets db_routing keep this user's reads on the primary after a write
         return f(current_user, *args, **kwargs)
     return decorated
 
 def admin_required(f):
     @wraps(f)
-    @token_required # Ensures token is valid and current_user is passed
-    def decorated_function(current_user, *args, **kwargs):
+    def decorated_function(*args, **kwargs):
+        data, error = _verified_claims()
+        if error:
+            return error
+        # Claims-bearing tokens are authorized without touching the database;
+        # role changes revoke them through token_revocations.
+        current_user = principal_from_claims(data)
+        if current_user is None:
+            current_user, error = _load_user(data['user_id'])
+            if error:
+                return error
         if not current_user.is_admin:
             return jsonify({'message': 'Admin access required!'}), 403 # Forbidden
+        g.current_user_id = current_user.id
         return f(current_user, *args, **kwargs)
     return decorated_function
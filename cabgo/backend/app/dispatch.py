@@ -0,0 +1,219 @@
+"""Micro-batch dispatch: matches REQUESTED rides to nearby AVAILABLE drivers."""
+import datetime
+from datetime import timezone
+import time
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from sqlalchemy import update
+
+from . import db
+from .background import PeriodicTask
+from .geo_index import driver_index
+from .routing import eta_engine
+from .models import Ride, Location, DriverProfile
+from .platform_stats import bucket_name, platform_counters
+from .utils import calculate_distances, predict_etas
+
+INFEASIBLE_COST = 1e9
+
+
+def solve_assignment(cost):
+    """
+    Minimum-cost assignment for a rectangular cost matrix (Hungarian algorithm,
+    shortest augmenting path variant, O(n^2 m) with vectorized row updates).
+
+    Returns a list of (row, col) pairs; every row is matched when rows <= cols,
+    otherwise every column is.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        return []
+
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j]: 1-based row matched to column j (0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)  # way[j]: previous column on the augmenting path
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            improve = free & (reduced < minv[1:])
+            minv[1:][improve] = reduced[improve]
+            way[1:][improve] = j0
+
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = [(int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+class DispatchEngine:
+    """
+    Collects pending rides and candidate drivers once per window, solves the
+    assignment globally and commits every match in a single transaction.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._task = None
+
+    def init_app(self, app):
+        self.app = app
+        app.cli.add_command(dispatch_command)
+        if app.config.get('DISPATCH_IN_PROCESS'):
+            self._task = PeriodicTask(app, app.config['DISPATCH_INTERVAL_SECONDS'], self.run_once, name='dispatch')
+            self._task.start()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.stop()
+            self._task = None
+
+    def _pending_rides(self, limit):
+        return db.session.query(Ride.id, Location.latitude, Location.longitude)\
+            .join(Location, Ride.pickup_location_id == Location.id)\
+            .filter(Ride.status == 'REQUESTED')\
+            .order_by(Ride.requested_at)\
+            .limit(limit)\
+            .all()
+
+    def build_cost_matrix(self, ride_coords, driver_coords, candidate_mask):
+        """Pickup ETA in minutes (road graph when loaded) plus a distance penalty; non-candidates are infeasible."""
+        config = self.app.config if self.app else {}
+        distances = calculate_distances(ride_coords, driver_coords, pairwise=True)
+        if eta_engine.graph is not None:
+            # One reverse Dijkstra per pickup covers all of its candidate drivers
+            etas = np.full(distances.shape, np.inf)
+            for row, (lat, lon) in enumerate(ride_coords):
+                cols = np.flatnonzero(candidate_mask[row])
+                etas[row, cols] = eta_engine.travel_times_to(lat, lon, [driver_coords[c] for c in cols])
+        else:
+            etas = predict_etas(distances)
+        cost = etas + distances * config.get('DISPATCH_DISTANCE_WEIGHT', 0.5)
+        return np.where(candidate_mask, cost, INFEASIBLE_COST)
+
+    def run_once(self, reload_index=False):
+        """Runs one dispatch window. Returns a list of (ride_id, driver_user_id) assignments."""
+        config = self.app.config
+        if reload_index:
+            driver_index.reset()
+        driver_index.ensure_loaded()
+
+        rides = self._pending_rides(config['DISPATCH_MAX_BATCH_SIZE'])
+        if not rides or not len(driver_index):
+            return []
+
+        # Candidate drivers per ride come from the spatial index, not from SQL
+        radius_km = config['DISPATCH_RADIUS_KM']
+        per_ride = config['DISPATCH_CANDIDATES_PER_RIDE']
+        driver_columns = {}  # driver_profile_id -> column
+        driver_rows = []     # (driver_profile_id, user_id, lat, lon)
+        candidate_pairs = []
+        for ride_row, (_, lat, lon) in enumerate(rides):
+            for _, profile_id, d_lat, d_lon, user_id in driver_index.nearest(lat, lon, radius_km=radius_km, k=per_ride):
+                if profile_id not in driver_columns:
+                    driver_columns[profile_id] = len(driver_rows)
+                    driver_rows.append((profile_id, user_id, d_lat, d_lon))
+                candidate_pairs.append((ride_row, driver_columns[profile_id]))
+        if not driver_rows:
+            return []
+
+        candidate_mask = np.zeros((len(rides), len(driver_rows)), dtype=bool)
+        rows, cols = zip(*candidate_pairs)
+        candidate_mask[list(rows), list(cols)] = True
+
+        ride_coords = [(lat, lon) for _, lat, lon in rides]
+        driver_coords = [(lat, lon) for _, _, lat, lon in driver_rows]
+        cost = self.build_cost_matrix(ride_coords, driver_coords, candidate_mask)
+        matches = [(r, c) for r, c in solve_assignment(cost) if cost[r, c] < INFEASIBLE_COST]
+        return self._commit(rides, driver_rows, matches)
+
+    def _commit(self, rides, driver_rows, matches):
+        now = datetime.datetime.now(timezone.utc)
+        assigned = []
+        try:
+            for ride_row, driver_col in matches:
+                ride_id = rides[ride_row][0]
+                profile_id, user_id = driver_rows[driver_col][:2]
+                # Conditional updates keep this safe against concurrent cancels and status changes
+                claimed = db.session.execute(
+                    update(DriverProfile)
+                    .where(DriverProfile.id == profile_id, DriverProfile.availability_status == 'AVAILABLE')
+                    .values(availability_status='BUSY')
+                ).rowcount
+                if not claimed:
+                    continue
+                accepted = db.session.execute(
+                    update(Ride)
+                    .where(Ride.id == ride_id, Ride.status == 'REQUESTED')
+                    .values(driver_id=user_id, status='ACCEPTED', accepted_at=now)
+                ).rowcount
+                if not accepted:
+                    db.session.execute(
+                        update(DriverProfile).where(DriverProfile.id == profile_id).values(availability_status='AVAILABLE')
+                    )
+                    continue
+                assigned.append((ride_id, user_id, profile_id))
+            # Core updates bypass the ORM flush hook that maintains the dashboard counters
+            platform_counters.adjust(db.session, {
+                bucket_name(Ride, 'REQUESTED'): -len(assigned),
+                bucket_name(Ride, 'ACCEPTED'): len(assigned)
+            })
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for _, _, profile_id in assigned:
+            driver_index.remove(profile_id)
+        return [(ride_id, user_id) for ride_id, user_id, _ in assigned]
+
+
+dispatch_engine = DispatchEngine()
+
+
+@click.command('dispatch')
+@click.option('--once', is_flag=True, help='Run a single dispatch window and exit.')
+@with_appcontext
+def dispatch_command(once):
+    """Runs the dispatch loop in a dedicated process."""
+    from flask import current_app
+
+    interval = current_app.config['DISPATCH_INTERVAL_SECONDS']
+    while True:
+        started = time.monotonic()
+        # Other processes update driver state, so rebuild the index every window
+        assignments = dispatch_engine.run_once(reload_index=True)
+        db.session.remove()
+        click.echo(f"Dispatched {len(assignments)} ride(s)")
+        if once:
+            break
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
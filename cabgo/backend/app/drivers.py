@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify, current_app
 from .models import User, DriverProfile
 from . import db
 from .decorators import token_required
+from .db_routing import read_replica
+from .geo_index import driver_index
+from .location_buffer import location_buffer
+from .serializers import AVAILABLE_DRIVER, json_response
 import datetime
 from datetime import timezone # Import timezone
 
@@ -11,7 +15,7 @@ drivers_bp = Blueprint('drivers', __name__)
 @token_required
 def register_driver(current_user):
     # Check if the user is already a driver or has a pending application
-    if current_user.is_driver or DriverProfile.query.filter_by(user_id=current_user.id).first():
+    if current_user.is_driver or current_user.driver_profile_id:
         return jsonify({'message': 'User is already a driver or has a pending/existing driver profile.'}), 409 # Conflict
 
     data = request.get_json()
@@ -46,9 +50,10 @@ def register_driver(current_user):
         )
         db.session.add(new_driver_profile)
         
-        # Update the user's is_driver flag
-        current_user.is_driver = True
-        db.session.add(current_user)
+        # Update the user's is_driver flag (current_user is a read-only snapshot)
+        user = db.session.get(User, current_user.id)
+        user.is_driver = True
+        db.session.add(user)
         
         db.session.commit()
 
@@ -68,70 +73,216 @@ def register_driver(current_user):
 
 @drivers_bp.route('/available', methods=['GET'])
 # @token_required # Decide if this needs authentication - passengers might call this
+@read_replica
 def list_available_drivers():
     try:
-        # Find driver profiles that are 'AVAILABLE' and 'is_verified'
-        # Also join with User to get user details like full_name
-        available_driver_profiles = DriverProfile.query\
-            .join(User, DriverProfile.user_id == User.id)\
-            .filter(DriverProfile.availability_status == 'AVAILABLE', DriverProfile.is_verified == True)\
-            .all()
-
-        if not available_driver_profiles:
+        # Verified drivers that are 'AVAILABLE', with the user's name and phone from the join
+        drivers_data = AVAILABLE_DRIVER.dump_all(
+            db.session.query(*AVAILABLE_DRIVER.columns)
+            .join(User, DriverProfile.user_id == User.id)
+            .filter(DriverProfile.availability_status == 'AVAILABLE', DriverProfile.is_verified == True)
+        )
+
+        if not drivers_data:
             return jsonify({'message': 'No drivers currently available.', 'drivers': []}), 200
 
-        drivers_data = []
-        for profile in available_driver_profiles:
-            driver_info = {
-                'driver_id': profile.user_id, # This is the User.id
-                'driver_profile_id': profile.id,
-                'full_name': profile.user.full_name, # Accessing User model through relationship
-                'phone_number': profile.user.phone_number,
-                'current_latitude': profile.current_latitude,
-                'current_longitude': profile.current_longitude,
-                # Add vehicle info if needed, might require another join or separate query
-            }
-            drivers_data.append(driver_info)
-        
-        return jsonify({'drivers': drivers_data}), 200
+        for driver in drivers_data:
+            # Pings not yet flushed to the DB are newer than the row
+            buffered = location_buffer.get(driver['driver_profile_id'])
+            if buffered:
+                driver['current_latitude'], driver['current_longitude'] = buffered[0], buffered[1]
+
+        return json_response({'drivers': drivers_data})
 
     except Exception as e:
         current_app.logger.error(f"Error fetching available drivers: {e}")
         return jsonify({'message': 'Failed to fetch available drivers due to an internal error'}), 500
 
+def parse_nearby_query(args):
+    """(lat, lon, radius_km, k) from /nearby query parameters; raises ValueError with the client message."""
+    try:
+        lat = float(args['lat'])
+        lon = float(args['lon'])
+        radius_km = float(args.get('radius_km', 5))
+        k = int(args.get('k', 10))
+    except KeyError:
+        raise ValueError('lat and lon query parameters are required')
+    except ValueError:
+        raise ValueError('lat, lon, radius_km and k must be numeric')
+
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise ValueError('lat/lon out of range')
+    if not (0 < radius_km <= 50):
+        raise ValueError('radius_km must be between 0 and 50')
+    if not (1 <= k <= 100):
+        raise ValueError('k must be between 1 and 100')
+    return lat, lon, radius_km, k
+
+def nearby_drivers(lat, lon, radius_km, k):
+    """Response rows for the k nearest indexed drivers. The index must be loaded."""
+    return [
+        {
+            'driver_id': user_id,
+            'driver_profile_id': profile_id,
+            'current_latitude': d_lat,
+            'current_longitude': d_lon,
+            'distance_km': round(distance, 3)
+        }
+        for distance, profile_id, d_lat, d_lon, user_id in driver_index.nearest(lat, lon, radius_km=radius_km, k=k)
+    ]
+
+@drivers_bp.route('/nearby', methods=['GET'])
+# Same access rules as /available - passengers poll this before booking
+def list_nearby_drivers():
+    try:
+        lat, lon, radius_km, k = parse_nearby_query(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        driver_index.ensure_loaded()
+        return jsonify({'drivers': nearby_drivers(lat, lon, radius_km, k)}), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching nearby drivers: {e}")
+        return jsonify({'message': 'Failed to fetch nearby drivers due to an internal error'}), 500
+
 
 @drivers_bp.route('/availability', methods=['PATCH'])
 @token_required
 def update_driver_availability(current_user):
 
-    driver_profile = DriverProfile.query.filter_by(user_id=current_user.id).first()
+    driver_profile = db.session.get(DriverProfile, current_user.driver_profile_id) if current_user.driver_profile_id else None
     if not driver_profile:
         return jsonify({'message': 'Driver profile not found for this user.'}), 404
 
     data = request.get_json()
-    if not data or 'availability_status' not in data:
-        return jsonify({'message': 'Availability status is required in the request body.'}), 400
-
-    new_status = data.get('availability_status')
-    valid_statuses = [choice[0] for choice in DriverProfile.availability_status_choices]
-    if new_status not in valid_statuses:
-        return jsonify({'message': f'Invalid availability status. Must be one of: {valid_statuses}'}), 400
+    try:
+        new_status = parse_availability(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
     try:
-        driver_profile.availability_status = new_status
-        # Optionally update location if provided
-        if 'latitude' in data and 'longitude' in data:
-            driver_profile.current_latitude = data.get('latitude')
-            driver_profile.current_longitude = data.get('longitude')
-            driver_profile.last_location_update = datetime.datetime.now(timezone.utc)
-        
-        db.session.commit()
-        return jsonify({'message': 'Driver availability updated successfully.', 
-                        'driver_id': driver_profile.user_id,
-                        'new_status': driver_profile.availability_status}), 200
+        if apply_availability(driver_profile, new_status, data, datetime.datetime.now(timezone.utc)):
+            db.session.commit()
+            availability_committed(driver_profile)
+
+        return jsonify(availability_response(driver_profile)), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error updating driver availability for user {current_user.id}: {e}")
         return jsonify({'message': 'Failed to update availability due to an internal error'}), 500
 
+def parse_availability(data):
+    """The requested status from an availability update body; raises ValueError with the client message."""
+    if not data or 'availability_status' not in data:
+        raise ValueError('Availability status is required in the request body.')
+    new_status = data.get('availability_status')
+    valid_statuses = [choice[0] for choice in DriverProfile.availability_status_choices]
+    if new_status not in valid_statuses:
+        raise ValueError(f'Invalid availability status. Must be one of: {valid_statuses}')
+    return new_status
+
+def apply_availability(driver_profile, new_status, data, now):
+    """
+    Applies an availability update to a loaded profile. Returns True when the row
+    changed; commit it, then call availability_committed(). A plain GPS ping
+    (status unchanged) only goes to the write-behind buffer. Raises ValueError
+    with the client message, before touching the profile, for bad coordinates.
+    """
+    location = None
+    if 'latitude' in data and 'longitude' in data:
+        location = parse_location(data)
+
+    if new_status == driver_profile.availability_status:
+        if location:
+            _ingest_location(driver_profile, *location, now)
+        return False
+
+    driver_profile.availability_status = new_status
+    if location:
+        position = (*location, now)
+    else:
+        position = location_buffer.get(driver_profile.id)
+    if position:
+        driver_profile.current_latitude, driver_profile.current_longitude, driver_profile.last_location_update = position
+    return True
+
+def release_driver(driver_user_id, now):
+    """
+    Puts the driver of a cancelled ride back to AVAILABLE, in the caller's
+    transaction. Dispatch marks an assigned driver BUSY; only a BUSY driver is
+    released, one who went OFFLINE meanwhile stays so. Returns the profile to
+    pass to availability_committed() after the commit, or None.
+    """
+    if driver_user_id is None:
+        return None
+    driver_profile = DriverProfile.query.filter_by(user_id=driver_user_id).first()
+    if driver_profile is None or driver_profile.availability_status != 'BUSY':
+        return None
+    apply_availability(driver_profile, 'AVAILABLE', {}, now)
+    return driver_profile
+
+def availability_committed(driver_profile):
+    location_buffer.discard(driver_profile.id) # The committed row is now the freshest copy
+    driver_index.sync_profile(driver_profile)
+
+def availability_response(driver_profile):
+    return {'message': 'Driver availability updated successfully.',
+            'driver_id': driver_profile.user_id,
+            'new_status': driver_profile.availability_status}
+
+@drivers_bp.route('/location', methods=['POST'])
+@token_required
+def ingest_driver_location(current_user):
+    """High-frequency GPS ping. Buffered in memory and flushed to the DB in bulk."""
+    if not current_user.driver_profile_id:
+        return jsonify({'message': 'Driver profile not found for this user.'}), 404
+
+    try:
+        lat, lon = parse_location(request.get_json())
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    profile_id = current_user.driver_profile_id
+    driver_index.ensure_loaded()
+    if not record_ping(profile_id, current_user.id, lat, lon):
+        # Not yet indexed: only an AVAILABLE, verified driver without a stored position belongs there
+        status = db.session.query(DriverProfile.availability_status, DriverProfile.is_verified)\
+            .filter(DriverProfile.id == profile_id).first()
+        if status and status.availability_status == 'AVAILABLE' and status.is_verified:
+            driver_index.upsert(profile_id, lat, lon, current_user.id)
+    return jsonify({'message': 'Location accepted.', 'driver_id': current_user.id}), 202
+
+def record_ping(profile_id, user_id, lat, lon):
+    """
+    Buffers a GPS ping and moves the driver in the (loaded) index. Returns False
+    when the driver is not indexed, for the caller to check the profile.
+    """
+    location_buffer.record(profile_id, lat, lon, datetime.datetime.now(timezone.utc))
+    if profile_id not in driver_index:
+        return False
+    driver_index.upsert(profile_id, lat, lon, user_id)
+    return True
+
+def parse_location(data):
+    """(lat, lon) from a GPS ping body; raises ValueError with the client message."""
+    if not data or 'latitude' not in data or 'longitude' not in data:
+        raise ValueError('Latitude and longitude are required.')
+    try:
+        lat = float(data['latitude'])
+        lon = float(data['longitude'])
+    except (TypeError, ValueError):
+        raise ValueError('Latitude and longitude must be numeric.')
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise ValueError('Latitude/longitude out of range.')
+    return lat, lon
+
+def _ingest_location(driver_profile, lat, lon, recorded_at):
+    location_buffer.record(driver_profile.id, lat, lon, recorded_at)
+    if driver_profile.availability_status == 'AVAILABLE' and driver_profile.is_verified:
+        driver_index.upsert(driver_profile.id, lat, lon, driver_profile.user_id)
+
 # Other driver-related routes will be added here
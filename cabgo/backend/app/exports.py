@@ -0,0 +1,85 @@
+"""
+Streaming exports of a Shape-projected query as NDJSON or CSV.
+
+Rows are pulled from the cursor with yield_per (a server-side cursor where
+the driver has one) and encoded a batch at a time, so memory stays bounded
+by EXPORT_BATCH_SIZE rows however large the table is.
+"""
+import csv
+import datetime
+import io
+
+from flask import Response, current_app, stream_with_context
+
+from .db_routing import replica_reads
+from .serializers import dumps
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _batches(query, size):
+    batch = []
+    for row in query.yield_per(size):
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_ndjson(shape, query, batch_size):
+    """One JSON object per line, as bytes chunks of up to batch_size lines."""
+    dump = shape.dump
+    for batch in _batches(query, batch_size):
+        yield b''.join(dumps(dump(row)) + b'\n' for row in batch)
+
+
+# Spreadsheets evaluate a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value  # User-entered text (names, addresses) must stay text when an admin opens the file
+    return value
+
+
+def iter_csv(shape, query, batch_size):
+    """A header line of the shape's dotted keys, then one line per row, as str chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(shape.headers)
+    yield buffer.getvalue()
+    flatten = shape.flatten
+    for batch in _batches(query, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in flatten(row)] for row in batch)
+        yield buffer.getvalue()
+
+
+def export_response(shape, query, export_format, filename):
+    """
+    A streamed Response of `query` (selecting `shape.columns`) in `export_format`.
+    Raises ValueError for an unknown format.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format. Must be one of: {sorted(EXPORT_FORMATS)}")
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    encode = iter_ndjson if export_format == 'ndjson' else iter_csv
+
+    def generate():
+        # Runs after the handler returns, so re-enter replica routing for the stream
+        with replica_reads():
+            yield from encode(shape, query, batch_size)
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format])
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
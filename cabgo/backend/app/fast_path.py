@@ -0,0 +1,280 @@
+"""
+Asyncio fast path for the highest-rate driver endpoints, mounted beside the Flask app over ASGI.
+
+POST /api/drivers/location, PATCH /api/drivers/availability and
+GET /api/drivers/nearby are answered on the event loop. Their in-memory work
+(token checks, the location buffer, the driver index) runs inline, and the few
+database round-trips go through an async SQLAlchemy engine (aiosqlite for
+SQLite). A connected driver therefore costs a coroutine rather than a worker
+thread. Every other request goes to the Flask app in a thread pool. The Flask
+handlers stay in place for WSGI deployments, and both share the validation and
+index helpers in app.drivers, so responses match.
+"""
+import asyncio
+import datetime
+import time
+from datetime import timezone
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from .db_routing import recent_writers
+from .decorators import verify_access_token
+from .drivers import (
+    apply_availability, availability_committed, availability_response, nearby_drivers,
+    parse_availability, parse_location, parse_nearby_query, record_ping
+)
+from .geo_index import driver_index
+from .metrics import metrics
+from .models import DriverProfile
+from .serializers import dumps, loads
+from .sqlite_pragmas import apply_pragmas
+from .user_cache import AuthenticatedUser, user_cache
+
+# Sync backend name -> async driver
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(uri):
+    """The same database with its async driver; raises ValueError when none is known."""
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {url.drivername}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=driver)
+
+
+class FastRequest:
+    """The parts of an ASGI HTTP request the handlers read."""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+        self.body = body
+
+    def get_json(self):
+        """The decoded body, or None when it is empty or not JSON."""
+        if not self.body:
+            return None
+        try:
+            return loads(self.body)
+        except ValueError:
+            return None
+
+
+class FastPath:
+    """Async handlers for the hot driver endpoints, with their own async engine on the event loop."""
+
+    def __init__(self, app):
+        self.app = app
+        self.engine = None
+        self._sessionmaker = None
+        self.routes = {
+            ('POST', '/api/drivers/location'): self.ingest_location,
+            ('PATCH', '/api/drivers/availability'): self.update_availability,
+            ('GET', '/api/drivers/nearby'): self.list_nearby,
+        }
+
+    def _start_engine(self):
+        if self.engine is not None:
+            return
+        config = self.app.config
+        url = config.get('ASYNC_DATABASE_URL') or async_database_url(config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = create_async_engine(url, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        apply_pragmas(self.engine.sync_engine, config.get('SQLITE_PRAGMAS') or {})
+        # Committed profiles are read after commit (index sync, response), so keep them loaded
+        self._sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def startup(self):
+        """Creates the engine on the running loop and loads the driver index before traffic arrives."""
+        self._start_engine()
+        await self._ensure_index_loaded()
+
+    async def shutdown(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+            self._sessionmaker = None
+
+    def _load_index(self):
+        with self.app.app_context():
+            driver_index.ensure_loaded()
+
+    async def _ensure_index_loaded(self):
+        # The initial load is one big synchronous query; keep it off the event loop
+        if not driver_index.loaded:
+            await asyncio.get_running_loop().run_in_executor(None, self._load_index)
+
+    async def serve(self, handler, scope, receive, send):
+        started = time.perf_counter()
+        metrics.request_started()
+        status = 500
+        try:
+            request = FastRequest(scope, await _read_body(receive))
+            if self.engine is None:  # Served without a lifespan startup
+                self._start_engine()
+            with self.app.app_context():
+                try:
+                    payload, status = await handler(request)
+                except Exception as e:
+                    current_app.logger.error(f"Error in fast path {request.method} {request.path}: {e}")
+                    payload, status = {'message': 'Internal server error'}, 500
+            body = dumps(payload)
+            headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+            if 'origin' in request.headers:
+                headers.append((b'access-control-allow-origin', b'*'))  # Same as CORS(app) on the Flask side
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': body})
+        finally:
+            metrics.request_finished(scope['method'], scope['path'], status, time.perf_counter() - started)
+
+    async def _authenticate(self, request, session):
+        """(AuthenticatedUser, None) like token_required, or (None, (payload, status))."""
+        claims, error = verify_access_token(request.headers.get('authorization'))
+        if error:
+            message, status = error
+            return None, ({'message': message}, status)
+
+        user_id = claims['user_id']
+        user, generation = user_cache.cached(user_id)
+        if user is None:
+            try:
+                row = (await session.execute(user_cache.load_statement(user_id))).first()
+            except Exception as e:
+                current_app.logger.error(f"Error loading user for token: {e}")
+                return None, ({'message': 'Error processing token'}, 500)
+            user = AuthenticatedUser(*row) if row else None
+            user_cache.store(user_id, user, generation)
+        if user is None:
+            return None, ({'message': 'Token is invalid, user not found'}, 401)
+        return user, None
+
+    async def ingest_location(self, request):
+        """High-frequency GPS ping, as drivers.ingest_driver_location."""
+        async with self._sessionmaker() as session:
+            current_user, error = await self._authenticate(request, session)
+            if error:
+                return error
+            if not current_user.driver_profile_id:
+                return {'message': 'Driver profile not found for this user.'}, 404
+            try:
+                lat, lon = parse_location(request.get_json())
+            except ValueError as e:
+                return {'message': str(e)}, 400
+
+            profile_id = current_user.driver_profile_id
+            await self._ensure_index_loaded()
+            if not record_ping(profile_id, current_user.id, lat, lon):
+                status = (await session.execute(
+                    select(DriverProfile.availability_status, DriverProfile.is_verified)
+                    .where(DriverProfile.id == profile_id)
+                )).first()
+                if status and status.availability_status == 'AVAILABLE' and status.is_verified:
+                    driver_index.upsert(profile_id, lat, lon, current_user.id)
+            return {'message': 'Location accepted.', 'driver_id': current_user.id}, 202
+
+    async def update_availability(self, request):
+        """Availability toggle or GPS ping, as drivers.update_driver_availability."""
+        async with self._sessionmaker() as session:
+            current_user, error = await self._authenticate(request, session)
+            if error:
+                return error
+            driver_profile = None
+            if current_user.driver_profile_id:
+                driver_profile = await session.get(DriverProfile, current_user.driver_profile_id)
+            if not driver_profile:
+                return {'message': 'Driver profile not found for this user.'}, 404
+
+            data = request.get_json()
+            try:
+                new_status = parse_availability(data)
+            except ValueError as e:
+                return {'message': str(e)}, 400
+
+            try:
+                if apply_availability(driver_profile, new_status, data, datetime.datetime.now(timezone.utc)):
+                    await session.commit()
+                    # A plain async session has no RoutingSession after_commit hook
+                    recent_writers.record(current_user.id)
+                    availability_committed(driver_profile)
+                return availability_response(driver_profile), 200
+            except ValueError as e:
+                return {'message': str(e)}, 400
+            except Exception as e:
+                await session.rollback()
+                current_app.logger.error(f"Error updating driver availability for user {current_user.id}: {e}")
+                return {'message': 'Failed to update availability due to an internal error'}, 500
+
+    async def list_nearby(self, request):
+        """Nearest available drivers from the in-memory index, as drivers.list_nearby_drivers."""
+        try:
+            lat, lon, radius_km, k = parse_nearby_query(request.args)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        try:
+            await self._ensure_index_loaded()
+            return {'drivers': nearby_drivers(lat, lon, radius_km, k)}, 200
+        except Exception as e:
+            current_app.logger.error(f"Error fetching nearby drivers: {e}")
+            return {'message': 'Failed to fetch nearby drivers due to an internal error'}, 500
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+class ASGIApp:
+    """Routes the fast-path endpoints to FastPath and every other request to the Flask app."""
+
+    def __init__(self, flask_app):
+        self.fast_path = FastPath(flask_app)
+        self.enabled = flask_app.config.get('ASYNC_FAST_PATH_ENABLED', True)
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_WORKERS', 16))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'http' and self.enabled:
+            handler = self.fast_path.routes.get((scope['method'], scope['path']))
+            if handler is not None:
+                await self.fast_path.serve(handler, scope, receive, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if self.enabled:
+                        await self.fast_path.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.fast_path.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(flask_app):
+    """The ASGI application for a Flask app created by create_app()."""
+    return ASGIApp(flask_app)
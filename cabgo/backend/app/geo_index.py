@@ -0,0 +1,254 @@
+"""In-memory spatial grid index used to answer "who is near this point" lookups."""
+import datetime
+import heapq
+import math
+import threading
+
+from sqlalchemy import func
+
+from .background import PeriodicTask
+from .utils import EARTH_RADIUS_KM, calculate_distance
+
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180  # Same sphere as calculate_distance, so rings never overstate coverage
+
+
+class SpatialGridIndex:
+    """Buckets points into fixed-size lat/lon cells (a geohash-style grid).
+
+    Radius and nearest-k queries only visit the rings of cells around the
+    query point instead of scanning every point, so lookup cost depends on
+    local density rather than on the total number of indexed points.
+    Longitude wrap-around at the antimeridian is not handled.
+    """
+
+    def __init__(self, cell_size_deg=0.01):
+        self.cell_size_deg = cell_size_deg
+        self._lock = threading.RLock()
+        self._cells = {}  # (row, col) -> {key: (lat, lon, payload)}
+        self._points = {}  # key -> (row, col)
+
+    def cell_for(self, lat, lon):
+        return (math.floor(lat / self.cell_size_deg), math.floor(lon / self.cell_size_deg))
+
+    def upsert(self, key, lat, lon, payload=None):
+        cell = self.cell_for(lat, lon)
+        with self._lock:
+            old_cell = self._points.get(key)
+            if old_cell is not None and old_cell != cell:
+                self._discard(key, old_cell)
+            self._cells.setdefault(cell, {})[key] = (lat, lon, payload)
+            self._points[key] = cell
+
+    def remove(self, key):
+        with self._lock:
+            cell = self._points.pop(key, None)
+            if cell is not None:
+                self._discard(key, cell)
+
+    def _discard(self, key, cell):
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def get(self, key):
+        """Returns (lat, lon, payload) for an indexed key, or None."""
+        with self._lock:
+            cell = self._points.get(key)
+            if cell is None:
+                return None
+            return self._cells[cell][key]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+
+    def cell_counts(self):
+        """Returns a snapshot of {cell: number of points} for every occupied cell."""
+        with self._lock:
+            return {cell: len(bucket) for cell, bucket in self._cells.items()}
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def nearest(self, lat, lon, radius_km, k=None):
+        """
+        Find indexed points within `radius_km` of (lat, lon), closest first.
+
+        Returns a list of (distance_km, key, lat, lon, payload) tuples, at most
+        `k` long when k is given. Cells are visited ring by ring and the search
+        stops as soon as the k-th best distance is inside the area already covered.
+        """
+        cell_km_lat = self.cell_size_deg * KM_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        lon_ratio = 1.0 / cos_lat  # lon cells are narrower than lat cells away from the equator
+        max_ring = math.ceil(radius_km / cell_km_lat) + 1
+        row0, col0 = self.cell_for(lat, lon)
+
+        best = []  # max-heap of (-distance, key, lat, lon, payload) when k is set
+        found = []
+        prev_col_span = -1
+        with self._lock:
+            for ring in range(max_ring + 1):
+                col_span = math.ceil(ring * lon_ratio)
+                for d_row in range(-ring, ring + 1):
+                    if abs(d_row) == ring:
+                        col_offsets = range(-col_span, col_span + 1)
+                    else:
+                        col_offsets = [*range(-col_span, -prev_col_span), *range(prev_col_span + 1, col_span + 1)]
+                    for d_col in col_offsets:
+                        bucket = self._cells.get((row0 + d_row, col0 + d_col))
+                        if not bucket:
+                            continue
+                        for key, (p_lat, p_lon, payload) in bucket.items():
+                            distance = calculate_distance(lat, lon, p_lat, p_lon)
+                            if distance > radius_km:
+                                continue
+                            if k is None:
+                                found.append((distance, key, p_lat, p_lon, payload))
+                            elif len(best) < k:
+                                heapq.heappush(best, (-distance, key, p_lat, p_lon, payload))
+                            elif distance < -best[0][0]:
+                                heapq.heapreplace(best, (-distance, key, p_lat, p_lon, payload))
+                prev_col_span = col_span
+
+                covered_km = ring * cell_km_lat
+                if covered_km >= radius_km:
+                    break
+                if k is not None and len(best) == k and -best[0][0] <= covered_km:
+                    break
+
+        if k is not None:
+            found = [(-neg_distance, key, p_lat, p_lon, payload) for neg_distance, key, p_lat, p_lon, payload in best]
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+class DriverLocationIndex(SpatialGridIndex):
+    """
+    Grid index of verified AVAILABLE drivers keyed by DriverProfile.id.
+
+    The index is rebuilt from the database on first use and then kept current by
+    the endpoints that change a driver's availability, verification or position.
+    Changes committed by other processes (other web workers, `flask dispatch`)
+    are picked up by `resync`, which re-reads the profiles whose updated_at moved
+    past a watermark; run it on a timer with DRIVER_INDEX_RESYNC_INTERVAL_SECONDS.
+    """
+
+    # Re-read this much before the watermark: updated_at is stamped at flush, and the
+    # transaction may commit later than a row stamped after it
+    RESYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+    def __init__(self, cell_size_deg=0.01):
+        super().__init__(cell_size_deg)
+        self._loaded = False
+        self._watermark = None  # Newest DriverProfile.updated_at applied to the index
+        self._task = None
+
+    def init_app(self, app):
+        self.cell_size_deg = app.config.get('DRIVER_INDEX_CELL_SIZE_DEG', self.cell_size_deg)
+        self.reset()
+        interval = app.config.get('DRIVER_INDEX_RESYNC_INTERVAL_SECONDS', 0)
+        if interval > 0:
+            self._task = PeriodicTask(app, interval, self.resync, name='driver-index-resync')
+            self._task.start()
+
+    def reset(self):
+        with self._lock:
+            self.clear()
+            self._loaded = False
+            self._watermark = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def ensure_loaded(self):
+        """Populates the index from the database once. Requires an app context."""
+        if self._loaded:
+            return
+        from .models import DriverProfile
+        from .location_buffer import location_buffer
+        from . import db
+
+        with self._lock:
+            if self._loaded:
+                return
+            # Taken first, so a change committed while the rows load is re-read by the next resync
+            watermark = db.session.query(func.max(DriverProfile.updated_at)).scalar()
+            rows = db.session.query(
+                DriverProfile.id,
+                DriverProfile.user_id,
+                DriverProfile.current_latitude,
+                DriverProfile.current_longitude
+            ).filter(
+                DriverProfile.availability_status == 'AVAILABLE',
+                DriverProfile.is_verified == True
+            ).all()
+            self.clear()
+            for profile_id, user_id, lat, lon in rows:
+                buffered = location_buffer.get(profile_id) # Unflushed pings are newer than the row
+                if buffered:
+                    lat, lon = buffered[0], buffered[1]
+                if lat is not None and lon is not None:
+                    self.upsert(profile_id, lat, lon, user_id)
+            self._watermark = watermark
+            self._loaded = True
+
+    def resync(self):
+        """
+        Applies profiles changed since the last load or resync, by any process:
+        drivers who went OFFLINE/BUSY or lost verification are dropped, newly
+        AVAILABLE ones added, flushed positions moved. Returns the number of rows
+        re-read. A no-op until the index is loaded. Requires an app context.
+        """
+        if not self._loaded:
+            return 0
+        from .models import DriverProfile
+        from .location_buffer import location_buffer
+        from . import db
+
+        with self._lock:
+            query = db.session.query(
+                DriverProfile.id,
+                DriverProfile.user_id,
+                DriverProfile.availability_status,
+                DriverProfile.is_verified,
+                DriverProfile.current_latitude,
+                DriverProfile.current_longitude,
+                DriverProfile.updated_at
+            )
+            if self._watermark is not None:
+                query = query.filter(DriverProfile.updated_at >= self._watermark - self.RESYNC_OVERLAP)
+            rows = query.all()
+            for profile_id, user_id, status, is_verified, lat, lon, updated_at in rows:
+                buffered = location_buffer.get(profile_id)
+                if buffered:
+                    lat, lon = buffered[0], buffered[1]
+                if status == 'AVAILABLE' and is_verified and lat is not None and lon is not None:
+                    self.upsert(profile_id, lat, lon, user_id)
+                else:
+                    self.remove(profile_id)
+                if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+        return len(rows)
+
+    @staticmethod
+    def is_dispatchable(profile):
+        return (profile.availability_status == 'AVAILABLE' and profile.is_verified
+                and profile.current_latitude is not None and profile.current_longitude is not None)
+
+    def sync_profile(self, profile):
+        """Adds, moves or drops a driver after its DriverProfile row has been committed."""
+        if self.is_dispatchable(profile):
+            self.upsert(profile.id, profile.current_latitude, profile.current_longitude, profile.user_id)
+        else:
+            self.remove(profile.id)
+
+
+driver_index = DriverLocationIndex()
@@ -0,0 +1,87 @@
+"""Password hashing off the request thread, in a bounded process pool."""
+import concurrent.futures
+import multiprocessing
+import threading
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# Forking a process that already runs threads (PeriodicTask, DB pools) can copy held locks into the child
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the pool already has its maximum number of hashes queued."""
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug hashing in worker processes so a burst of logins burns CPU
+    outside the web workers' GIL instead of stalling every other request.
+
+    At most `workers + max_pending` hashes are admitted at once; anything beyond
+    that fails fast with PasswordHashingBusy, which the auth routes turn into a
+    503. With workers=0 hashing runs inline (tests, scripts).
+
+    Every web worker process gets its own pool, so keep `workers` small. The
+    pool's processes come from a forkserver (spawn where there is none) rather
+    than a fork of a web worker that is already running background threads.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:600000', workers=0, max_pending=0, timeout_seconds=10):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.shutdown()
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.timeout_seconds = app.config.get('PASSWORD_HASH_TIMEOUT_SECONDS', self.timeout_seconds)
+
+    def _get_executor(self):
+        # Created on first use so pre-forking servers start the pool inside each worker
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(_START_METHOD)
+                )
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+            return self._executor, self._slots
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        executor, slots = self._get_executor()
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except concurrent.futures.TimeoutError:
+            raise PasswordHashingBusy() from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+
+password_hasher = PasswordHasher()
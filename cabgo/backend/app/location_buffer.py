@@ -0,0 +1,142 @@
+"""Write-behind buffer for high-frequency driver GPS pings."""
+import atexit
+import datetime
+from datetime import timezone
+import threading
+
+from flask import current_app
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .background import PeriodicTask
+from .models import DriverProfile
+
+
+class LocationBuffer:
+    """
+    Keeps the latest position per driver in memory and writes coalesced
+    positions to DriverProfile in one bulk UPDATE per flush interval.
+
+    A driver that pings ten times between flushes costs one row update. The
+    buffer is bounded: recording a new driver when it is full wakes the
+    background flusher rather than writing on the caller's thread (which may be
+    the ASGI event loop); without one, it flushes inline. A flush never moves a
+    row back to an older position than it already holds.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.app = None
+        self.max_entries = max_entries
+        self._latest = {}  # driver_profile_id -> (lat, lon, recorded_at)
+        self._lock = threading.Lock()
+        self._task = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_entries = app.config.get('LOCATION_BUFFER_MAX_ENTRIES', self.max_entries)
+        interval = app.config.get('LOCATION_FLUSH_INTERVAL_SECONDS', 0)
+        if interval > 0:
+            self._task = PeriodicTask(app, interval, self.flush, name='location-flush', run_on_stop=True)
+            self._task.start()
+        atexit.register(self.shutdown)
+
+    def record(self, driver_profile_id, lat, lon, recorded_at=None):
+        recorded_at = recorded_at or datetime.datetime.now(timezone.utc)
+        with self._lock:
+            needs_flush = driver_profile_id not in self._latest and len(self._latest) >= self.max_entries
+        if needs_flush:
+            if self._task is not None and self._task.running:
+                self._task.wake()  # Overshoots the bound until the flush lands
+            else:
+                self.flush()
+        with self._lock:
+            self._latest[driver_profile_id] = (lat, lon, recorded_at)
+
+    def get(self, driver_profile_id):
+        """Returns the buffered (lat, lon, recorded_at) for a driver, or None if nothing is pending."""
+        return self._latest.get(driver_profile_id)
+
+    def discard(self, driver_profile_id):
+        with self._lock:
+            self._latest.pop(driver_profile_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._latest.clear()
+
+    def __len__(self):
+        return len(self._latest)
+
+    def flush(self):
+        """Writes all pending positions in one bulk UPDATE. Requires an app context."""
+        with self._lock:
+            pending, self._latest = self._latest, {}
+        if not pending:
+            return 0
+
+        rows = [
+            {'profile_id': profile_id, 'lat': lat, 'lon': lon, 'recorded_at': recorded_at}
+            for profile_id, (lat, lon, recorded_at) in pending.items()
+        ]
+        try:
+            self._write(rows)
+        except Exception as e:
+            db.session.rollback()
+            # Retry row by row so one unwritable position (a value the driver
+            # cannot bind, a row the database rejects) is dropped instead of
+            # holding back the whole batch. An operational failure (database
+            # down or locked) is not the rows' fault: keep them for next time.
+            written, dropped = 0, []
+            for index, row in enumerate(rows):
+                try:
+                    self._write([row])
+                    written += 1
+                except OperationalError:
+                    db.session.rollback()
+                    self._requeue({row['profile_id']: pending[row['profile_id']] for row in rows[index:]})
+                    if not written and not dropped:
+                        raise
+                    break
+                except Exception:
+                    db.session.rollback()
+                    dropped.append(row['profile_id'])
+            if dropped:
+                current_app.logger.error(f"Dropped unwritable buffered locations for driver profiles {dropped}: {e}")
+            return written
+        return len(rows)
+
+    def _write(self, rows):
+        # Core executemany rather than ORM bulk-by-PK: a profile deleted since its
+        # last ping simply matches no row instead of failing the whole batch
+        # The recency guard keeps a late flush (or another worker's) from overwriting a
+        # newer position committed with an availability change
+        table = DriverProfile.__table__
+        stmt = update(table).where(
+            table.c.id == bindparam('profile_id'),
+            or_(table.c.last_location_update.is_(None), table.c.last_location_update < bindparam('recorded_at'))
+        ).values(
+            current_latitude=bindparam('lat'),
+            current_longitude=bindparam('lon'),
+            last_location_update=bindparam('recorded_at')
+        )
+        db.session.execute(stmt, rows)
+        db.session.commit()
+
+    def _requeue(self, pending):
+        # Put the positions back unless a newer ping already replaced them
+        with self._lock:
+            for profile_id, position in pending.items():
+                if profile_id not in self._latest and len(self._latest) < self.max_entries:
+                    self._latest[profile_id] = position
+
+    def shutdown(self):
+        if self._task is not None:
+            self._task.stop()  # Runs a final flush
+            self._task = None
+        elif self.app is not None and self._latest:
+            with self.app.app_context():
+                self.flush()
+
+
+location_buffer = LocationBuffer()
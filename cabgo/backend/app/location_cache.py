@@ -0,0 +1,119 @@
+"""Deduplicates Location rows so repeat pickups and dropoffs reuse one row."""
+import collections
+import threading
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Location
+
+_PENDING_KEY = 'interned_locations'
+
+
+class LocationInterner:
+    """
+    Maps snapped (latitude, longitude) pairs to Location ids.
+
+    Coordinates are rounded to `decimals` places and looked up in a bounded
+    in-memory LRU cache, then in the unique (latitude, longitude) index, and
+    only inserted when neither has them. A reused row keeps the address
+    details of the booking that first created it.
+
+    Ids of rows inserted by the current transaction are only cached once it
+    commits, so a rollback can never leave a dangling id in the cache.
+    """
+
+    def __init__(self, decimals=5, max_entries=100000):
+        self.decimals = decimals
+        self.max_entries = max_entries
+        self._cache = collections.OrderedDict()  # (lat, lon) -> location id
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.decimals = app.config.get('LOCATION_SNAP_DECIMALS', self.decimals)
+        self.max_entries = app.config.get('LOCATION_CACHE_MAX_ENTRIES', self.max_entries)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def snap(self, lat, lon):
+        return (round(float(lat), self.decimals), round(float(lon), self.decimals))
+
+    def _remember(self, key, location_id):
+        with self._lock:
+            self._cache[key] = location_id
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            location_id = self._cache.get(key)
+            if location_id is not None:
+                self._cache.move_to_end(key)
+            return location_id
+
+    def intern(self, lat, lon, address_line1=None, city=None, state=None, postal_code=None):
+        """Returns the id of the Location at the snapped coordinates, creating it if needed."""
+        key = self.snap(lat, lon)
+        location_id = self._lookup(key)
+        if location_id is not None:
+            return location_id
+
+        session = db.session()
+        pending = session.info.setdefault(_PENDING_KEY, {})
+        if key in pending:
+            return pending[key]
+
+        location_id = self._select_id(session, key)
+        if location_id is not None:
+            self._remember(key, location_id)
+            return location_id
+
+        # Skip the insert if a concurrent booking created the same point first
+        stmt = self._insert_ignoring_duplicates().values(
+            latitude=key[0], longitude=key[1], address_line1=address_line1,
+            city=city, state=state, postal_code=postal_code
+        )
+        session.execute(stmt)
+        location_id = self._select_id(session, key)
+        pending[key] = location_id
+        return location_id
+
+    @staticmethod
+    def _select_id(session, key):
+        return session.query(Location.id).filter(Location.latitude == key[0], Location.longitude == key[1]).scalar()
+
+    @staticmethod
+    def _insert_ignoring_duplicates():
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            return insert(Location)
+        return dialect_insert(Location).on_conflict_do_nothing(index_elements=['latitude', 'longitude'])
+
+    def _promote_pending(self, session):
+        for key, location_id in session.info.pop(_PENDING_KEY, {}).items():
+            self._remember(key, location_id)
+
+
+location_interner = LocationInterner()
+
+
+@event.listens_for(Session, 'after_commit')
+def _cache_committed_locations(session):
+    location_interner._promote_pending(session)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_locations(session):
+    session.info.pop(_PENDING_KEY, None)
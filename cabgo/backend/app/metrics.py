@@ -0,0 +1,318 @@
+"""Request, database and in-memory index metrics, served as Prometheus text at /metrics."""
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+from .background import PeriodicTask
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# name -> (type, help)
+METRICS = {
+    'cabgo_http_requests_total': ('counter', 'Requests handled, by endpoint and status code.'),
+    'cabgo_http_request_errors_total': ('counter', 'Requests that raised or returned a 5xx, by endpoint.'),
+    'cabgo_http_request_duration_seconds': ('histogram', 'Request latency from before_request to teardown_request.'),
+    'cabgo_http_requests_in_flight': ('gauge', 'Requests currently being handled.'),
+    'cabgo_db_pool_checkouts_total': ('counter', 'Connections checked out of the pool, by engine.'),
+    'cabgo_db_pool_checked_out': ('gauge', 'Connections currently checked out of the pool, by engine and process.'),
+    'cabgo_index_entries': ('gauge', 'Entries held by an in-memory index or cache, by index and process.'),
+}
+
+
+class _Shard:
+    """One thread's counters and histograms. Only the owning thread writes to it, so recording takes no lock."""
+    __slots__ = ('thread', 'counters', 'histograms', 'in_flight')
+
+    def __init__(self, thread):
+        self.thread = weakref.ref(thread)
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self.in_flight = 0
+
+
+class MetricsRegistry:
+    """
+    Per-process metrics with per-thread shards: a request adds to its own
+    thread's shard without locking, and a scrape sums the shards. Shards of
+    finished threads are folded into a retired total so counts are never lost.
+
+    With METRICS_MULTIPROC_DIR set (one directory shared by all workers of a
+    deployment), every process writes its snapshot to <dir>/<pid>.json every
+    METRICS_FLUSH_INTERVAL_SECONDS and on exit, and /metrics merges all of
+    them: counters and histograms are summed, including those of exited
+    workers; in-flight requests are summed over live workers; pool and index
+    gauges are per process and carry a pid label. A scrape sees other workers
+    as of their last flush.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.multiproc_dir = None
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(threading.current_thread())
+        self._lock = threading.Lock()
+        self._gauge_callbacks = []  # () -> [(name, labels, value)]
+        self._task = None
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.buckets = tuple(app.config.get('METRICS_LATENCY_BUCKETS', self.buckets))
+        self.multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR')
+        self._gauge_callbacks = []
+        app.before_request(self._start_request)
+        app.after_request(self._remember_status)
+        app.teardown_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+
+        from . import db
+        with app.app_context():
+            for name, engine in db.engines.items():
+                self._instrument_pool(engine, name or 'primary')
+        self._register_index_gauges()
+
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            interval = app.config.get('METRICS_FLUSH_INTERVAL_SECONDS', 0)
+            if interval > 0:
+                self._task = PeriodicTask(app, interval, self.write_snapshot, name='metrics-flush')
+                self._task.start()
+            atexit.register(self.write_snapshot)
+
+    def reset(self):
+        with self._lock:
+            self._shards = []
+            self._retired = _Shard(threading.current_thread())
+        self._local = threading.local()
+
+    # Recording
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def add_gauge_callback(self, callback):
+        """`callback()` returns [(name, labels, value)], read at every scrape/snapshot of this process."""
+        self._gauge_callbacks.append(callback)
+
+    def request_started(self):
+        self._shard().in_flight += 1
+
+    def request_finished(self, method, endpoint, status, seconds):
+        """Records one served request; `endpoint` is the route pattern, not the path."""
+        shard = self._shard()
+        shard.in_flight -= 1
+        labels = (('method', method), ('endpoint', endpoint))
+        self.inc('cabgo_http_requests_total', labels + (('status', str(status)),))
+        if status >= 500:
+            self.inc('cabgo_http_request_errors_total', labels)
+        self.observe('cabgo_http_request_duration_seconds', labels, seconds)
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        self.request_started()
+
+    def _remember_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish_request(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        status = 500 if exc is not None else g.pop('metrics_status', 500)
+        # The URL rule, not the path, so /api/admin/users/<id> is one series
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        self.request_finished(request.method, endpoint, status, time.perf_counter() - started)
+
+    def _instrument_pool(self, engine, name):
+        labels = (('engine', name),)
+
+        @event.listens_for(engine, 'checkout')
+        def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.inc('cabgo_db_pool_checkouts_total', labels)
+
+        checkedout = getattr(engine.pool, 'checkedout', None)
+        if checkedout is not None:
+            self.add_gauge_callback(lambda: [('cabgo_db_pool_checked_out', labels, checkedout())])
+
+    def _register_index_gauges(self):
+        from .geo_index import driver_index
+        from .location_buffer import location_buffer
+        from .location_cache import location_interner
+        from .routing import eta_engine
+        from .user_cache import user_cache
+
+        def sizes():
+            indexes = {
+                'driver_locations': len(driver_index),
+                'location_buffer': len(location_buffer),
+                'location_interner': len(location_interner),
+                'user_cache': len(user_cache),
+                'road_graph_nodes': len(eta_engine.graph) if eta_engine.graph is not None else 0,
+            }
+            return [('cabgo_index_entries', (('index', name),), size) for name, size in indexes.items()]
+        self.add_gauge_callback(sizes)
+
+    # Collection
+
+    def snapshot(self):
+        """This process's metrics as plain JSON-able data."""
+        counters, histograms, in_flight = {}, {}, 0
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread() is None or not shard.thread().is_alive():
+                    self._merge(self._retired, shard)
+                else:
+                    live.append(shard)
+            self._shards = live
+            shards = [self._retired] + live
+        for shard in shards:
+            for key, value in dict(shard.counters).items():
+                counters[key] = counters.get(key, 0) + value
+            for key, counts in dict(shard.histograms).items():
+                total = histograms.setdefault(key, [0] * len(counts))
+                for i, count in enumerate(list(counts)):
+                    total[i] += count
+            in_flight += shard.in_flight
+        gauges = [[name, list(labels), value] for callback in self._gauge_callbacks for name, labels, value in callback()]
+        return {
+            'pid': os.getpid(),
+            'buckets': list(self.buckets),
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), counts] for (name, labels), counts in histograms.items()],
+            'in_flight': in_flight,
+            'gauges': gauges,
+        }
+
+    @staticmethod
+    def _merge(into, shard):
+        for key, value in shard.counters.items():
+            into.counters[key] = into.counters.get(key, 0) + value
+        for key, counts in shard.histograms.items():
+            total = into.histograms.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+        into.in_flight += shard.in_flight
+
+    def write_snapshot(self):
+        """Atomically replaces this process's file in the multiprocess directory."""
+        if not self.multiproc_dir:
+            return
+        fd, path = tempfile.mkstemp(dir=self.multiproc_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path, os.path.join(self.multiproc_dir, f'{os.getpid()}.json'))
+
+    def _snapshots(self):
+        if not self.multiproc_dir:
+            return [self.snapshot()]
+        self.write_snapshot()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir, '*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Removed or replaced mid-read; its next write will be picked up
+        return snapshots
+
+    def render(self):
+        """Prometheus text exposition of every process's metrics."""
+        own_pid = os.getpid()
+        series = {name: {} for name in METRICS}  # name -> {labels: value or bucket counts}
+        buckets = self.buckets
+        for snapshot in self._snapshots():
+            pid = snapshot['pid']
+            alive = pid == own_pid or _pid_alive(pid)
+            for name, labels, value in snapshot['counters']:
+                key = tuple(map(tuple, labels))
+                series[name][key] = series[name].get(key, 0) + value
+            if snapshot['buckets'] == list(buckets):
+                for name, labels, counts in snapshot['histograms']:
+                    total = series[name].setdefault(tuple(map(tuple, labels)), [0] * len(counts))
+                    for i, count in enumerate(counts):
+                        total[i] += count
+            if not alive:
+                continue  # An exited worker's counts stay; its gauges do not
+            in_flight = series['cabgo_http_requests_in_flight']
+            in_flight[()] = in_flight.get((), 0) + snapshot['in_flight']
+            for name, labels, value in snapshot['gauges']:
+                key = tuple(map(tuple, labels))
+                if self.multiproc_dir:
+                    key += (('pid', str(pid)),)
+                series[name][key] = value
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series[name].items()):
+                if kind != 'histogram':
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+    def _metrics_view(self):
+        return Response(self.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = MetricsRegistry()
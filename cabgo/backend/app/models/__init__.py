@@ -5,3 +5,6 @@ from .location import Location
 from .ride import Ride
 from .driver_profile import DriverProfile
 from .vehicle import Vehicle
+from .platform_counter import PlatformCounter
+from .ride_rollup import RideHourlyRollup, RollupWatermark
+from .token_revocation import TokenRevocation
@@ -4,6 +4,12 @@ from datetime import timezone # Import timezone
 
 class DriverProfile(db.Model):
     __tablename__ = 'driver_profiles'
+    __table_args__ = (
+        # Available + verified drivers (availability listing, driver index load)
+        db.Index('ix_driver_profiles_availability_verified', 'availability_status', 'is_verified'),
+        # Driver index resync: profiles changed since a watermark
+        db.Index('ix_driver_profiles_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True, index=True)
@@ -17,7 +23,7 @@ class DriverProfile(db.Model):
         ('BUSY', 'Busy'), # On a ride
         ('OFFLINE', 'Offline')
     ]
-    availability_status = db.Column(db.String(20), default='OFFLINE', nullable=False, index=True)
+    availability_status = db.Column(db.String(20), default='OFFLINE', nullable=False)
     current_latitude = db.Column(db.Float, nullable=True) # Optional: if driver's location is tracked independently of vehicle
     current_longitude = db.Column(db.Float, nullable=True)
     last_location_update = db.Column(db.DateTime, nullable=True)
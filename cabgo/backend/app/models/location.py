@@ -3,6 +3,10 @@ import datetime
 
 class Location(db.Model):
     __tablename__ = 'locations'
+    __table_args__ = (
+        # Bookings reuse rows for the same snapped point (see app.location_cache)
+        db.Index('ux_locations_latitude_longitude', 'latitude', 'longitude', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     latitude = db.Column(db.Float, nullable=False)
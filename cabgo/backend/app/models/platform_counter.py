@@ -0,0 +1,11 @@
+from .. import db
+
+class PlatformCounter(db.Model):
+    """Materialized row counts for the admin dashboard, keyed by bucket name (see app.platform_stats)."""
+    __tablename__ = 'platform_counters'
+
+    name = db.Column(db.String(100), primary_key=True) # e.g. 'rides.status.completed'
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PlatformCounter {self.name}={self.value}>'
@@ -4,10 +4,21 @@ from datetime import timezone # Import timezone
 
 class Ride(db.Model):
     __tablename__ = 'rides'
+    __table_args__ = (
+        # Keyset scans of the rollup job (see app.rollups) and the unfiltered admin listing
+        db.Index('ix_rides_requested_at_id', 'requested_at', 'id'),
+        db.Index('ix_rides_cancelled_at_id', 'cancelled_at', 'id'),
+        # Equality filter + newest-first keyset order; these replace the single-column indexes
+        # (checked by tests/backend/test_query_plans.py)
+        db.Index('ix_rides_passenger_id_requested_at', 'passenger_id', 'requested_at', 'id'), # Ride history
+        db.Index('ix_rides_status_requested_at', 'status', 'requested_at', 'id'), # Admin listing, dispatch, surge
+        db.Index('ix_rides_driver_id_requested_at', 'driver_id', 'requested_at', 'id'), # Admin listing by driver
+        db.Index('ix_rides_status_completed_at', 'status', 'completed_at', 'id'), # Completed-ride rollups, speed profiles
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    passenger_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    driver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True) # Nullable until a driver accepts
+    passenger_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    driver_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True) # Nullable until a driver accepts
     
     pickup_location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False)
     dropoff_location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False)
@@ -29,7 +40,7 @@ class Ride(db.Model):
         ('CANCELLED_ADMIN', 'Cancelled by Admin'), # New status
         ('NO_DRIVERS_FOUND', 'No Drivers Found')
     ]
-    status = db.Column(db.String(50), default='REQUESTED', nullable=False, index=True) # e.g., REQUESTED, ACCEPTED, IN_PROGRESS, COMPLETED, CANCELLED
+    status = db.Column(db.String(50), default='REQUESTED', nullable=False) # e.g., REQUESTED, ACCEPTED, IN_PROGRESS, COMPLETED, CANCELLED
 
     requested_at = db.Column(db.DateTime, default=lambda: datetime.datetime.now(timezone.utc))
     accepted_at = db.Column(db.DateTime, nullable=True)
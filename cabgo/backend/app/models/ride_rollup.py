@@ -0,0 +1,31 @@
+from .. import db
+
+class RideHourlyRollup(db.Model):
+    """
+    Ride events per hour, pickup city, requested vehicle type and status, filled
+    incrementally by app.rollups. `status` is the event the row counts:
+    REQUESTED (by requested_at), COMPLETED (by completed_at) or a CANCELLED_*
+    status (by cancelled_at).
+    """
+    __tablename__ = 'ride_hourly_rollups'
+
+    bucket_start = db.Column(db.DateTime, primary_key=True) # UTC hour
+    city = db.Column(db.String(100), primary_key=True) # '' when the pickup has no city
+    vehicle_type = db.Column(db.String(50), primary_key=True) # '' when none was requested
+    status = db.Column(db.String(50), primary_key=True)
+    ride_count = db.Column(db.Integer, nullable=False, default=0)
+    fare_total = db.Column(db.Float, nullable=False, default=0.0) # Actual fares for COMPLETED, estimates otherwise
+
+    def __repr__(self):
+        return f'<RideHourlyRollup {self.bucket_start} {self.city}/{self.vehicle_type}/{self.status}: {self.ride_count}>'
+
+class RollupWatermark(db.Model):
+    """Last (timestamp, ride id) folded into the rollups, per event stream."""
+    __tablename__ = 'rollup_watermarks'
+
+    stream = db.Column(db.String(50), primary_key=True)
+    last_timestamp = db.Column(db.DateTime, nullable=False)
+    last_ride_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<RollupWatermark {self.stream} @ {self.last_timestamp}/{self.last_ride_id}>'
@@ -0,0 +1,11 @@
+from .. import db
+
+class TokenRevocation(db.Model):
+    """Per-user "not before" time for access tokens, shared by every worker process (see app.tokens)."""
+    __tablename__ = 'token_revocations'
+
+    user_id = db.Column(db.Integer, primary_key=True) # No foreign key: deleted users stay revoked
+    revoked_at = db.Column(db.Float, nullable=False, index=True) # Epoch seconds, comparable with a token's iat
+
+    def __repr__(self):
+        return f'<TokenRevocation user {self.user_id} @ {self.revoked_at}>'
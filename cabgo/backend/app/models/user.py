@@ -1,5 +1,5 @@
 from .. import db # Import the db instance from the app package (__init__.py)
-from werkzeug.security import generate_password_hash, check_password_hash
+from ..hashing import password_hasher
 import datetime
 from datetime import timezone # Import timezone
 
@@ -26,11 +26,12 @@ class User(db.Model):
 
     # driver_profile is created by backref in DriverProfile.user
 
+    # Both may raise PasswordHashingBusy when the hashing pool is saturated
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.email}>'
@@ -0,0 +1,57 @@
+"""Helpers for keyset (cursor) pagination on (timestamp, id) orderings."""
+import base64
+import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp, row_id):
+    """Opaque, URL-safe cursor for the position just after (timestamp, row_id)."""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except Exception as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parses a ?limit= value. Raises ValueError when it is not an integer in 1..maximum."""
+    if value is None:
+        return default
+    limit = int(value)
+    if not 1 <= limit <= maximum:
+        raise ValueError(f'limit must be between 1 and {maximum}')
+    return limit
+
+
+def before_cursor(timestamp_column, id_column, cursor):
+    """Filter for rows after `cursor` in (timestamp DESC, id DESC) order.
+
+    Spelled out as OR/AND rather than a row-value comparison so the planner can
+    use a (…, timestamp, id) index range on every backend.
+    """
+    timestamp, row_id = cursor
+    return or_(timestamp_column < timestamp, and_(timestamp_column == timestamp, id_column < row_id))
+
+
+def after_cursor(timestamp_column, id_column, cursor):
+    """Filter for rows after `cursor` in (timestamp ASC, id ASC) order; the mirror of before_cursor."""
+    timestamp, row_id = cursor
+    return or_(timestamp_column > timestamp, and_(timestamp_column == timestamp, id_column > row_id))
+
+
+def paginate(rows, limit, key):
+    """Splits a limit+1 result into (page, next_cursor). `key(row)` returns (timestamp, id)."""
+    page = rows[:limit]
+    next_cursor = encode_cursor(*key(page[-1])) if len(rows) > limit and page else None
+    return page, next_cursor
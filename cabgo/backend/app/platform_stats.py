@@ -0,0 +1,223 @@
+"""Admin dashboard counts: grouped COUNT queries, or incrementally maintained counters."""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, inspect, insert, update
+from sqlalchemy.orm import Session
+
+from . import db
+from .db_routing import use_primary
+from .models import User, DriverProfile, Ride, Vehicle, PlatformCounter
+
+# One counted column per table; every dashboard figure is a sum of these buckets
+COUNTED_COLUMNS = {
+    User: 'is_driver',
+    DriverProfile: 'is_verified',
+    Ride: 'status',
+    Vehicle: 'is_active',
+}
+SEEDED_MARKER = '_seeded'
+
+
+def bucket_name(model, value):
+    return f"{model.__tablename__}.{COUNTED_COLUMNS[model]}.{str(value).lower()}"
+
+
+def count_by_group():
+    """Current bucket counts with one GROUP BY query per table."""
+    buckets = {}
+    for model, column_name in COUNTED_COLUMNS.items():
+        column = getattr(model, column_name)
+        for value, count in db.session.query(column, func.count()).group_by(column):
+            buckets[bucket_name(model, value)] = count
+    return buckets
+
+
+def build_stats(buckets):
+    """Shapes bucket counts into the /api/admin/stats payload."""
+    def count(model, value):
+        return buckets.get(bucket_name(model, value), 0)
+
+    total_drivers = count(User, True)
+    verified_drivers = count(DriverProfile, True)
+    total_vehicles = count(Vehicle, True) + count(Vehicle, False)
+    active_vehicles = count(Vehicle, True)
+    rides_by_status = {code.lower(): count(Ride, code) for code, _ in Ride.status_choices}
+    ride_prefix = f"{Ride.__tablename__}.status."
+    return {
+        'total_users': total_drivers + count(User, False),
+        'drivers': {
+            'total': total_drivers,
+            'verified': verified_drivers,
+            'unverified': total_drivers - verified_drivers
+        },
+        'rides': {
+            'total': sum(value for name, value in buckets.items() if name.startswith(ride_prefix)),
+            'by_status': rides_by_status
+        },
+        'vehicles': {
+            'total': total_vehicles,
+            'active': active_vehicles,
+            'inactive': total_vehicles - active_vehicles
+        }
+    }
+
+
+class PlatformCounters:
+    """
+    Keeps `platform_counters` in step with the counted columns.
+
+    A Session after_flush hook turns inserts, deletes and changes of a counted
+    column into per-bucket deltas and upserts them on the flush's own connection,
+    so counters commit or roll back with the rows they describe. Core bulk
+    statements bypass the hook and must call `adjust` themselves. The table is
+    (re)built from GROUP BY counts on first read or with `flask rebuild-platform-counters`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PLATFORM_COUNTERS_ENABLED', False)
+        app.cli.add_command(rebuild_platform_counters_command)
+
+    @staticmethod
+    def _upsert(table, dialect):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            return None
+        stmt = dialect_insert(table)
+        return stmt.on_conflict_do_update(index_elements=['name'], set_={'value': table.c.value + stmt.excluded.value})
+
+    def adjust(self, session, deltas):
+        """Adds {bucket: delta} to the counters inside the session's current transaction."""
+        if not self.enabled:
+            return
+        params = [{'name': name, 'value': delta} for name, delta in deltas.items() if delta]
+        if not params:
+            return
+        table = PlatformCounter.__table__
+        connection = session.connection()
+        upsert = self._upsert(table, connection.dialect.name)
+        if upsert is not None:
+            connection.execute(upsert, params)
+            return
+        for row in params:
+            updated = connection.execute(
+                update(table).where(table.c.name == row['name']).values(value=table.c.value + row['value'])
+            ).rowcount
+            if not updated:
+                connection.execute(insert(table).values(**row))
+
+    def read(self):
+        """Bucket counts from the counters table, or None if it has not been built yet."""
+        buckets = dict(db.session.query(PlatformCounter.name, PlatformCounter.value))
+        if not buckets.pop(SEEDED_MARKER, None):
+            return None
+        return buckets
+
+    def _lock_table(self, session):
+        """
+        Blocks other counter writers until the current transaction ends.
+
+        On SQLite the first write of a transaction takes the database write
+        lock and reads from then on see the latest commit, so the caller only
+        has to write before it counts. PostgreSQL needs an explicit table lock.
+        """
+        connection = session.connection()
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql(f"LOCK TABLE {PlatformCounter.__tablename__} IN EXCLUSIVE MODE")
+
+    def rebuild(self):
+        """
+        Replaces the counters with fresh GROUP BY counts in one transaction and commits. Returns the buckets.
+
+        The counters are locked before anything is counted, so a concurrent
+        delta either lands in the counts or waits and applies on top of them.
+        Writers outside the flush hook (bulk SQL that skips `adjust`) are not
+        covered: run the CLI command with those quiesced.
+        """
+        table = PlatformCounter.__table__
+        use_primary(db.session)  # A lagging replica would bake stale counts into the counters
+        self._lock_table(db.session)
+        db.session.execute(table.delete())  # Write first: on SQLite this takes the lock
+        buckets = count_by_group()
+        db.session.execute(
+            insert(table),
+            [{'name': name, 'value': value} for name, value in buckets.items()] + [{'name': SEEDED_MARKER, 'value': 1}]
+        )
+        db.session.commit()
+        return buckets
+
+    def snapshot(self):
+        """Buckets for the dashboard: O(1) counter read when enabled, grouped counts otherwise."""
+        if not self.enabled:
+            return count_by_group()
+        buckets = self.read()
+        return buckets if buckets is not None else self.rebuild()
+
+
+platform_counters = PlatformCounters()
+
+
+def _committed_value(obj, column_name):
+    history = inspect(obj).attrs[column_name].history
+    return history.deleted[0] if history.deleted else getattr(obj, column_name)
+
+
+@event.listens_for(Session, 'before_flush')
+def _load_deleted_values(session, flush_context, instances):
+    # The rows are gone by after_flush, so make sure the bucket value is loaded now
+    if platform_counters.enabled:
+        for obj in session.deleted:
+            if type(obj) in COUNTED_COLUMNS:
+                getattr(obj, COUNTED_COLUMNS[type(obj)])
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_flushed_rows(session, flush_context):
+    if not platform_counters.enabled:
+        return
+    deltas = {}
+
+    def add(model, value, delta):
+        name = bucket_name(model, value)
+        deltas[name] = deltas.get(name, 0) + delta
+
+    for obj in session.new:
+        model = type(obj)
+        if model in COUNTED_COLUMNS:
+            add(model, getattr(obj, COUNTED_COLUMNS[model]), 1)
+    for obj in session.deleted:
+        model = type(obj)
+        if model in COUNTED_COLUMNS:
+            add(model, _committed_value(obj, COUNTED_COLUMNS[model]), -1)
+    for obj in session.dirty:
+        model = type(obj)
+        if model not in COUNTED_COLUMNS:
+            continue
+        history = inspect(obj).attrs[COUNTED_COLUMNS[model]].history
+        if history.added and history.deleted and history.added[0] != history.deleted[0]:
+            add(model, history.deleted[0], -1)
+            add(model, history.added[0], 1)
+    platform_counters.adjust(session, deltas)
+
+
+def _load_old_value_on_set(target, value, oldvalue, initiator):
+    return value
+
+
+# active_history makes the ORM load an expired column's old value before it is
+# overwritten, so the flush hook always knows which bucket a row is leaving.
+for _model, _column_name in COUNTED_COLUMNS.items():
+    event.listen(getattr(_model, _column_name), 'set', _load_old_value_on_set, active_history=True, retval=True)
+
+
+@click.command('rebuild-platform-counters')
+@with_appcontext
+def rebuild_platform_counters_command():
+    """Recomputes platform_counters from the tables (after bulk SQL or to repair drift; stop bulk jobs first)."""
+    buckets = platform_counters.rebuild()
+    click.echo(f"Rebuilt {len(buckets)} platform counter(s)")
@@ -0,0 +1,142 @@
+"""Per-request SQL instrumentation: query count, DB time and repeated statement shapes (N+1 detection)."""
+import collections
+import contextlib
+import re
+import threading
+import time
+
+from flask import current_app, g, request
+from sqlalchemy import event
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))+\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement):
+    """The statement with literals and IN-lists collapsed, so repeats of one query compare equal."""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _LITERAL.sub('?', shape)
+    return _IN_LIST.sub('(?...)', shape)
+
+
+class QueryStats:
+    """Queries seen while this collector was active (a request or an explicit capture)."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = collections.Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """[(shape, times)] for statements run at least `threshold` times, most repeated first."""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= threshold]
+
+    def report(self):
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f} ms"]
+        lines += [f"  {times}x {shape}" for shape, times in self.shapes.most_common()]
+        return '\n'.join(lines)
+
+
+class QueryInstrumentation:
+    """
+    Times every cursor execution on the app's engines and adds it to the
+    collectors active on the current thread: one per request (opened in
+    before_request) plus any opened with capture(). After each request the
+    totals are logged, statement shapes repeated `n_plus_one_threshold` times
+    or more are logged as likely N+1s, and in debug mode (or with
+    SQL_STATS_HEADERS) they are returned as X-DB-* and Server-Timing headers.
+
+    Queries run by a streamed response body happen after the response is
+    finalized and are not counted against the request.
+    """
+
+    def __init__(self, n_plus_one_threshold=5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.headers = False
+        self._local = threading.local()
+        self._engines = set()
+
+    def init_app(self, app):
+        from . import db
+
+        if not app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+            return
+        self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold)
+        headers = app.config.get('SQL_STATS_HEADERS')
+        self.headers = app.debug if headers is None else headers
+        with app.app_context():
+            for engine in db.engines.values():
+                self._instrument(engine)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._discard_request)
+
+    def _instrument(self, engine):
+        if engine in self._engines:
+            return
+        self._engines.add(engine)
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _collectors(self):
+        collectors = getattr(self._local, 'collectors', None)
+        if collectors is None:
+            collectors = self._local.collectors = []
+        return collectors
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        collectors = self._collectors()
+        if collectors:
+            duration = time.perf_counter() - conn.info['query_start']
+            for stats in collectors:
+                stats.record(statement, duration)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Collects the queries run on this thread inside the block (tests, scripts, CLI commands)."""
+        stats = QueryStats()
+        collectors = self._collectors()
+        collectors.append(stats)
+        try:
+            yield stats
+        finally:
+            collectors.remove(stats)
+
+    def _start_request(self):
+        g.query_stats = QueryStats()
+        self._collectors().append(g.query_stats)
+
+    def _finish_request(self, response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        self._collectors().remove(stats)
+        endpoint = f"{request.method} {request.path}"
+        current_app.logger.debug(f"{endpoint}: {stats.count} queries, {stats.duration * 1000:.1f} ms in DB")
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        for shape, times in repeated:
+            current_app.logger.warning(f"Possible N+1 in {endpoint}: statement ran {times} times: {shape}")
+        if self.headers:
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = f"{stats.duration * 1000:.2f}"
+            response.headers['X-DB-Repeated-Queries'] = str(len(repeated))
+            response.headers.add('Server-Timing', f"db;dur={stats.duration * 1000:.2f}")
+        return response
+
+    def _discard_request(self, exc):
+        # after_request is skipped when a handler raises; don't leak the collector
+        stats = g.pop('query_stats', None)
+        if stats is not None and stats in self._collectors():
+            self._collectors().remove(stats)
+
+
+query_stats = QueryInstrumentation()
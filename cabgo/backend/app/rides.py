@@ -1,8 +1,15 @@
 from flask import Blueprint, request, jsonify, current_app
-from .models import User, Ride, Location
+from .models import Ride
 from . import db
 from .decorators import token_required
+from .drivers import availability_committed, release_driver
+from .db_routing import read_replica
 from .utils import calculate_distance, calculate_fare
+from .surge import surge_engine
+from .routing import eta_engine
+from .location_cache import location_interner
+from .pagination import decode_cursor, parse_limit, paginate, before_cursor
+from .serializers import RIDE_HISTORY, json_response, pickup_location, dropoff_location
 import datetime
 
 rides_bp = Blueprint('rides', __name__)
@@ -27,51 +34,48 @@ def book_ride(current_user):
         return jsonify({'message': 'Latitude and longitude are required for both pickup and dropoff locations'}), 400
 
     try:
-        # Create Location objects
-        pickup_location = Location(
-            latitude=pickup_data['latitude'],
-            longitude=pickup_data['longitude'],
+        pickup_lat, pickup_lon = location_interner.snap(pickup_data['latitude'], pickup_data['longitude'])
+        dropoff_lat, dropoff_lon = location_interner.snap(dropoff_data['latitude'], dropoff_data['longitude'])
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Latitude and longitude must be numeric'}), 400
+
+    try:
+        # Reuse existing Location rows for the same (snapped) points
+        pickup_location_id = location_interner.intern(
+            pickup_lat, pickup_lon,
             address_line1=pickup_data.get('address_line1'),
             city=pickup_data.get('city'),
             state=pickup_data.get('state'),
             postal_code=pickup_data.get('postal_code')
         )
-        db.session.add(pickup_location)
-
-        dropoff_location = Location(
-            latitude=dropoff_data['latitude'],
-            longitude=dropoff_data['longitude'],
+        dropoff_location_id = location_interner.intern(
+            dropoff_lat, dropoff_lon,
             address_line1=dropoff_data.get('address_line1'),
             city=dropoff_data.get('city'),
             state=dropoff_data.get('state'),
             postal_code=dropoff_data.get('postal_code')
         )
-        db.session.add(dropoff_location)
-        
-        # Flush to get IDs for pickup and dropoff locations before creating the ride
-        db.session.flush()
 
         vehicle_type_requested = data.get('vehicle_type', 'SEDAN') # Default to SEDAN if not provided
 
         # Calculate distance
-        distance_km = calculate_distance(
-            pickup_location.latitude,
-            pickup_location.longitude,
-            dropoff_location.latitude,
-            dropoff_location.longitude
-        )
+        distance_km = calculate_distance(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
 
-        # Calculate estimated fare
+        # Calculate estimated fare, priced for the pickup zone's current demand
+        surge_multiplier = surge_engine.multiplier_at(pickup_lat, pickup_lon)
         estimated_fare = calculate_fare(
             distance_km=distance_km, 
-            vehicle_type=vehicle_type_requested
+            vehicle_type=vehicle_type_requested,
+            surge_multiplier=surge_multiplier
         )
 
+        estimated_duration_minutes = eta_engine.travel_time_minutes(pickup_lat, pickup_lon, dropoff_lat, dropoff_lon)
+
         # Create Ride object
         new_ride = Ride(
             passenger_id=current_user.id,
-            pickup_location_id=pickup_location.id,
-            dropoff_location_id=dropoff_location.id,
+            pickup_location_id=pickup_location_id,
+            dropoff_location_id=dropoff_location_id,
             status='REQUESTED',
             vehicle_type_requested=vehicle_type_requested,
             notes_for_driver=data.get('notes_for_driver'),
@@ -84,21 +88,24 @@ def book_ride(current_user):
             'id': new_ride.id,
             'passenger_id': new_ride.passenger_id,
             'pickup_location': {
-                'id': pickup_location.id,
-                'latitude': pickup_location.latitude,
-                'longitude': pickup_location.longitude,
-                'address': pickup_location.address_line1
+                'id': pickup_location_id,
+                'latitude': pickup_lat,
+                'longitude': pickup_lon,
+                'address': pickup_data.get('address_line1')
             },
             'dropoff_location': {
-                'id': dropoff_location.id,
-                'latitude': dropoff_location.latitude,
-                'longitude': dropoff_location.longitude,
-                'address': dropoff_location.address_line1
+                'id': dropoff_location_id,
+                'latitude': dropoff_lat,
+                'longitude': dropoff_lon,
+                'address': dropoff_data.get('address_line1')
             },
             'status': new_ride.status,
             'requested_at': new_ride.requested_at.isoformat(),
             'vehicle_type_requested': new_ride.vehicle_type_requested,
-            'notes_for_driver': new_ride.notes_for_driver
+            'notes_for_driver': new_ride.notes_for_driver,
+            'estimated_fare': new_ride.estimated_fare,
+            'surge_multiplier': surge_multiplier,
+            'estimated_duration_minutes': round(estimated_duration_minutes, 1)
         }
         return jsonify({'message': 'Ride booked successfully', 'ride': ride_details}), 201
 
@@ -107,49 +114,36 @@ def book_ride(current_user):
         current_app.logger.error(f"Error booking ride: {e}")
         return jsonify({'message': 'Failed to book ride due to an internal error'}), 500
 
+def build_ride_history_query(passenger_id, cursor=None):
+    """Column-projected history query (serializers.RIDE_HISTORY) with both locations joined in, newest first."""
+    query = db.session.query(*RIDE_HISTORY.columns)\
+        .outerjoin(pickup_location, Ride.pickup_location_id == pickup_location.id)\
+        .outerjoin(dropoff_location, Ride.dropoff_location_id == dropoff_location.id)\
+        .filter(Ride.passenger_id == passenger_id)
+    if cursor is not None:
+        query = query.filter(before_cursor(Ride.requested_at, Ride.id, cursor))
+    return query.order_by(Ride.requested_at.desc(), Ride.id.desc())
+
 @rides_bp.route('/history', methods=['GET'])
 @token_required
+@read_replica
 def ride_history(current_user):
+    """Passenger ride history, newest first. Paginate with ?limit= and ?before=<next_cursor>."""
     try:
-        # Fetch rides for the current user, ordered by most recent
-        user_rides = Ride.query.filter_by(passenger_id=current_user.id)\
-                               .order_by(Ride.requested_at.desc()).all()
+        limit = parse_limit(request.args.get('limit'))
+        before = request.args.get('before')
+        cursor = decode_cursor(before) if before else None
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-        if not user_rides:
-            return jsonify({'message': 'No ride history found for this user.', 'rides': []}), 200
+    try:
+        rides = RIDE_HISTORY.dump_all(build_ride_history_query(current_user.id, cursor).limit(limit + 1))
+        rides, next_cursor = paginate(rides, limit, key=lambda ride: (ride['requested_at'], ride['id']))
 
-        rides_data = []
-        for ride in user_rides:
-            pickup_loc = Location.query.get(ride.pickup_location_id)
-            dropoff_loc = Location.query.get(ride.dropoff_location_id)
-            
-            ride_info = {
-                'id': ride.id,
-                'status': ride.status,
-                'requested_at': ride.requested_at.isoformat() if ride.requested_at else None,
-                'accepted_at': ride.accepted_at.isoformat() if ride.accepted_at else None,
-                'started_at': ride.started_at.isoformat() if ride.started_at else None,
-                'completed_at': ride.completed_at.isoformat() if ride.completed_at else None,
-                'cancelled_at': ride.cancelled_at.isoformat() if ride.cancelled_at else None,
-                'estimated_fare': ride.estimated_fare,
-                'actual_fare': ride.actual_fare,
-                'payment_status': ride.payment_status,
-                'vehicle_type_requested': ride.vehicle_type_requested,
-                'pickup_location': {
-                    'latitude': pickup_loc.latitude if pickup_loc else None,
-                    'longitude': pickup_loc.longitude if pickup_loc else None,
-                    'address': pickup_loc.address_line1 if pickup_loc else None
-                },
-                'dropoff_location': {
-                    'latitude': dropoff_loc.latitude if dropoff_loc else None,
-                    'longitude': dropoff_loc.longitude if dropoff_loc else None,
-                    'address': dropoff_loc.address_line1 if dropoff_loc else None
-                }
-                # Add driver info if ride.driver_id is not None and you want to include it
-            }
-            rides_data.append(ride_info)
-        
-        return jsonify({'rides': rides_data}), 200
+        if not rides and cursor is None:
+            return jsonify({'message': 'No ride history found for this user.', 'rides': [], 'next_cursor': None}), 200
+
+        return json_response({'rides': rides, 'next_cursor': next_cursor})
 
     except Exception as e:
         current_app.logger.error(f"Error fetching ride history: {e}")
@@ -177,7 +171,10 @@ def cancel_ride(current_user, ride_id):
 
         ride.status = 'CANCELLED_PASSENGER'
         ride.cancelled_at = datetime.datetime.utcnow()
+        released = release_driver(ride.driver_id, datetime.datetime.now(datetime.timezone.utc))
         db.session.commit()
+        if released:
+            availability_committed(released)
 
         return jsonify({'message': 'Ride cancelled successfully', 'ride_id': ride.id, 'new_status': ride.status}), 200
 
@@ -0,0 +1,190 @@
+"""Hourly ride/revenue rollups, filled incrementally from watermarks on the ride timestamps."""
+import collections
+import datetime
+from datetime import timezone
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, literal, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .background import PeriodicTask
+from .models import Ride, Location, RideHourlyRollup, RollupWatermark
+from .pagination import after_cursor
+
+# name -> (event timestamp column, status recorded, fare summed, extra filters)
+STREAMS = {
+    'requested': (Ride.requested_at, literal('REQUESTED'), Ride.estimated_fare, ()),
+    'completed': (Ride.completed_at, literal('COMPLETED'), func.coalesce(Ride.actual_fare, Ride.estimated_fare),
+                  (Ride.status == 'COMPLETED',)),
+    'cancelled': (Ride.cancelled_at, Ride.status, Ride.estimated_fare, (Ride.status.like('CANCELLED%'),)),
+}
+DIMENSIONS = ('city', 'vehicle_type', 'status')
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class RideRollupJob:
+    """
+    Folds ride events into ride_hourly_rollups.
+
+    Each stream keeps a (timestamp, ride id) watermark in rollup_watermarks and
+    only reads rides past it, in keyset order, so a run costs O(new rides).
+    Events younger than `lag_seconds` are left for the next run so slow
+    transactions that commit an older timestamp are not skipped. Every batch
+    adds its counts and advances the watermark in one transaction; the
+    watermark update is conditional, so two overlapping runs cannot double-count.
+    """
+
+    def __init__(self, lag_seconds=60, batch_size=5000):
+        self.lag_seconds = lag_seconds
+        self.batch_size = batch_size
+        self._task = None
+
+    def init_app(self, app):
+        self.lag_seconds = app.config.get('ROLLUP_LAG_SECONDS', self.lag_seconds)
+        self.batch_size = app.config.get('ROLLUP_BATCH_SIZE', self.batch_size)
+        app.cli.add_command(update_ride_rollups_command)
+        interval = app.config.get('ROLLUP_INTERVAL_SECONDS', 0)
+        if interval > 0:
+            self._task = PeriodicTask(app, interval, self.update, name='ride-rollups')
+            self._task.start()
+
+    def update(self, now=None):
+        """Processes every stream up to now - lag. Returns {stream: rides processed}. Requires an app context."""
+        now = now or datetime.datetime.now(timezone.utc).replace(tzinfo=None)
+        cutoff = now - datetime.timedelta(seconds=self.lag_seconds)
+        return {name: self._update_stream(name, cutoff) for name in STREAMS}
+
+    def _update_stream(self, name, cutoff):
+        timestamp, status, fare, filters = STREAMS[name]
+        processed = 0
+        while True:
+            watermark = db.session.get(RollupWatermark, name)
+            previous = (watermark.last_timestamp, watermark.last_ride_id) if watermark else None
+            query = db.session.query(
+                Ride.id, timestamp, status, Location.city, Ride.vehicle_type_requested, fare
+            ).join(Location, Ride.pickup_location_id == Location.id)\
+             .filter(timestamp.isnot(None), timestamp <= cutoff, *filters)
+            if previous:
+                query = query.filter(after_cursor(timestamp, Ride.id, previous))
+            rows = query.order_by(timestamp, Ride.id).limit(self.batch_size).all()
+            if not rows:
+                db.session.rollback()
+                break
+
+            totals = collections.defaultdict(lambda: [0, 0.0])
+            for _, moment, ride_status, city, vehicle_type, ride_fare in rows:
+                bucket = totals[(hour_bucket(moment), city or '', vehicle_type or '', ride_status)]
+                bucket[0] += 1
+                bucket[1] += ride_fare or 0.0
+
+            try:
+                self._add(totals)
+                if not self._advance(name, previous, (rows[-1][1], rows[-1][0])):
+                    db.session.rollback()
+                    break  # Another run moved the watermark first
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                break  # Another run created the watermark first
+            processed += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        return processed
+
+    @staticmethod
+    def _add(totals):
+        table = RideHourlyRollup.__table__
+        params = [
+            {'bucket_start': bucket, 'city': city, 'vehicle_type': vehicle_type, 'status': status,
+             'ride_count': count, 'fare_total': fare}
+            for (bucket, city, vehicle_type, status), (count, fare) in totals.items()
+        ]
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['bucket_start', 'city', 'vehicle_type', 'status'],
+                set_={'ride_count': table.c.ride_count + stmt.excluded.ride_count,
+                      'fare_total': table.c.fare_total + stmt.excluded.fare_total}
+            )
+            db.session.execute(stmt, params)
+            return
+        for row in params:
+            updated = db.session.execute(
+                update(table).where(
+                    table.c.bucket_start == row['bucket_start'], table.c.city == row['city'],
+                    table.c.vehicle_type == row['vehicle_type'], table.c.status == row['status']
+                ).values(ride_count=table.c.ride_count + row['ride_count'],
+                         fare_total=table.c.fare_total + row['fare_total'])
+            ).rowcount
+            if not updated:
+                db.session.execute(insert(table).values(**row))
+
+    @staticmethod
+    def _advance(name, previous, position):
+        if previous is None:
+            db.session.execute(insert(RollupWatermark).values(
+                stream=name, last_timestamp=position[0], last_ride_id=position[1]
+            ))
+            return True
+        return db.session.execute(
+            update(RollupWatermark)
+            .where(RollupWatermark.stream == name,
+                   RollupWatermark.last_timestamp == previous[0],
+                   RollupWatermark.last_ride_id == previous[1])
+            .values(last_timestamp=position[0], last_ride_id=position[1])
+        ).rowcount == 1
+
+
+ride_rollups = RideRollupJob()
+
+
+def query_timeseries(date_from, date_to, granularity='hour', group_by=('status',), city=None, vehicle_type=None, status=None):
+    """
+    Summed rollup rows in [date_from, date_to), one point per bucket and group.
+    Reads only the rollup table (range scan on its primary key).
+    """
+    columns = [getattr(RideHourlyRollup, dimension) for dimension in group_by]
+    query = db.session.query(
+        RideHourlyRollup.bucket_start, *columns,
+        func.sum(RideHourlyRollup.ride_count), func.sum(RideHourlyRollup.fare_total)
+    ).filter(RideHourlyRollup.bucket_start >= date_from, RideHourlyRollup.bucket_start < date_to)
+    for dimension, value in (('city', city), ('vehicle_type', vehicle_type), ('status', status)):
+        if value is not None:
+            query = query.filter(getattr(RideHourlyRollup, dimension) == value)
+    rows = query.group_by(RideHourlyRollup.bucket_start, *columns).order_by(RideHourlyRollup.bucket_start).all()
+
+    points = collections.OrderedDict()
+    for bucket, *rest in rows:
+        *groups, rides, fares = rest
+        if granularity == 'day':
+            bucket = bucket.replace(hour=0)
+        point = points.setdefault((bucket, *groups), [0, 0.0])
+        point[0] += rides
+        point[1] += fares or 0.0
+    return [
+        dict(zip(group_by, groups), bucket=bucket.isoformat(), rides=rides, fare_total=round(fares, 2))
+        for (bucket, *groups), (rides, fares) in points.items()
+    ]
+
+
+def stream_watermarks():
+    """{stream: last event timestamp folded in}; later events are not in the rollups yet."""
+    return {stream: timestamp for stream, timestamp in db.session.query(RollupWatermark.stream, RollupWatermark.last_timestamp)}
+
+
+@click.command('update-ride-rollups')
+@with_appcontext
+def update_ride_rollups_command():
+    """Folds ride events since the last run into the hourly rollups."""
+    processed = ride_rollups.update()
+    click.echo(', '.join(f"{name}: {count} ride(s)" for name, count in processed.items()))
@@ -0,0 +1,486 @@
+"""Road-network travel times: CSR graph loaded from disk, contraction-hierarchy queries and a route cache."""
+import collections
+import csv
+import heapq
+import os
+import threading
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+
+from .geo_index import SpatialGridIndex
+from .utils import calculate_distance, predict_eta
+
+
+def _build_csr(num_nodes, sources, targets, weights):
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32), weights[order].astype(np.float32)
+
+
+def _to_csr(adjacency):
+    """CSR arrays from a list of [(target, weight), ...] per node."""
+    indptr = np.zeros(len(adjacency) + 1, dtype=np.int64)
+    np.cumsum([len(edges) for edges in adjacency], out=indptr[1:])
+    indices = np.fromiter((target for edges in adjacency for target, _ in edges), dtype=np.int32, count=indptr[-1])
+    weights = np.fromiter((weight for edges in adjacency for _, weight in edges), dtype=np.float64, count=indptr[-1])
+    return indptr, indices, weights
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over a RoadGraph, for exact point-to-point times.
+
+    Nodes are contracted one by one, cheapest first (fewest added shortcuts,
+    spread evenly over the map); removing a node adds a shortcut between each
+    pair of its neighbours whose only shortest path ran through it. A query is then a bidirectional Dijkstra that
+    only climbs to higher-ranked nodes: `up` holds each node's outgoing edges
+    and `down` its incoming edges (reversed) to nodes contracted after it, so
+    both searches settle a few hundred nodes instead of a whole city.
+
+    Building is the expensive part and belongs in `flask build-road-graph`;
+    the arrays are saved next to the graph's own in the .npz.
+    """
+
+    ARRAYS = ('rank', 'up_indptr', 'up_indices', 'up_weights', 'down_indptr', 'down_indices', 'down_weights')
+
+    def __init__(self, rank, up_indptr, up_indices, up_weights, down_indptr, down_indices, down_weights):
+        self.rank = np.asarray(rank, dtype=np.int32)
+        self.up = (np.asarray(up_indptr, dtype=np.int64), np.asarray(up_indices, dtype=np.int32),
+                   np.asarray(up_weights, dtype=np.float64))
+        self.down = (np.asarray(down_indptr, dtype=np.int64), np.asarray(down_indices, dtype=np.int32),
+                     np.asarray(down_weights, dtype=np.float64))
+        # Memoryviews index as fast as lists without holding a Python object per edge
+        self._up = tuple(memoryview(np.ascontiguousarray(array)) for array in self.up)
+        self._down = tuple(memoryview(np.ascontiguousarray(array)) for array in self.down)
+
+    @property
+    def num_edges(self):
+        return len(self._up[1]) + len(self._down[1])
+
+    @classmethod
+    def build(cls, indptr, indices, weights, witness_settle_limit=500):
+        """
+        Contracts every node of a CSR graph. Witness searches (is there a path
+        around the node at least as short as the shortcut?) stop after
+        `witness_settle_limit` nodes; a missed witness only adds a redundant
+        shortcut, never a wrong answer.
+        """
+        indptr, indices, weights = indptr.tolist(), indices.tolist(), weights.tolist()
+        num_nodes = len(indptr) - 1
+        inf = float('inf')
+        out = [{} for _ in range(num_nodes)]
+        into = [{} for _ in range(num_nodes)]
+        edge_difference = [0] * num_nodes
+        contracted_neighbours = [0] * num_nodes
+        depth = [0] * num_nodes  # Contracted neighbours' deepest level + 1; keeps levels shallow
+        for source in range(num_nodes):
+            for edge in range(indptr[source], indptr[source + 1]):
+                target, weight = indices[edge], weights[edge]
+                if target != source and weight < out[source].get(target, inf):
+                    out[source][target] = weight
+                    into[target][source] = weight
+
+        def shortcuts(node):
+            # Contracted nodes are already unlinked, so out/into only hold the remaining graph
+            found = []
+            outgoing = out[node]
+            for source, weight_in in into[node].items():
+                targets = [(target, weight_in + weight_out) for target, weight_out in outgoing.items() if target != source]
+                if not targets:
+                    continue
+                limit = max(via for _, via in targets)
+                best = {source: 0.0}
+                heap = [(0.0, source)]
+                settled = 0
+                while heap and settled < witness_settle_limit:
+                    cost, current = heapq.heappop(heap)
+                    if cost > limit:
+                        break
+                    if cost > best[current]:
+                        continue
+                    settled += 1
+                    for neighbour, weight in out[current].items():
+                        new_cost = cost + weight
+                        if neighbour != node and new_cost < best.get(neighbour, inf):
+                            best[neighbour] = new_cost
+                            heapq.heappush(heap, (new_cost, neighbour))
+                found.extend((source, target, via) for target, via in targets if best.get(target, inf) > via)
+            return found
+
+        def priority(node):
+            return 2 * edge_difference[node] + contracted_neighbours[node] + depth[node]
+
+        def simulate(node):
+            added = shortcuts(node)
+            edge_difference[node] = len(added) - len(into[node]) - len(out[node])
+            return added, priority(node)
+
+        queued = [simulate(node)[1] for node in range(num_nodes)]
+        queue = [(value, node) for node, value in enumerate(queued)]
+        heapq.heapify(queue)
+        rank = [0] * num_nodes
+        done = [False] * num_nodes
+        up, down = [None] * num_nodes, [None] * num_nodes
+        next_rank = 0
+        while queue:
+            value, node = heapq.heappop(queue)
+            if done[node] or value != queued[node]:
+                continue  # Superseded entry
+            added, current = simulate(node)
+            while queue and (done[queue[0][1]] or queue[0][0] != queued[queue[0][1]]):
+                heapq.heappop(queue)
+            if queue and current > queue[0][0]:
+                queued[node] = current
+                heapq.heappush(queue, (current, node))
+                continue
+
+            rank[node] = next_rank
+            next_rank += 1
+            done[node] = True
+            up[node], down[node] = list(out[node].items()), list(into[node].items())
+            for target in out[node]:
+                del into[target][node]
+                contracted_neighbours[target] += 1
+                depth[target] = max(depth[target], depth[node] + 1)
+            for source in into[node]:
+                del out[source][node]
+                contracted_neighbours[source] += 1
+                depth[source] = max(depth[source], depth[node] + 1)
+            neighbours = set(out[node]) | set(into[node])
+            out[node], into[node] = {}, {}
+            for source, target, via in added:
+                if via < out[source].get(target, inf):
+                    out[source][target] = via
+                    into[target][source] = via
+            # Neighbours' priorities changed the most; shortcut counts are refreshed lazily on pop
+            for neighbour in neighbours:
+                if not done[neighbour]:
+                    queued[neighbour] = priority(neighbour)
+                    heapq.heappush(queue, (queued[neighbour], neighbour))
+
+        return cls(rank, *_to_csr(up), *_to_csr(down))
+
+    def arrays(self):
+        """The hierarchy as named arrays, for `np.savez`."""
+        return dict(zip(self.ARRAYS, (self.rank, *self.up, *self.down)))
+
+    @classmethod
+    def from_arrays(cls, data):
+        return cls(*(data[name] for name in cls.ARRAYS))
+
+    def shortest_time(self, source, target):
+        """Travel time in seconds between two nodes; inf if unreachable."""
+        if source == target:
+            return 0.0
+        inf = float('inf')
+        best_total = inf
+        forward, backward = {source: 0.0}, {target: 0.0}
+        searches = (([(0.0, source)], forward, backward, self._up, self._down),
+                    ([(0.0, target)], backward, forward, self._down, self._up))
+        active = True
+        while active:
+            active = False
+            for heap, best, other, (indptr, indices, weights), (stall_ptr, stall_indices, stall_weights) in searches:
+                # A direction is done once nothing left in it can beat the best meeting point
+                if not heap or heap[0][0] >= best_total:
+                    continue
+                active = True
+                cost, node = heapq.heappop(heap)
+                if cost > best[node]:
+                    continue  # Stale heap entry
+                if node in other:
+                    best_total = min(best_total, cost + other[node])
+                # Stall-on-demand: reached more cheaply via a higher node, so no shortest path continues here
+                if any(best.get(stall_indices[edge], inf) + stall_weights[edge] < cost
+                       for edge in range(stall_ptr[node], stall_ptr[node + 1])):
+                    continue
+                for edge in range(indptr[node], indptr[node + 1]):
+                    neighbour = indices[edge]
+                    new_cost = cost + weights[edge]
+                    if new_cost < best.get(neighbour, inf):
+                        best[neighbour] = new_cost
+                        heapq.heappush(heap, (new_cost, neighbour))
+        return best_total
+
+
+class RoadGraph:
+    """
+    Directed road network stored as compressed sparse row (CSR) arrays.
+
+    Edge weights are travel times in seconds. A reverse CSR is kept as well so
+    many-to-one queries (drivers converging on a pickup) are a single Dijkstra.
+    Point-to-point queries use the contraction hierarchy built with the graph
+    (`from_edge_list`, so `flask build-road-graph`) and fall back to A* for an
+    .npz saved before hierarchies.
+    """
+
+    def __init__(self, lat, lon, indptr, indices, travel_s, hierarchy=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.travel_s = np.asarray(travel_s, dtype=np.float32)
+        self.hierarchy = hierarchy
+
+        num_nodes = len(self.lat)
+        edge_sources = np.repeat(np.arange(num_nodes), np.diff(self.indptr))
+        reverse = _build_csr(num_nodes, self.indices.astype(np.int64), edge_sources, self.travel_s)
+
+        # Plain lists are much faster than NumPy scalars inside the Python search loops
+        self._lat, self._lon = self.lat.tolist(), self.lon.tolist()
+        self._forward = (self.indptr.tolist(), self.indices.tolist(), self.travel_s.tolist())
+        self._reverse = tuple(array.tolist() for array in reverse)
+
+        # Fastest edge speed keeps the straight-line A* heuristic admissible
+        max_speed_kmh = 1.0
+        if len(self.indices):
+            lengths_km = np.array([
+                calculate_distance(self._lat[s], self._lon[s], self._lat[t], self._lon[t])
+                for s, t in zip(edge_sources.tolist(), self._forward[1])
+            ])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                speeds = lengths_km / (self.travel_s / 3600.0)
+            speeds = speeds[np.isfinite(speeds)]
+            if len(speeds):
+                max_speed_kmh = max(float(speeds.max()), 1.0)
+        self._seconds_per_km = 3600.0 / max_speed_kmh
+
+        self.node_index = SpatialGridIndex(cell_size_deg=0.005)
+        for node, (node_lat, node_lon) in enumerate(zip(self._lat, self._lon)):
+            self.node_index.upsert(node, node_lat, node_lon)
+
+    def __len__(self):
+        return len(self._lat)
+
+    @property
+    def num_edges(self):
+        return len(self._forward[1])
+
+    @classmethod
+    def from_edge_list(cls, nodes_path, edges_path, default_speed_kmh=30):
+        """
+        Builds a graph from two CSV files:
+        - nodes: node_id,lat,lon
+        - edges: source,target,length_m[,speed_kmh][,oneway]  (two-way unless oneway is 1/true)
+        """
+        node_ids = {}
+        lat, lon = [], []
+        with open(nodes_path, newline='') as f:
+            for row in csv.DictReader(f):
+                node_ids[row['node_id']] = len(lat)
+                lat.append(float(row['lat']))
+                lon.append(float(row['lon']))
+
+        sources, targets, travel_s = [], [], []
+        with open(edges_path, newline='') as f:
+            for row in csv.DictReader(f):
+                source, target = node_ids[row['source']], node_ids[row['target']]
+                speed_kmh = float(row.get('speed_kmh') or default_speed_kmh)
+                seconds = float(row['length_m']) / (speed_kmh / 3.6)
+                sources.append(source)
+                targets.append(target)
+                travel_s.append(seconds)
+                if str(row.get('oneway') or '0').lower() not in ('1', 'true', 'yes'):
+                    sources.append(target)
+                    targets.append(source)
+                    travel_s.append(seconds)
+
+        indptr, indices, weights = _build_csr(
+            len(lat), np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64), np.array(travel_s)
+        )
+        return cls(lat, lon, indptr, indices, weights, ContractionHierarchy.build(indptr, indices, weights))
+
+    @classmethod
+    def load(cls, path):
+        """Loads a graph saved with `save` (.npz) or a directory holding nodes.csv and edges.csv."""
+        if os.path.isdir(path):
+            return cls.from_edge_list(os.path.join(path, 'nodes.csv'), os.path.join(path, 'edges.csv'))
+        with np.load(path) as data:
+            hierarchy = ContractionHierarchy.from_arrays(data) if 'rank' in data.files else None
+            return cls(data['lat'], data['lon'], data['indptr'], data['indices'], data['travel_s'], hierarchy)
+
+    def save(self, path):
+        hierarchy = self.hierarchy.arrays() if self.hierarchy is not None else {}
+        np.savez_compressed(path, lat=self.lat, lon=self.lon, indptr=self.indptr,
+                            indices=self.indices, travel_s=self.travel_s, **hierarchy)
+
+    def snap(self, lat, lon, radius_km):
+        """Returns (node, distance_km) for the closest node within radius_km, or None."""
+        match = self.node_index.nearest(lat, lon, radius_km=radius_km, k=1)
+        if not match:
+            return None
+        distance, node = match[0][0], match[0][1]
+        return node, distance
+
+    def shortest_time(self, source, target):
+        """Travel time in seconds between two nodes; inf if unreachable."""
+        if self.hierarchy is not None:
+            return self.hierarchy.shortest_time(source, target)
+        return self.astar_time(source, target)
+
+    def astar_time(self, source, target):
+        """A* travel time in seconds between two nodes; inf if unreachable."""
+        if source == target:
+            return 0.0
+        indptr, indices, weights = self._forward
+        node_lat, node_lon = self._lat, self._lon
+        t_lat, t_lon = node_lat[target], node_lon[target]
+        per_km = self._seconds_per_km
+
+        best = {source: 0.0}
+        heap = [(calculate_distance(node_lat[source], node_lon[source], t_lat, t_lon) * per_km, 0.0, source)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                return cost
+            if cost > best[node]:
+                continue  # Stale heap entry
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                new_cost = cost + weights[edge]
+                if new_cost < best.get(neighbour, float('inf')):
+                    best[neighbour] = new_cost
+                    estimate = calculate_distance(node_lat[neighbour], node_lon[neighbour], t_lat, t_lon) * per_km
+                    heapq.heappush(heap, (new_cost + estimate, new_cost, neighbour))
+        return float('inf')
+
+    def times_to(self, target, sources, cutoff_s=float('inf')):
+        """
+        Travel times in seconds from each source node to `target`, via one Dijkstra
+        on the reverse graph that stops once every source is settled.
+        Returns {source: seconds}; unreachable sources are missing.
+        """
+        indptr, indices, weights = self._reverse
+        remaining = set(sources)
+        settled = {}
+        best = {target: 0.0}
+        heap = [(0.0, target)]
+        while heap and remaining:
+            cost, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            if cost > cutoff_s:
+                break
+            settled[node] = cost
+            remaining.discard(node)
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                new_cost = cost + weights[edge]
+                if new_cost < best.get(neighbour, float('inf')):
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbour))
+        return {source: settled[source] for source in sources if source in settled}
+
+
+class EtaEngine:
+    """
+    Answers travel-time questions from the road graph when one is configured
+    (ROAD_GRAPH_PATH) and falls back to straight-line `predict_eta` otherwise,
+    or when a point cannot be snapped onto the network (using learned zone speeds
+    where available).
+    """
+
+    def __init__(self, cache_size=50000, snap_radius_km=0.5):
+        self.graph = None
+        self.cache_size = cache_size
+        self.snap_radius_km = snap_radius_km
+        self._cache = collections.OrderedDict()  # (source_node, target_node) -> seconds
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache_size = app.config.get('ROUTE_CACHE_SIZE', self.cache_size)
+        self.snap_radius_km = app.config.get('ROAD_GRAPH_SNAP_RADIUS_KM', self.snap_radius_km)
+        app.cli.add_command(build_road_graph_command)
+        path = app.config.get('ROAD_GRAPH_PATH')
+        if path:
+            self.load_graph(path)
+            app.logger.info(f"Loaded road graph with {len(self.graph)} nodes and {self.graph.num_edges} edges from {path}")
+            if self.graph.hierarchy is None:
+                app.logger.warning(f"{path} has no contraction hierarchy; uncached ETAs fall back to A*. "
+                                   "Rebuild it with `flask build-road-graph`.")
+
+    def load_graph(self, path_or_graph):
+        graph = path_or_graph if isinstance(path_or_graph, RoadGraph) else RoadGraph.load(path_or_graph)
+        with self._lock:
+            self.graph = graph
+            self._cache.clear()
+
+    def unload_graph(self):
+        with self._lock:
+            self.graph = None
+            self._cache.clear()
+
+    @staticmethod
+    def _access_minutes(distance_km):
+        # Off-network leg between a point and its snapped node
+        return predict_eta(distance_km)
+
+    def _cached_time(self, source, target):
+        key = (source, target)
+        with self._lock:
+            seconds = self._cache.get(key)
+            if seconds is not None:
+                self._cache.move_to_end(key)
+                return seconds
+        seconds = self.graph.shortest_time(source, target)
+        with self._lock:
+            self._cache[key] = seconds
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return seconds
+
+    def travel_time_minutes(self, lat1, lon1, lat2, lon2):
+        """Estimated driving time in minutes between two points. Always finite."""
+        graph = self.graph
+        if graph is not None:
+            origin = graph.snap(lat1, lon1, self.snap_radius_km)
+            destination = graph.snap(lat2, lon2, self.snap_radius_km)
+            if origin and destination:
+                seconds = self._cached_time(origin[0], destination[0])
+                if seconds != float('inf'):
+                    return seconds / 60 + self._access_minutes(origin[1]) + self._access_minutes(destination[1])
+        return predict_eta(calculate_distance(lat1, lon1, lat2, lon2), latitude=lat1, longitude=lon1)
+
+    def travel_times_to(self, lat, lon, origins):
+        """
+        Batch one-to-many mode for dispatch: minutes from each (lat, lon) in
+        `origins` to the destination, as a NumPy array aligned with `origins`.
+        """
+        origins = list(origins)
+        minutes = np.array([
+            predict_eta(calculate_distance(o_lat, o_lon, lat, lon), latitude=o_lat, longitude=o_lon)
+            for o_lat, o_lon in origins
+        ])
+        graph = self.graph
+        if graph is None or not origins:
+            return minutes
+        destination = graph.snap(lat, lon, self.snap_radius_km)
+        if destination is None:
+            return minutes
+
+        snapped = [graph.snap(o_lat, o_lon, self.snap_radius_km) for o_lat, o_lon in origins]
+        seconds = graph.times_to(destination[0], {s[0] for s in snapped if s})
+        tail = self._access_minutes(destination[1])
+        for i, snap in enumerate(snapped):
+            if snap and snap[0] in seconds:
+                minutes[i] = seconds[snap[0]] / 60 + self._access_minutes(snap[1]) + tail
+        return minutes
+
+
+eta_engine = EtaEngine()
+
+
+@click.command('build-road-graph')
+@click.argument('nodes_csv')
+@click.argument('edges_csv')
+@click.argument('output_npz')
+@with_appcontext
+def build_road_graph_command(nodes_csv, edges_csv, output_npz):
+    """Compiles a nodes/edges CSV extract, with its contraction hierarchy, into the .npz used by ROAD_GRAPH_PATH."""
+    graph = RoadGraph.from_edge_list(nodes_csv, edges_csv)
+    graph.save(output_npz)
+    click.echo(f"Wrote {len(graph)} nodes, {graph.num_edges} directed edges and "
+               f"{graph.hierarchy.num_edges} hierarchy edges to {output_npz}")
@@ -0,0 +1,234 @@
+"""
+Response shapes, each defined once, and a fast JSON encoder for them.
+
+A Shape maps output keys to columns (or to nested Shapes). Queries select
+exactly `shape.columns`, and `shape.dump(row)` turns each result row into a
+dict by position, without loading ORM entities or formatting fields one by
+one; `shape.flatten(row)` gives the same values as one flat tuple, in the
+order of the dotted `shape.headers`, for CSV. Datetimes are left as they are: orjson writes them natively, and the
+stdlib fallback calls isoformat(), so both produce the same JSON.
+"""
+import datetime
+import json
+import operator
+
+from flask import current_app
+from sqlalchemy import case
+from sqlalchemy.orm import aliased
+
+from .models import User, DriverProfile, Ride, Location, Vehicle
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used instead
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Encodes to JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def loads(data):
+    """Decodes JSON bytes or str (orjson when installed)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_response(payload, status=200):
+    """Like jsonify(payload), status, but encoded with dumps()."""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+class Shape:
+    """
+    One response object. `fields` maps keys to columns or nested Shapes.
+    A nested Shape with `present_if` becomes None when that column is NULL,
+    or is left out of its parent entirely with `omit_when_absent`.
+    """
+
+    def __init__(self, fields, present_if=None, omit_when_absent=False):
+        self.fields = fields
+        self.present_if = present_if
+        self.omit_when_absent = omit_when_absent
+        self.columns, self._build, flat = self._compile(0, ())
+        self.headers = tuple(header for header, _, _ in flat)
+        self._flat = tuple((position, presences) for _, position, presences in flat)
+
+    def extend(self, **fields):
+        """A new Shape with extra (or replaced) fields."""
+        return Shape(dict(self.fields, **fields), self.present_if, self.omit_when_absent)
+
+    def _compile(self, offset, presences):
+        columns, keys, positions, nested, flat = [], [], [], [], []
+        presence = None
+        if self.present_if is not None:
+            presence = offset
+            presences += (presence,)
+            columns.append(self.present_if)
+        for key, field in self.fields.items():
+            if isinstance(field, Shape):
+                sub_columns, sub_build, sub_flat = field._compile(offset + len(columns), presences)
+                nested.append((key, sub_build, field.omit_when_absent))
+                flat.extend((f"{key}.{header}", position, sub_presences) for header, position, sub_presences in sub_flat)
+                columns.extend(sub_columns)
+            else:
+                keys.append(key)
+                positions.append(offset + len(columns))
+                flat.append((key, offset + len(columns), presences))
+                columns.append(field)
+        keys = tuple(keys)
+        getter = operator.itemgetter(*positions) if len(positions) > 1 else (lambda row, p=positions[0]: (row[p],))
+
+        def build(row):
+            if presence is not None and row[presence] is None:
+                return None
+            out = dict(zip(keys, getter(row)))
+            for key, sub_build, omit in nested:
+                value = sub_build(row)
+                if value is not None or not omit:
+                    out[key] = value
+            return out
+        return columns, build, flat
+
+    def dump(self, row):
+        return self._build(row)
+
+    def dump_all(self, rows):
+        build = self._build
+        return [build(row) for row in rows]
+
+    def flatten(self, row):
+        """The row's values in `headers` order; fields of an absent nested Shape are None."""
+        return tuple(
+            None if any(row[presence] is None for presence in presences) else row[position]
+            for position, presences in self._flat
+        )
+
+
+# Aliases the joined shapes read from; queries join them under these names
+passenger_user = aliased(User, name='passenger')
+driver_user = aliased(User, name='driver')
+pickup_location = aliased(Location, name='pickup')
+dropoff_location = aliased(Location, name='dropoff')
+
+_TIMESTAMPS = {
+    'requested_at': Ride.requested_at,
+    'accepted_at': Ride.accepted_at,
+    'started_at': Ride.started_at,
+    'completed_at': Ride.completed_at,
+    'cancelled_at': Ride.cancelled_at,
+}
+
+
+def _point(location, **extra):
+    return Shape(dict({'latitude': location.latitude, 'longitude': location.longitude}, **extra))
+
+
+USER = Shape({
+    'id': User.id,
+    'email': User.email,
+    'full_name': User.full_name,
+    'phone_number': User.phone_number,
+    'is_driver': User.is_driver,
+    'is_admin': User.is_admin,
+    'created_at': User.created_at,
+    'updated_at': User.updated_at,
+})
+
+DRIVER_PROFILE_SUMMARY = Shape({
+    'id': DriverProfile.id,
+    'license_number': DriverProfile.license_number,
+    'is_verified': DriverProfile.is_verified,
+    'availability_status': DriverProfile.availability_status,
+}, present_if=case((User.is_driver, DriverProfile.id)), omit_when_absent=True)
+
+# Select from User outer-joined to DriverProfile
+USER_WITH_PROFILE = USER.extend(driver_profile=DRIVER_PROFILE_SUMMARY)
+USER_DETAIL = USER.extend(driver_profile=DRIVER_PROFILE_SUMMARY.extend(
+    license_expiry_date=DriverProfile.license_expiry_date,
+    verification_notes=DriverProfile.verification_notes,
+))
+
+VEHICLE_SUMMARY = Shape({
+    'id': Vehicle.id,
+    'make': Vehicle.make,
+    'model': Vehicle.model,
+    'license_plate': Vehicle.license_plate,
+    'vehicle_type': Vehicle.vehicle_type,
+    'is_active': Vehicle.is_active,
+})
+VEHICLE = VEHICLE_SUMMARY.extend(
+    year=Vehicle.year,
+    color=Vehicle.color,
+    created_at=Vehicle.created_at,
+    updated_at=Vehicle.updated_at,
+)
+
+# Select from DriverProfile joined to User
+AVAILABLE_DRIVER = Shape({
+    'driver_id': DriverProfile.user_id,
+    'driver_profile_id': DriverProfile.id,
+    'full_name': User.full_name,
+    'phone_number': User.phone_number,
+    'current_latitude': DriverProfile.current_latitude,
+    'current_longitude': DriverProfile.current_longitude,
+})
+
+# Select from DriverProfile joined to User
+DRIVER_EXPORT = Shape({
+    'driver_profile_id': DriverProfile.id,
+    'license_number': DriverProfile.license_number,
+    'license_expiry_date': DriverProfile.license_expiry_date,
+    'is_verified': DriverProfile.is_verified,
+    'availability_status': DriverProfile.availability_status,
+    'current_latitude': DriverProfile.current_latitude,
+    'current_longitude': DriverProfile.current_longitude,
+    'last_location_update': DriverProfile.last_location_update,
+    'created_at': DriverProfile.created_at,
+    'user': Shape({
+        'id': User.id,
+        'email': User.email,
+        'full_name': User.full_name,
+        'phone_number': User.phone_number,
+    }),
+})
+
+# Select from Ride outer-joined to pickup_location and dropoff_location
+RIDE_HISTORY = Shape(dict({
+    'id': Ride.id,
+    'status': Ride.status,
+    'estimated_fare': Ride.estimated_fare,
+    'actual_fare': Ride.actual_fare,
+    'payment_status': Ride.payment_status,
+    'vehicle_type_requested': Ride.vehicle_type_requested,
+    'pickup_location': _point(pickup_location, address=pickup_location.address_line1),
+    'dropoff_location': _point(dropoff_location, address=dropoff_location.address_line1),
+}, **_TIMESTAMPS))
+
+# RIDE_HISTORY plus passenger_user and driver_user outer joins
+ADMIN_RIDE = RIDE_HISTORY.extend(
+    passenger=Shape({'id': passenger_user.id, 'full_name': passenger_user.full_name, 'email': passenger_user.email}),
+    driver=Shape({'id': driver_user.id, 'full_name': driver_user.full_name, 'email': driver_user.email},
+                 present_if=driver_user.id),
+)
+
+ADMIN_RIDE_DETAIL = ADMIN_RIDE.extend(
+    payment_intent_id=Ride.payment_intent_id,
+    notes_for_driver=Ride.notes_for_driver,
+    pickup_location=_point(pickup_location, id=pickup_location.id, address_line1=pickup_location.address_line1,
+                           city=pickup_location.city, postal_code=pickup_location.postal_code),
+    dropoff_location=_point(dropoff_location, id=dropoff_location.id, address_line1=dropoff_location.address_line1,
+                            city=dropoff_location.city, postal_code=dropoff_location.postal_code),
+)
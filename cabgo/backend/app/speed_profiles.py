@@ -0,0 +1,225 @@
+"""Average driving speeds by zone and hour-of-week, learned from completed rides."""
+import datetime
+from datetime import timezone
+import math
+import os
+import tempfile
+import threading
+import time
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from sqlalchemy.orm import aliased
+
+from .background import PeriodicTask
+from .pagination import after_cursor
+
+HOURS_PER_WEEK = 168
+MIN_RIDE_SECONDS = 60
+MAX_SPEED_KMH = 150
+
+
+def hour_of_week(moment):
+    """0 = Monday 00:00-00:59 ... 167 = Sunday 23:00-23:59, in the timestamp's own zone (UTC here)."""
+    return moment.weekday() * 24 + moment.hour
+
+
+class SpeedProfileTable:
+    """
+    Dense (zone x hour-of-week) table of observed speeds.
+
+    Zones are grid cells of `zone_size_deg`. Sums and counts are kept so the
+    job can add new rides incrementally; `speeds` is derived from them and is
+    what `lookup` reads, making a lookup one dict hit plus one array index.
+
+    One process updates the table: `flask update-speed-profiles`, run by cron
+    or with --loop. It saves the .npz atomically and every app process
+    reloads it when the file's mtime changes.
+    """
+
+    def __init__(self, zone_size_deg=0.05, min_samples=5):
+        self.zone_size_deg = zone_size_deg
+        self.min_samples = min_samples
+        self.path = None
+        self.watermark = None  # (completed_at, ride_id) of the last ride folded in
+        self._loaded_mtime = None  # st_mtime_ns of the file the tables came from
+        self._lock = threading.Lock()
+        self._task = None
+        self._set_tables({}, np.zeros((0, HOURS_PER_WEEK)), np.zeros((0, HOURS_PER_WEEK), dtype=np.int32))
+
+    def _set_tables(self, zone_rows, speed_sum, counts):
+        self._zone_rows = zone_rows  # (row, col) cell -> table row
+        self.speed_sum = speed_sum
+        self.counts = counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            speeds = speed_sum / counts
+        self.speeds = np.where(counts >= self.min_samples, speeds, np.nan).astype(np.float32)
+
+    def init_app(self, app):
+        self.zone_size_deg = app.config.get('SPEED_PROFILE_ZONE_SIZE_DEG', self.zone_size_deg)
+        self.min_samples = app.config.get('SPEED_PROFILE_MIN_SAMPLES', self.min_samples)
+        self.path = app.config.get('SPEED_PROFILE_PATH')
+        self.reset()
+        if self.path and os.path.exists(self.path):
+            self.load(self.path)
+        app.cli.add_command(update_speed_profiles_command)
+        interval = app.config.get('SPEED_PROFILE_RELOAD_INTERVAL_SECONDS', 0)
+        if interval > 0 and self.path:
+            self._task = PeriodicTask(app, interval, self.reload_if_changed, name='speed-profiles-reload')
+            self._task.start()
+
+    def reset(self):
+        with self._lock:
+            self.watermark = None
+            self._loaded_mtime = None
+            self._set_tables({}, np.zeros((0, HOURS_PER_WEEK)), np.zeros((0, HOURS_PER_WEEK), dtype=np.int32))
+
+    def zone_for(self, lat, lon):
+        return (math.floor(lat / self.zone_size_deg), math.floor(lon / self.zone_size_deg))
+
+    def lookup(self, lat, lon, when):
+        """Learned speed in km/h for a zone and time, or None when there is not enough data."""
+        row = self._zone_rows.get(self.zone_for(lat, lon))
+        if row is None:
+            return None
+        speed = self.speeds[row, hour_of_week(when)]
+        return None if math.isnan(speed) else float(speed)
+
+    def add_observations(self, lats, lons, hours, speeds_kmh):
+        """Folds a batch of (pickup lat, lon, hour-of-week, speed) observations into the table."""
+        with self._lock:
+            zone_rows = dict(self._zone_rows)
+            rows = np.empty(len(lats), dtype=np.int64)
+            for i, (lat, lon) in enumerate(zip(lats, lons)):
+                rows[i] = zone_rows.setdefault(self.zone_for(lat, lon), len(zone_rows))
+
+            grow = len(zone_rows) - self.speed_sum.shape[0]
+            speed_sum = np.vstack([self.speed_sum, np.zeros((grow, HOURS_PER_WEEK))]) if grow else self.speed_sum.copy()
+            counts = np.vstack([self.counts, np.zeros((grow, HOURS_PER_WEEK), dtype=np.int32)]) if grow else self.counts.copy()
+            np.add.at(speed_sum, (rows, hours), speeds_kmh)
+            np.add.at(counts, (rows, hours), 1)
+            self._set_tables(zone_rows, speed_sum, counts)
+
+    def update_from_rides(self, batch_size=5000):
+        """
+        Scans COMPLETED rides after the watermark in (completed_at, id) order and
+        folds their average speeds in. Returns the number of rides processed.
+        Requires an app context.
+        """
+        from . import db
+        from .models import Ride, Location
+        from .utils import calculate_distances
+
+        pickup = aliased(Location)
+        dropoff = aliased(Location)
+        processed = 0
+        while True:
+            query = db.session.query(
+                Ride.id, Ride.started_at, Ride.completed_at,
+                pickup.latitude, pickup.longitude, dropoff.latitude, dropoff.longitude
+            ).join(pickup, Ride.pickup_location_id == pickup.id)\
+             .join(dropoff, Ride.dropoff_location_id == dropoff.id)\
+             .filter(Ride.status == 'COMPLETED', Ride.started_at.isnot(None), Ride.completed_at.isnot(None))
+            if self.watermark is not None:
+                query = query.filter(after_cursor(Ride.completed_at, Ride.id, self.watermark))
+            rows = query.order_by(Ride.completed_at, Ride.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            durations_s = np.array([(completed - started).total_seconds() for _, started, completed, *_ in rows])
+            distances_km = calculate_distances(
+                [(row[3], row[4]) for row in rows], [(row[5], row[6]) for row in rows]
+            )
+            with np.errstate(divide='ignore', invalid='ignore'):
+                speeds = distances_km / (durations_s / 3600.0)
+            valid = (durations_s >= MIN_RIDE_SECONDS) & (speeds > 0) & (speeds <= MAX_SPEED_KMH)
+            if valid.any():
+                picked = [row for row, ok in zip(rows, valid) if ok]
+                self.add_observations(
+                    [row[3] for row in picked],
+                    [row[4] for row in picked],
+                    np.array([hour_of_week(row[1]) for row in picked]),
+                    speeds[valid]
+                )
+
+            self.watermark = (rows[-1][2], rows[-1][0])
+            processed += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        if processed and self.path:
+            self.save(self.path)
+        return processed
+
+    def save(self, path):
+        """Writes a temporary file beside `path` and renames it over, so readers never load a partial table."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.speed-profiles-', suffix='.npz')
+        try:
+            with self._lock, os.fdopen(fd, 'wb') as f:
+                zones = sorted(self._zone_rows.items(), key=lambda item: item[1])
+                watermark = self.watermark
+                np.savez_compressed(
+                    f,
+                    zone_keys=np.array([zone for zone, _ in zones], dtype=np.int64).reshape(-1, 2),
+                    speed_sum=self.speed_sum,
+                    counts=self.counts,
+                    zone_size_deg=np.array(self.zone_size_deg),
+                    watermark_at=np.array(watermark[0].isoformat() if watermark else ''),
+                    watermark_id=np.array(watermark[1] if watermark else 0)
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._loaded_mtime = os.stat(path).st_mtime_ns
+
+    def reload_if_changed(self):
+        """Reloads the table from `path` when the file changed since it was last read. Returns True if it did."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except (OSError, TypeError):
+            return False  # Not written yet (or no path configured)
+        if mtime == self._loaded_mtime:
+            return False
+        self.load(self.path)
+        return True
+
+    def load(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        with np.load(path) as data:
+            zone_rows = {tuple(key): row for row, key in enumerate(data['zone_keys'].tolist())}
+            watermark_at = str(data['watermark_at'])
+            with self._lock:
+                self.zone_size_deg = float(data['zone_size_deg'])
+                self.watermark = (datetime.datetime.fromisoformat(watermark_at), int(data['watermark_id'])) if watermark_at else None
+                self._set_tables(zone_rows, data['speed_sum'], data['counts'])
+                self._loaded_mtime = mtime
+
+
+speed_profiles = SpeedProfileTable()
+
+
+def learned_speed_kmh(lat, lon, when=None):
+    return speed_profiles.lookup(lat, lon, when or datetime.datetime.now(timezone.utc))
+
+
+@click.command('update-speed-profiles')
+@click.option('--loop', is_flag=True, help='Keep running, every SPEED_PROFILE_UPDATE_INTERVAL_SECONDS.')
+@with_appcontext
+def update_speed_profiles_command(loop):
+    """Folds rides completed since the last run into the speed profile table. The only writer of the file."""
+    from flask import current_app
+    from . import db
+
+    interval = current_app.config['SPEED_PROFILE_UPDATE_INTERVAL_SECONDS']
+    while True:
+        started = time.monotonic()
+        processed = speed_profiles.update_from_rides()
+        db.session.remove()
+        click.echo(f"Processed {processed} completed ride(s)")
+        if not loop:
+            break
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
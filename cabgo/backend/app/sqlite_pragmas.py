@@ -0,0 +1,30 @@
+"""Per-connection PRAGMAs for SQLite engines, taken from the SQLITE_PRAGMAS config."""
+from sqlalchemy import event
+
+# Applied in this order; journal_mode first so later settings see the final mode
+PRAGMA_ORDER = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store', 'foreign_keys')
+
+
+def apply_pragmas(engine, pragmas):
+    """Runs the PRAGMAs on every new DBAPI connection of a SQLite engine; other engines are left alone."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    ordered = sorted(pragmas.items(), key=lambda item: PRAGMA_ORDER.index(item[0]) if item[0] in PRAGMA_ORDER else len(PRAGMA_ORDER))
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in ordered:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def init_app(app):
+    from . import db
+
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_pragmas(engine, pragmas)
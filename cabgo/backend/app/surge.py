@@ -0,0 +1,97 @@
+"""Zone-based surge pricing from database demand counts and in-memory supply."""
+import math
+
+from sqlalchemy import func
+
+from .background import PeriodicTask
+from .geo_index import driver_index
+
+
+class SurgeEngine:
+    """
+    Counts open REQUESTED rides (demand) per grid cell in the database and
+    derives supply from the driver index. Multipliers are recomputed on a timer
+    and cached, so pricing a booking is a single dict lookup.
+
+    Demand is recounted on every recompute rather than tracked from this
+    process's bookings and cancellations: dispatch, other workers and admin
+    tools all move rides out of REQUESTED, and counters fed by one process
+    drift from the table.
+    """
+
+    def __init__(self, cell_size_deg=0.02):
+        self.cell_size_deg = cell_size_deg
+        self.max_multiplier = 3.0
+        self.sensitivity = 0.5
+        self.threshold_ratio = 1.0
+        self._multipliers = {} # cell -> cached multiplier (> 1.0 only)
+        self._task = None
+
+    def init_app(self, app):
+        config = app.config
+        self.cell_size_deg = config.get('SURGE_CELL_SIZE_DEG', self.cell_size_deg)
+        self.max_multiplier = config.get('SURGE_MAX_MULTIPLIER', self.max_multiplier)
+        self.sensitivity = config.get('SURGE_SENSITIVITY', self.sensitivity)
+        self.threshold_ratio = config.get('SURGE_DEMAND_SUPPLY_THRESHOLD', self.threshold_ratio)
+        self.reset()
+        interval = config.get('SURGE_RECOMPUTE_INTERVAL_SECONDS', 0)
+        if interval > 0:
+            self._task = PeriodicTask(app, interval, self.recompute, name='surge-recompute')
+            self._task.start()
+
+    def reset(self):
+        self._multipliers = {}
+
+    def cell_for(self, lat, lon):
+        return (math.floor(lat / self.cell_size_deg), math.floor(lon / self.cell_size_deg))
+
+    def load_demand(self):
+        """Open REQUESTED rides per cell. Requires an app context."""
+        from . import db
+        from .models import Ride, Location
+
+        # Counted per pickup location in SQL (locations are shared between rides), bucketed into cells here
+        rows = db.session.query(Location.latitude, Location.longitude, func.count(Ride.id))\
+            .join(Ride, Ride.pickup_location_id == Location.id)\
+            .filter(Ride.status == 'REQUESTED')\
+            .group_by(Location.id)\
+            .all()
+        demand = {}
+        for lat, lon, count in rows:
+            cell = self.cell_for(lat, lon)
+            demand[cell] = demand.get(cell, 0) + count
+        return demand
+
+    def _supply_by_cell(self):
+        index_size = driver_index.cell_size_deg
+        supply = {}
+        for (row, col), count in driver_index.cell_counts().items():
+            # Map each driver-index cell to the surge cell containing its centre
+            cell = self.cell_for((row + 0.5) * index_size, (col + 0.5) * index_size)
+            supply[cell] = supply.get(cell, 0) + count
+        return supply
+
+    def multiplier_for(self, demand, supply):
+        ratio = demand / max(supply, 1)
+        multiplier = 1.0 + self.sensitivity * (ratio - self.threshold_ratio)
+        multiplier = min(max(multiplier, 1.0), self.max_multiplier)
+        return round(multiplier, 1)
+
+    def recompute(self):
+        """Refreshes the cached multipliers. Requires an app context."""
+        demand = self.load_demand()
+        driver_index.ensure_loaded()
+        supply = self._supply_by_cell()
+        multipliers = {}
+        for cell, cell_demand in demand.items():
+            multiplier = self.multiplier_for(cell_demand, supply.get(cell, 0))
+            if multiplier > 1.0:
+                multipliers[cell] = multiplier
+        self._multipliers = multipliers  # Swapped atomically; readers never see a partial table
+        return multipliers
+
+    def multiplier_at(self, lat, lon):
+        return self._multipliers.get(self.cell_for(lat, lon), 1.0)
+
+
+surge_engine = SurgeEngine()
@@ -0,0 +1,124 @@
+"""JWT access/refresh tokens carrying role claims, plus a revocation list shared through the database."""
+import collections
+import datetime
+import threading
+import time
+
+import jwt
+from flask import current_app
+
+from . import db
+from .background import PeriodicTask
+from .models import TokenRevocation
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+# Identity built purely from a verified access token's claims; admin_required hands
+# this to handlers so authorization needs no database round-trip.
+TokenPrincipal = collections.namedtuple('TokenPrincipal', ['id', 'is_admin', 'is_driver', 'driver_profile_id'])
+
+
+class TokenRevocationList:
+    """
+    Per-user "not before" timestamps for access tokens.
+
+    A role change through the admin API revokes every access token issued to
+    that user before the change, forcing the client to refresh and pick up
+    fresh claims. Revocations are written to the token_revocations table in the
+    caller's transaction and mirrored in memory, so checks need no query; every
+    `sync_interval` seconds each process reloads the rows written by the other
+    workers, which bounds how long they keep honouring a revoked token. Entries
+    only need to outlive the access token lifetime, so the table stays small and
+    is pruned as it is synced.
+    """
+
+    def __init__(self, retention_seconds=3600):
+        self.app = None
+        self.retention_seconds = retention_seconds
+        self._revoked = {}  # user_id -> revoked_at (epoch seconds)
+        self._lock = threading.Lock()
+        self._task = None
+
+    def init_app(self, app):
+        self.app = app
+        expires = app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+        if expires:
+            self.retention_seconds = expires.total_seconds()
+        self.clear()
+        interval = app.config.get('TOKEN_REVOCATION_SYNC_SECONDS', 0)
+        if interval > 0:
+            self._task = PeriodicTask(app, interval, self.sync, name='token-revocation-sync')
+            self._task.start()
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+
+    def _remember(self, user_id, revoked_at):
+        with self._lock:
+            if revoked_at > self._revoked.get(user_id, 0):
+                self._revoked[user_id] = revoked_at
+
+    def revoke_user(self, user_id):
+        """Revokes the user's access tokens issued until now. Adds the row to db.session; the caller commits."""
+        now = time.time()
+        db.session.merge(TokenRevocation(user_id=user_id, revoked_at=now))
+        self._remember(user_id, now)  # Rolled back, it only costs the user a refresh
+
+    def sync(self):
+        """Reloads unexpired revocations from the table, including other processes', and prunes expired ones."""
+        cutoff = time.time() - self.retention_seconds
+        rows = db.session.query(TokenRevocation.user_id, TokenRevocation.revoked_at)\
+            .filter(TokenRevocation.revoked_at >= cutoff).all()
+        for user_id, revoked_at in rows:
+            self._remember(user_id, revoked_at)
+        with self._lock:
+            for stale in [uid for uid, at in self._revoked.items() if at < cutoff]:
+                del self._revoked[stale]
+        db.session.query(TokenRevocation).filter(TokenRevocation.revoked_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        return len(rows)
+
+    def is_revoked(self, claims):
+        revoked_at = self._revoked.get(claims.get('user_id'))
+        return revoked_at is not None and claims.get('iat', 0) <= revoked_at
+
+
+token_revocations = TokenRevocationList()
+
+
+def _encode(payload, lifetime):
+    now = time.time()
+    payload = dict(payload, iat=now, exp=now + lifetime.total_seconds())
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+
+def issue_tokens(user_id, is_admin, is_driver, driver_profile_id):
+    """Returns (access_token, refresh_token); the access token carries the role claims."""
+    config = current_app.config
+    access_token = _encode({
+        'user_id': user_id,
+        'type': ACCESS,
+        'is_admin': bool(is_admin),
+        'is_driver': bool(is_driver),
+        'driver_profile_id': driver_profile_id
+    }, config.get('JWT_ACCESS_TOKEN_EXPIRES', datetime.timedelta(hours=1)))
+    refresh_token = _encode(
+        {'user_id': user_id, 'type': REFRESH},
+        config.get('JWT_REFRESH_TOKEN_EXPIRES', datetime.timedelta(days=30))
+    )
+    return access_token, refresh_token
+
+
+def decode_token(token):
+    """Verifies the signature and expiry; raises jwt.InvalidTokenError subclasses on failure."""
+    return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+
+
+def principal_from_claims(claims):
+    """TokenPrincipal for a claims-bearing access token, or None for legacy tokens that only carry user_id."""
+    if claims.get('type') != ACCESS:
+        return None
+    return TokenPrincipal(claims['user_id'], claims.get('is_admin', False),
+                          claims.get('is_driver', False), claims.get('driver_profile_id'))
@@ -0,0 +1,120 @@
+"""Per-process cache of the user fields needed to authorize a request."""
+import collections
+import threading
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import User, DriverProfile
+
+_PENDING_KEY = 'user_cache_invalidations'
+
+# Read-only snapshot handed to route handlers as `current_user`. Handlers that
+# modify the user must load the ORM row themselves (db.session.get(User, id)).
+AuthenticatedUser = collections.namedtuple('AuthenticatedUser', [
+    'id', 'email', 'full_name', 'phone_number', 'is_driver', 'is_admin',
+    'created_at', 'updated_at', 'driver_profile_id'
+])
+
+
+class UserCache:
+    """
+    Bounded LRU of AuthenticatedUser snapshots with a TTL.
+
+    Entries are dropped as soon as a transaction that changed the User row (or
+    created/deleted its DriverProfile) commits in this process; the TTL bounds
+    staleness for changes made by other processes.
+    """
+
+    def __init__(self, ttl_seconds=30, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # user_id -> (expires_at, AuthenticatedUser)
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped on every invalidation so in-flight loads can't store stale rows
+
+    def init_app(self, app):
+        self.ttl_seconds = app.config.get('USER_CACHE_TTL_SECONDS', self.ttl_seconds)
+        self.max_entries = app.config.get('USER_CACHE_MAX_ENTRIES', self.max_entries)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+
+    def get(self, user_id):
+        """Returns the AuthenticatedUser for user_id, or None if the user does not exist."""
+        user, generation = self.cached(user_id)
+        if user is None:
+            row = db.session.execute(self.load_statement(user_id)).first()
+            user = AuthenticatedUser(*row) if row else None
+            self.store(user_id, user, generation)
+        return user
+
+    def cached(self, user_id):
+        """
+        Returns (AuthenticatedUser or None on a miss, generation). Pass the
+        generation to store() after loading, so a concurrent invalidation wins.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1], self._generation
+            return None, self._generation
+
+    def store(self, user_id, user, generation):
+        if user is None or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+                self._entries.move_to_end(user_id)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    @staticmethod
+    def load_statement(user_id):
+        """SELECT of one user's AuthenticatedUser fields; run it on any session, sync or async."""
+        return select(
+            User.id, User.email, User.full_name, User.phone_number, User.is_driver,
+            User.is_admin, User.created_at, User.updated_at, DriverProfile.id
+        ).outerjoin(DriverProfile, DriverProfile.user_id == User.id).where(User.id == user_id)
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault(_PENDING_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+    # Only the existence of a profile is cached, so status updates don't evict the user
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, DriverProfile) and obj.user_id is not None:
+            changed.add(obj.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_users(session):
+    session.info.pop(_PENDING_KEY, None)
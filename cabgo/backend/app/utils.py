@@ -1,11 +1,22 @@
+import datetime
+from datetime import timezone
 import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+# Per-vehicle (base_fare, rate_per_km) multipliers relative to a SEDAN
+VEHICLE_FARE_ADJUSTMENTS = {
+    'SUV': (1.1, 1.2),       # SUVs are 20% more expensive per km with a slightly higher base fare
+    'HATCHBACK': (1.0, 0.9), # Hatchbacks are 10% cheaper per km
+}
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
     Calculate the distance between two points on Earth using the Haversine formula.
     Returns distance in kilometers.
     """
-    R = 6371  # Radius of Earth in kilometers
+    R = EARTH_RADIUS_KM  # Radius of Earth in kilometers
 
     lat1_rad = math.radians(lat1)
     lon1_rad = math.radians(lon1)
@@ -35,12 +46,10 @@ def calculate_fare(distance_km, vehicle_type='SEDAN', base_fare=50, rate_per_km=
     Returns:
     - float: The estimated fare.
     """
-    # Vehicle-specific adjustments (example)
-    if vehicle_type == 'SUV':
-        rate_per_km *= 1.2 # SUVs might be 20% more expensive per km
-        base_fare *= 1.1   # And have a slightly higher base fare
-    elif vehicle_type == 'HATCHBACK':
-        rate_per_km *= 0.9 # Hatchbacks might be 10% cheaper
+    # Vehicle-specific adjustments
+    base_multiplier, rate_multiplier = VEHICLE_FARE_ADJUSTMENTS.get(vehicle_type, (1.0, 1.0))
+    base_fare *= base_multiplier
+    rate_per_km *= rate_multiplier
 
     estimated_fare = (base_fare + (distance_km * rate_per_km)) * surge_multiplier
     
@@ -48,17 +57,26 @@ def calculate_fare(distance_km, vehicle_type='SEDAN', base_fare=50, rate_per_km=
     min_total_fare = base_fare * surge_multiplier
     return max(estimated_fare, min_total_fare)
 
-def predict_eta(distance_km, average_speed_kmh=30):
+def predict_eta(distance_km, average_speed_kmh=30, latitude=None, longitude=None, when=None):
     """
     Predict the Estimated Time of Arrival (ETA) for a ride.
     
     Parameters:
     - distance_km (float): The distance of the ride in kilometers.
     - average_speed_kmh (float): The assumed average speed in kilometers per hour.
+    - latitude, longitude (float, optional): Start point. When given, the speed learned
+      from completed rides for that zone and hour-of-week is used if there is enough data.
+    - when (datetime, optional): Departure time for the learned-speed lookup (defaults to now, UTC).
     
     Returns:
     - float: The estimated time in minutes.
     """
+    if latitude is not None and longitude is not None:
+        from .speed_profiles import learned_speed_kmh
+        learned_speed = learned_speed_kmh(latitude, longitude, when)
+        if learned_speed:
+            average_speed_kmh = learned_speed
+
     if average_speed_kmh <= 0:
         return float('inf') # Or handle as an error
         
@@ -66,6 +84,97 @@ def predict_eta(distance_km, average_speed_kmh=30):
     time_minutes = time_hours * 60
     return time_minutes
 
+def parse_iso_datetime(value):
+    """
+    Parse an ISO 8601 query-string timestamp into a naive UTC datetime, matching
+    how timestamps are stored. Raises ValueError for malformed input.
+    """
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _as_coordinates(points):
+    coords = np.asarray(points, dtype=np.float64)
+    if coords.ndim == 1:
+        coords = coords.reshape(1, 2)
+    if coords.ndim != 2 or coords.shape[1] != 2:
+        raise ValueError('Coordinates must be a (lat, lon) pair or an array of shape (n, 2)')
+    return coords
+
+def calculate_distances(origins, destinations, pairwise=False):
+    """
+    Vectorized Haversine distance in kilometers.
+
+    Parameters:
+    - origins, destinations: a (lat, lon) pair or an array-like of shape (n, 2).
+    - pairwise (bool): If False, rows are matched element-wise (a single origin or
+      destination is broadcast, giving one-to-many). If True, returns the full
+      many-to-many matrix of shape (len(origins), len(destinations)).
+
+    Returns:
+    - numpy.ndarray of distances with the same numeric results as calculate_distance.
+    """
+    origins_rad = np.radians(_as_coordinates(origins))
+    destinations_rad = np.radians(_as_coordinates(destinations))
+
+    lat1, lon1 = origins_rad[:, 0], origins_rad[:, 1]
+    lat2, lon2 = destinations_rad[:, 0], destinations_rad[:, 1]
+    if pairwise:
+        lat1, lon1 = lat1[:, np.newaxis], lon1[:, np.newaxis]
+        lat2, lon2 = lat2[np.newaxis, :], lon2[np.newaxis, :]
+
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+def calculate_fares(distances_km, vehicle_types='SEDAN', base_fare=50, rate_per_km=15, surge_multipliers=1.0):
+    """
+    Vectorized counterpart of calculate_fare.
+
+    `vehicle_types` and `surge_multipliers` may be scalars or arrays broadcastable
+    against `distances_km`. Returns a numpy.ndarray of fares.
+    """
+    distances = np.asarray(distances_km, dtype=np.float64)
+    surge = np.asarray(surge_multipliers, dtype=np.float64)
+
+    if isinstance(vehicle_types, str):
+        base_multiplier, rate_multiplier = VEHICLE_FARE_ADJUSTMENTS.get(vehicle_types, (1.0, 1.0))
+    else:
+        types = np.asarray(vehicle_types)
+        base_multiplier = np.ones(types.shape)
+        rate_multiplier = np.ones(types.shape)
+        for vehicle_type, (base_adj, rate_adj) in VEHICLE_FARE_ADJUSTMENTS.items():
+            mask = types == vehicle_type
+            base_multiplier[mask] = base_adj
+            rate_multiplier[mask] = rate_adj
+
+    bases = base_fare * base_multiplier
+    fares = (bases + distances * (rate_per_km * rate_multiplier)) * surge
+    return np.maximum(fares, bases * surge)
+
+def predict_etas(distances_km, average_speed_kmh=30):
+    """Vectorized counterpart of predict_eta. Returns minutes; inf where the speed is not positive."""
+    distances = np.asarray(distances_km, dtype=np.float64)
+    speeds = np.asarray(average_speed_kmh, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        minutes = distances / speeds * 60
+    return np.where(speeds > 0, minutes, np.inf)
+
+def quote_rides(origins, destinations, vehicle_types='SEDAN', surge_multipliers=1.0, pairwise=False, average_speed_kmh=30):
+    """
+    Batch quote for many origin/destination combinations.
+
+    Returns a dict of numpy arrays: 'distance_km', 'fare' and 'eta_minutes',
+    shaped as described for calculate_distances.
+    """
+    distances = calculate_distances(origins, destinations, pairwise=pairwise)
+    return {
+        'distance_km': distances,
+        'fare': calculate_fares(distances, vehicle_types=vehicle_types, surge_multipliers=surge_multipliers),
+        'eta_minutes': predict_etas(distances, average_speed_kmh=average_speed_kmh)
+    }
+
 # Example usage (can be removed or kept for testing):
 if __name__ == '__main__':
     # Test distance calculation (e.g., two points in a city)
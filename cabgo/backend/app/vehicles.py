@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
-from .models import User, DriverProfile, Vehicle
+from .models import DriverProfile, Vehicle
 from . import db
 from .decorators import token_required
-import datetime
+from .serializers import VEHICLE, json_response
 
 vehicles_bp = Blueprint('vehicles', __name__)
 
@@ -14,7 +14,7 @@ def add_vehicle(current_user):
         return jsonify({'message': 'Only registered drivers can add vehicles.'}), 403
     
     # Optionally, check if the driver's profile is verified before allowing vehicle addition
-    driver_profile = DriverProfile.query.filter_by(user_id=current_user.id).first()
+    driver_profile = db.session.get(DriverProfile, current_user.driver_profile_id) if current_user.driver_profile_id else None
     if not driver_profile or not driver_profile.is_verified:
         return jsonify({'message': 'Driver profile not found or not verified. Cannot add vehicle.'}), 403
 
@@ -88,27 +88,11 @@ def list_driver_vehicles(current_user):
     # if not driver_profile:
     #     return jsonify({'message': 'Driver profile not found.'}), 404
 
-    vehicles = Vehicle.query.filter_by(driver_id=current_user.id).all()
+    vehicles = VEHICLE.dump_all(db.session.query(*VEHICLE.columns).filter(Vehicle.driver_id == current_user.id))
 
     if not vehicles:
         return jsonify({'message': 'No vehicles found for this driver.', 'vehicles': []}), 200
 
-    output = []
-    for vehicle in vehicles:
-        vehicle_data = {
-            'id': vehicle.id,
-            'make': vehicle.make,
-            'model': vehicle.model,
-            'year': vehicle.year,
-            'color': vehicle.color,
-            'license_plate': vehicle.license_plate,
-            'vehicle_type': vehicle.vehicle_type,
-            'is_active': vehicle.is_active,
-            'created_at': vehicle.created_at.isoformat() if vehicle.created_at else None,
-            'updated_at': vehicle.updated_at.isoformat() if vehicle.updated_at else None
-        }
-        output.append(vehicle_data)
-    
-    return jsonify({'vehicles': output}), 200
+    return json_response({'vehicles': vehicles})
 
 # Other vehicle-related routes (list, update, delete) can be added here
@@ -0,0 +1,10 @@
+"""
+ASGI entry point: `uvicorn asgi:app`.
+
+The hot driver endpoints are served on the event loop by app.fast_path;
+every other route runs in the Flask app through a thread pool.
+"""
+from app import create_app
+from app.fast_path import create_asgi_app
+
+app = create_asgi_app(create_app())
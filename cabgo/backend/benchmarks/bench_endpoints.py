@@ -0,0 +1,275 @@
+"""
+Latency and queries per request for every blueprint endpoint on a city-scale dataset.
+
+Each scenario runs --warmup untimed requests and then --iterations timed ones
+through the Flask test client. Per-iteration setup (booking a ride to cancel,
+creating a user to delete, ...) happens outside the timing. Reports p50/p99
+latency, SQL statements per request (app.query_stats) and non-2xx responses.
+
+The dataset comes from generate_dataset.py; it is generated first when
+--database does not exist (at --scale). Several scenarios write (register,
+book, add a vehicle, ...), so each run works on a temporary copy and
+--database keeps the rows the baseline was recorded on. Results are compared with the baseline
+file when one exists, and --save-baseline overwrites it. A scenario regresses
+when it runs more queries than its baseline, or when its p50 is more than
+--tolerance slower (and at least 1 ms slower). Regressions exit with status 1.
+
+    python benchmarks/bench_endpoints.py --database /tmp/cabgo_bench.db --save-baseline
+    python benchmarks/bench_endpoints.py --database /tmp/cabgo_bench.db --only 'admin|history'
+"""
+import argparse
+import datetime
+import itertools
+import json
+import math
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.location_buffer import location_buffer  # noqa: E402
+from app.models import User, DriverProfile, Ride  # noqa: E402
+from app.query_stats import query_stats  # noqa: E402
+from app.tokens import issue_tokens  # noqa: E402
+from generate_dataset import CITIES, config_for, generate  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'endpoints.json')
+_unique = itertools.count()
+
+
+class Context:
+    """Accounts and ids the scenarios act on, looked up once from the dataset."""
+
+    def __init__(self, password):
+        self.password = password
+        self.counts = {
+            'users': db.session.scalar(select(func.count(User.id))),
+            'drivers': db.session.scalar(select(func.count(DriverProfile.id))),
+            'rides': db.session.scalar(select(func.count(Ride.id))),
+        }
+        # Plain values, not ORM objects: the session is removed between requests
+        self.rider_email = 'rider0@bench.cabgo'
+        self.rider_id = db.session.scalar(select(User.id).where(User.email == self.rider_email))
+        self.driver_profile_id, driver_user_id = db.session.execute(
+            select(DriverProfile.id, DriverProfile.user_id).where(DriverProfile.is_verified.is_(True)).order_by(DriverProfile.id).limit(1)
+        ).one()
+        self.ride_id = db.session.scalar(select(func.max(Ride.id)).where(Ride.passenger_id == self.rider_id))
+        self.admin_headers = self._headers(1, True, False, None)
+        self.rider_headers = self._headers(self.rider_id, False, False, None)
+        self.driver_headers = self._headers(driver_user_id, False, True, self.driver_profile_id)
+        _, self.rider_refresh = issue_tokens(self.rider_id, False, False, None)
+        self.client = None
+
+    @staticmethod
+    def _headers(user_id, is_admin, is_driver, driver_profile_id):
+        access, _ = issue_tokens(user_id, is_admin, is_driver, driver_profile_id)
+        return {'Authorization': f'Bearer {access}'}
+
+    def new_user(self):
+        """A fresh non-driver account and its auth headers."""
+        n = next(_unique)
+        user_id = db.session.execute(insert(User).values(
+            email=f'bench-new-{os.getpid()}-{n}-{time.time_ns()}@bench.cabgo', password_hash='x',
+            full_name='Bench New', is_driver=False, is_admin=False,
+        )).inserted_primary_key[0]
+        db.session.commit()
+        return user_id, self._headers(user_id, False, False, None)
+
+    def unpaid_completed_ride(self):
+        ride_id = db.session.scalar(select(Ride.id).where(
+            Ride.passenger_id == self.rider_id, Ride.status == 'COMPLETED', Ride.payment_status == 'PENDING'
+        ).limit(1))
+        if ride_id is None:  # Heavy use of the scenario drained them; make one
+            db.session.execute(Ride.__table__.update().where(Ride.id == self.ride_id).values(status='COMPLETED', payment_status='PENDING'))
+            db.session.commit()
+            ride_id = self.ride_id
+        return ride_id
+
+    def booked_ride(self, headers=None):
+        response = self.client.post('/api/rides/book-ride', headers=headers or self.rider_headers, json=booking())
+        return response.get_json()['ride']['id']
+
+
+def working_copy(database, directory):
+    """Copies the dataset (WAL contents included) into directory; scenarios write to the copy."""
+    path = os.path.join(directory, os.path.basename(database))
+    source, target = sqlite3.connect(database), sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return path
+
+
+def booking():
+    _, _, lat, lon, _ = CITIES[0]
+    n = next(_unique)
+    return {'pickup_location': {'latitude': lat + (n % 100) * 0.001, 'longitude': lon, 'address_line1': 'Bench pickup'},
+            'dropoff_location': {'latitude': lat, 'longitude': lon + 0.02}}
+
+
+# name -> (method, setup(ctx) returning (url, headers, json body or None))
+SCENARIOS = {
+    'health': ('GET', lambda ctx: ('/health', None, None)),
+    'metrics': ('GET', lambda ctx: ('/metrics', None, None)),
+    'auth register': ('POST', lambda ctx: ('/api/auth/register', None, {
+        'email': f'bench-reg-{os.getpid()}-{next(_unique)}-{time.time_ns()}@bench.cabgo', 'password': ctx.password})),
+    'auth login': ('POST', lambda ctx: ('/api/auth/login', None, {'email': ctx.rider_email, 'password': ctx.password})),
+    'auth refresh': ('POST', lambda ctx: ('/api/auth/refresh', None, {'refresh_token': ctx.rider_refresh})),
+    'auth me': ('GET', lambda ctx: ('/api/auth/me', ctx.rider_headers, None)),
+    'rides book': ('POST', lambda ctx: ('/api/rides/book-ride', ctx.rider_headers, booking())),
+    'rides history': ('GET', lambda ctx: ('/api/rides/history', ctx.rider_headers, None)),
+    'rides history page 5': ('GET', lambda ctx: (history_page(ctx, 5), ctx.rider_headers, None)),
+    'rides cancel': ('POST', lambda ctx: (f'/api/rides/{ctx.booked_ride()}/cancel', ctx.rider_headers, None)),
+    'rides process payment': ('POST', lambda ctx: (f'/api/rides/{ctx.unpaid_completed_ride()}/process-payment', ctx.rider_headers, {})),
+    'drivers register': ('POST', lambda ctx: ('/api/drivers/register', ctx.new_user()[1], {'license_number': f'BENCH-NEW-{time.time_ns()}'})),
+    'drivers available': ('GET', lambda ctx: ('/api/drivers/available', None, None)),
+    'drivers nearby': ('GET', lambda ctx: (f'/api/drivers/nearby?lat={CITIES[0][2]}&lon={CITIES[0][3]}&radius_km=5&k=10', None, None)),
+    'drivers availability': ('PATCH', lambda ctx: ('/api/drivers/availability', ctx.driver_headers, {
+        'availability_status': 'AVAILABLE', 'latitude': CITIES[0][2], 'longitude': CITIES[0][3]})),
+    'drivers location': ('POST', lambda ctx: ('/api/drivers/location', ctx.driver_headers, {
+        'latitude': CITIES[0][2] + (next(_unique) % 50) * 0.0001, 'longitude': CITIES[0][3]})),
+    'vehicles add': ('POST', lambda ctx: ('/api/vehicles/add', ctx.driver_headers, {
+        'make': 'Bench', 'model': 'Model', 'license_plate': f'BN{time.time_ns() % 10**12}', 'vehicle_type': 'SEDAN'})),
+    'vehicles list': ('GET', lambda ctx: ('/api/vehicles', ctx.driver_headers, None)),
+    'admin users': ('GET', lambda ctx: ('/api/admin/users', ctx.admin_headers, None)),
+    'admin user': ('GET', lambda ctx: (f'/api/admin/users/{ctx.rider_id}', ctx.admin_headers, None)),
+    'admin user update': ('PATCH', lambda ctx: (f'/api/admin/users/{ctx.rider_id}', ctx.admin_headers, {'full_name': 'Rider 0'})),
+    'admin user delete': ('DELETE', lambda ctx: (f'/api/admin/users/{ctx.new_user()[0]}', ctx.admin_headers, None)),
+    'admin verify driver': ('PATCH', lambda ctx: (f'/api/admin/drivers/{ctx.driver_profile_id}/verify', ctx.admin_headers, {
+        'verification_notes': 'bench'})),
+    'admin rides': ('GET', lambda ctx: ('/api/admin/rides', ctx.admin_headers, None)),
+    'admin rides by status': ('GET', lambda ctx: ('/api/admin/rides?status=CANCELLED_DRIVER', ctx.admin_headers, None)),
+    'admin rides by date': ('GET', lambda ctx: (f"/api/admin/rides?from={days_ago(30)}&to={days_ago(29)}", ctx.admin_headers, None)),
+    'admin ride': ('GET', lambda ctx: (f'/api/admin/rides/{ctx.ride_id}', ctx.admin_headers, None)),
+    'admin ride cancel': ('PATCH', lambda ctx: (f'/api/admin/rides/{ctx.booked_ride()}/cancel-by-admin', ctx.admin_headers, None)),
+    'admin stats': ('GET', lambda ctx: ('/api/admin/stats', ctx.admin_headers, None)),
+    'admin timeseries': ('GET', lambda ctx: (f"/api/admin/analytics/timeseries?from={days_ago(7)}&to={days_ago(0)}", ctx.admin_headers, None)),
+}
+
+
+def days_ago(days):
+    moment = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+    return moment.strftime('%Y-%m-%dT%H:00:00')
+
+
+def history_page(ctx, page):
+    url = '/api/rides/history'
+    for _ in range(page - 1):
+        cursor = ctx.client.get(url, headers=ctx.rider_headers).get_json().get('next_cursor')
+        if not cursor:
+            break
+        url = f'/api/rides/history?before={cursor}'
+    return url
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def run_scenario(ctx, method, setup, iterations, warmup):
+    latencies, queries, failures = [], [], 0
+    for i in range(warmup + iterations):
+        url, headers, body = setup(ctx)
+        db.session.remove()  # Handlers start from an empty identity map, as in a fresh request
+        with query_stats.capture() as stats:
+            started = time.perf_counter()
+            response = ctx.client.open(url, method=method, headers=headers, json=body)
+            response.get_data()  # Drain streamed bodies inside the timing
+            elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(stats.count)
+        failures += not 200 <= response.status_code < 300
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'queries': round(statistics.mean(queries), 2),
+        'failures': failures,
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries per request")
+        if result['p50_ms'] > before['p50_ms'] * (1 + tolerance) and result['p50_ms'] - before['p50_ms'] >= 1:
+            regressions.append(f"{name}: p50 {before['p50_ms']:.1f} -> {result['p50_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite dataset; generated when missing')
+    parser.add_argument('--scale', type=float, default=1.0, help='Dataset scale when generating (1.0 = 10^6 rides)')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', help='Regex; run only matching scenarios')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p50 slowdown before flagging (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        generate(args.database, users=int(100000 * args.scale), drivers=int(10000 * args.scale),
+                 rides=int(1000000 * args.scale), locations=int(50000 * args.scale), password=args.password)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(config_class=config_for(working_copy(args.database, tmp)))
+        with app.app_context():
+            ctx = Context(args.password)
+            ctx.client = app.test_client()
+            print(f"dataset: {', '.join(f'{name} {value}' for name, value in ctx.counts.items())}")
+            print(f"{'scenario':<24} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8} {'non-2xx':>8}")
+            for name, (method, setup) in SCENARIOS.items():
+                if args.only and not re.search(args.only, name):
+                    continue
+                result = results[name] = run_scenario(ctx, method, setup, args.iterations, args.warmup)
+                print(f"{name:<24} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['queries']:>8.1f} {result['failures']:>8}")
+            counts = ctx.counts
+            location_buffer.flush()  # Not at exit, when the copy is gone
+            db.session.remove()
+            db.engine.dispose()  # Close the copy's connections before the directory is removed
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('dataset') != counts:
+            print(f"note: baseline dataset {baseline.get('dataset')} differs from this one")
+    if args.save_baseline:
+        merged = dict(baseline['scenarios']) if baseline and baseline.get('dataset') == counts else {}
+        merged.update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'dataset': counts, 'scenarios': merged}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baseline saved to {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline['scenarios'], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("no regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
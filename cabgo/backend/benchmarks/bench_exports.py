@@ -0,0 +1,70 @@
+"""
+Peak Python memory of the streamed admin exports vs the buffered GET /api/admin/users.
+
+Generates one dataset per --scales entry, then for each endpoint consumes
+the response chunk by chunk under tracemalloc and reports the peak
+allocation and the bytes produced. A streamed export's peak should stay flat
+as the dataset grows, while the buffered listing grows with the user count.
+
+    python benchmarks/bench_exports.py --scales 0.01,0.05,0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from app.tokens import issue_tokens  # noqa: E402
+from generate_dataset import config_for, generate  # noqa: E402
+
+ENDPOINTS = (
+    '/api/admin/users',
+    '/api/admin/export/users?format=ndjson',
+    '/api/admin/export/users?format=csv',
+    '/api/admin/export/drivers?format=csv',
+    '/api/admin/export/rides?format=ndjson',
+)
+
+
+def measure(client, headers, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(path, headers=headers, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if response.status_code != 200:
+        raise SystemExit(f"{path}: HTTP {response.status_code}")
+    return peak, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='0.01,0.05', help='Comma-separated dataset scales')
+    args = parser.parse_args()
+
+    print(f"{'scale':>6} {'endpoint':<40} {'peak MiB':>9} {'output MiB':>11} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in (float(value) for value in args.scales.split(',')):
+            database = os.path.join(tmp, f'bench-{scale}.db')
+            generate(database, users=int(100000 * scale), drivers=int(10000 * scale),
+                     rides=int(1000000 * scale), locations=int(50000 * scale), log=lambda message: None)
+            app = create_app(config_class=config_for(database))
+            with app.app_context():
+                headers = {'Authorization': f"Bearer {issue_tokens(1, True, False, None)[0]}"}
+            client = app.test_client()
+            for path in ENDPOINTS:
+                peak, size, elapsed = measure(client, headers, path)
+                print(f"{scale:>6g} {path:<40} {peak / 2 ** 20:>9.1f} {size / 2 ** 20:>11.1f} {elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Concurrent connections per server process: the ASGI fast path vs the threaded Flask server.
+
+Serves the same app from a separate process in two ways:
+
+  * asgi - uvicorn running asgi.py's application, where GPS pings,
+    availability toggles and nearby lookups are coroutines on one event loop;
+  * wsgi - the threaded werkzeug server used by simulate_load.py, which
+    starts a thread per request and closes the connection after each response.
+
+An asyncio client then runs --connections simulated driver apps, each on
+its own connection (re-opened whenever the server closes it). Each one loops: wait an exponential think
+time (--think), then send a location ping, a nearby-driver lookup or an
+availability toggle (--mix). Every entry of --connections is one stage, and
+per stage the benchmark reports achieved vs offered req/s, latency
+percentiles, errors and the server process's thread count and RSS. Past
+saturation the fast path's tail is set by pings from drivers missing from the
+index: each one costs a status SELECT that waits for a connection from the
+async pool.
+
+    python benchmarks/bench_fast_path.py --database /tmp/cabgo_fast.db --connections 100,500,1000,2000
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import DriverProfile  # noqa: E402
+from app.tokens import issue_tokens  # noqa: E402
+from generate_dataset import generate  # noqa: E402
+from simulate_load import CENTER_LAT, CENTER_LON, CITY_RADIUS_DEG, _QuietHandler, load_config  # noqa: E402
+
+
+def serve(mode, database, port, ready):
+    """Child process: one server, until terminated."""
+    app = create_app(config_class=load_config(database))
+    if mode == 'asgi':
+        import uvicorn
+        from app.fast_path import create_asgi_app
+
+        config = uvicorn.Config(create_asgi_app(app), host='127.0.0.1', port=port, log_level='warning',
+                                access_log=False, timeout_keep_alive=120, backlog=4096)
+        server = uvicorn.Server(config)
+        ready.set()
+        server.run()
+    else:
+        from werkzeug.serving import BaseWSGIServer, make_server
+
+        BaseWSGIServer.request_queue_size = 4096  # Same listen backlog as uvicorn
+        server = make_server('127.0.0.1', port, app, threaded=True, request_handler=_QuietHandler)
+        ready.set()
+        server.serve_forever()
+
+
+def process_stats(pid):
+    """(threads, RSS MiB) of a process, from /proc."""
+    threads, rss_kib = 0, 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('Threads:'):
+                threads = int(line.split()[1])
+            elif line.startswith('VmRSS:'):
+                rss_kib = int(line.split()[1])
+    return threads, rss_kib / 1024
+
+
+class Connection:
+    """An HTTP/1.1 connection, kept alive unless the server closes it; reconnects as needed."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", f"Content-Length: {len(payload)}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        if body is not None:
+            head.append("Content-Type: application/json")
+        try:
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+            self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+            await self.writer.drain()
+            status = int((await self.reader.readline()).split()[1])
+            length, keep_alive = 0, True
+            while True:
+                line = await self.reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+                elif name.lower() == 'connection':
+                    keep_alive = value.strip().lower() != 'close'
+            await self.reader.readexactly(length)
+            if not keep_alive:
+                self.close()
+            return status
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+            self.close()
+            return None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def simulate_driver(port, headers, mix, think, rng, recorder, stop):
+    connection = Connection(port)
+    lat = CENTER_LAT + rng.uniform(-CITY_RADIUS_DEG, CITY_RADIUS_DEG)
+    lon = CENTER_LON + rng.uniform(-CITY_RADIUS_DEG, CITY_RADIUS_DEG)
+    status_name = 'AVAILABLE'
+    actions, weights = zip(*mix.items())
+    await asyncio.sleep(rng.uniform(0, think))  # Spread the first requests over one think time
+    while not stop.is_set():
+        lat += rng.gauss(0, 0.0005)
+        lon += rng.gauss(0, 0.0005)
+        action = rng.choices(actions, weights)[0]
+        started = time.perf_counter()
+        if action == 'location':
+            status = await connection.request('POST', '/api/drivers/location', headers,
+                                              {'latitude': lat, 'longitude': lon})
+        elif action == 'nearby':
+            status = await connection.request('GET', f'/api/drivers/nearby?lat={lat:.5f}&lon={lon:.5f}&radius_km=3', {})
+        else:
+            status_name = 'BUSY' if status_name == 'AVAILABLE' else 'AVAILABLE'
+            status = await connection.request('PATCH', '/api/drivers/availability', headers,
+                                              {'availability_status': status_name, 'latitude': lat, 'longitude': lon})
+        recorder.add(time.perf_counter() - started, status)
+        try:
+            await asyncio.wait_for(stop.wait(), rng.expovariate(1.0 / think))
+        except asyncio.TimeoutError:
+            pass
+    connection.close()
+
+
+class Recorder:
+    def __init__(self):
+        self.recording = False
+        self.latencies = []
+        self.errors = 0
+
+    def add(self, seconds, status):
+        if self.recording:
+            self.latencies.append(seconds)
+            if status is None or status >= 400:
+                self.errors += 1
+
+
+def percentile(ordered, q):
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)] if ordered else float('nan')
+
+
+async def run_stage(port, pid, tokens, connections, args, rng):
+    recorder = Recorder()
+    stop = asyncio.Event()
+    mix = dict((name, float(weight)) for name, weight in (item.split(':') for item in args.mix.split(',')))
+    tasks = [asyncio.create_task(simulate_driver(
+        port, {'Authorization': f'Bearer {tokens[i % len(tokens)]}'}, mix, args.think,
+        random.Random(rng.random()), recorder, stop)) for i in range(connections)]
+    await asyncio.sleep(args.think + args.warmup)
+    recorder.recording = True
+    await asyncio.sleep(args.duration / 2)
+    threads, rss = process_stats(pid)
+    await asyncio.sleep(args.duration / 2)
+    recorder.recording = False
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    ordered = sorted(recorder.latencies)
+    return {
+        'connections': connections,
+        'offered_per_s': round(connections / args.think, 1),
+        'requests_per_s': round(len(ordered) / args.duration, 1),
+        'p50_ms': round(percentile(ordered, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'error_rate': round(recorder.errors / len(ordered), 4) if ordered else 1.0,
+        'server_threads': threads,
+        'server_rss_mib': round(rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite dataset from generate_dataset.py; generated when missing')
+    parser.add_argument('--scale', type=float, default=0.1, help='Dataset scale when generating')
+    parser.add_argument('--modes', default='asgi,wsgi')
+    parser.add_argument('--connections', default='100,500,1000', help='Comma-separated connection counts, one stage each')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean seconds between a connection\'s requests')
+    parser.add_argument('--mix', default='location:0.7,nearby:0.25,availability:0.05')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds measured per stage')
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        generate(args.database, users=int(100000 * args.scale), drivers=int(10000 * args.scale),
+                 rides=int(1000000 * args.scale), locations=int(50000 * args.scale))
+
+    app = create_app(config_class=load_config(args.database))
+    with app.app_context():
+        drivers = db.session.execute(
+            select(DriverProfile.user_id, DriverProfile.id).where(DriverProfile.is_verified.is_(True)).order_by(DriverProfile.id)
+        ).all()
+        tokens = [issue_tokens(user_id, False, True, profile_id)[0] for user_id, profile_id in drivers]
+        db.session.remove()
+
+    context = multiprocessing.get_context('spawn')
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{len(tokens)} driver tokens; think ~{args.think:g}s; mix {args.mix}; {args.duration:g}s per stage")
+    print(f"{'mode':<5} {'conns':>6} {'offered/s':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'threads':>8} {'RSS MiB':>8}")
+    for mode in args.modes.split(','):
+        ready = context.Event()
+        server = context.Process(target=serve, args=(mode, args.database, args.port, ready), daemon=True)
+        server.start()
+        ready.wait(60)
+        time.sleep(1)  # Let the server finish binding and its lifespan startup
+        try:
+            for connections in (int(count) for count in args.connections.split(',')):
+                row = asyncio.run(run_stage(args.port, server.pid, tokens, connections, args, rng))
+                row['mode'] = mode
+                results.append(row)
+                print(f"{mode:<5} {connections:>6} {row['offered_per_s']:>10.1f} {row['requests_per_s']:>8.1f} "
+                      f"{row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['error_rate']:>7.2%} "
+                      f"{row['server_threads']:>8} {row['server_rss_mib']:>8.1f}")
+        finally:
+            server.terminate()
+            server.join()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Logins per second against password-hashing pool size.
+
+Runs concurrent POST /api/auth/login requests through the Flask test client on a
+throwaway SQLite database, once per pool size, and reports throughput, latency
+and how many requests were shed with 503. Pool size 0 hashes on the request
+thread (the old behaviour).
+
+    python benchmarks/bench_password_hashing.py --pool-sizes 0,1,2,4 --concurrency 16 --requests 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db  # noqa: E402
+from app.hashing import password_hasher  # noqa: E402
+from app.models import User  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def run(pool_size, args, db_path):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        TESTING = True
+        DISPATCH_IN_PROCESS = False
+        LOCATION_FLUSH_INTERVAL_SECONDS = 0
+        SURGE_RECOMPUTE_INTERVAL_SECONDS = 0
+        SPEED_PROFILE_PATH = None
+        PASSWORD_HASH_METHOD = args.method
+        PASSWORD_HASH_WORKERS = pool_size
+        PASSWORD_HASH_MAX_PENDING = args.max_pending
+
+    app = create_app(config_class=BenchConfig)
+    with app.app_context():
+        db.create_all()
+        if not User.query.filter_by(email='bench@example.com').first():
+            user = User(email='bench@example.com', full_name='Bench User')
+            user.set_password('bench-password')
+            db.session.add(user)
+            db.session.commit()
+        password_hasher.verify(User.query.first().password_hash, 'warm-up')  # Start the pool outside the timing
+
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker():
+        client = app.test_client()
+        for _ in counter:
+            started = time.perf_counter()
+            response = client.post('/api/auth/login', json={'email': 'bench@example.com', 'password': 'bench-password'})
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    password_hasher.shutdown()
+
+    ok = statuses.count(200)
+    latencies.sort()
+    return {
+        'pool_size': pool_size,
+        'logins_per_s': ok / elapsed,
+        'shed': statuses.count(503),
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-sizes', default='0,1,2,4', help='Comma-separated PASSWORD_HASH_WORKERS values')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--max-pending', type=int, default=32)
+    parser.add_argument('--method', default=Config.PASSWORD_HASH_METHOD)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        print(f"{'pool':>5} {'logins/s':>10} {'shed':>6} {'p50 ms':>8} {'p95 ms':>8}")
+        for pool_size in (int(size) for size in args.pool_sizes.split(',')):
+            result = run(pool_size, args, db_path)
+            print(f"{result['pool_size']:>5} {result['logins_per_s']:>10.1f} {result['shed']:>6} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
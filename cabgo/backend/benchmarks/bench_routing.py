@@ -0,0 +1,167 @@
+"""
+Uncached point-to-point route latency on a city-sized road grid.
+
+Builds a --size x --size street grid (300 = 90,000 nodes, ~360,000 directed
+edges) with 20-40 km/h side streets and a 60 km/h arterial every tenth row
+and column, compiles it the way `flask build-road-graph` does (contraction
+hierarchy included; about a minute at 300) and saves it to --graph, which is
+reused when it exists. Then times --queries random node pairs through the
+hierarchy and through the A* fallback, checks a sample of answers against a
+plain Dijkstra, and reports p50/p99 per method.
+
+Every booking without a route-cache hit pays one of these queries. The run
+fails (exit status 1) when the hierarchy's p50 exceeds --max-p50-ms, or when
+it is more than --tolerance slower (and at least 1 ms slower) than the
+baseline file; --save-baseline overwrites it.
+
+    python benchmarks/bench_routing.py --graph /tmp/cabgo_grid300.npz --save-baseline
+    python benchmarks/bench_routing.py --graph /tmp/cabgo_grid300.npz
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.routing import RoadGraph  # noqa: E402
+from app.utils import calculate_distance  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'routing.json')
+SPACING_DEG = 0.005
+
+
+def write_grid(directory, size, seed):
+    rng = random.Random(seed)
+    step_m = calculate_distance(0, 0, 0, SPACING_DEG) * 1000
+    with open(os.path.join(directory, 'nodes.csv'), 'w') as f:
+        f.write('node_id,lat,lon\n')
+        for r in range(size):
+            for c in range(size):
+                f.write(f'{r * size + c},{12.8 + r * SPACING_DEG},{77.4 + c * SPACING_DEG}\n')
+    with open(os.path.join(directory, 'edges.csv'), 'w') as f:
+        f.write('source,target,length_m,speed_kmh,oneway\n')
+        for r in range(size):
+            for c in range(size):
+                node = r * size + c
+                if c + 1 < size:
+                    f.write(f'{node},{node + 1},{step_m},{60 if r % 10 == 0 else rng.uniform(20, 40)},0\n')
+                if r + 1 < size:
+                    f.write(f'{node},{node + size},{step_m},{60 if c % 10 == 0 else rng.uniform(20, 40)},0\n')
+
+
+def load_graph(path, size, seed):
+    if path and os.path.exists(path):
+        return RoadGraph.load(path)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_grid(tmp, size, seed)
+        started = time.perf_counter()
+        graph = RoadGraph.load(tmp)
+        print(f"compiled {len(graph)} nodes, {graph.num_edges} edges and {graph.hierarchy.num_edges} hierarchy edges "
+              f"in {time.perf_counter() - started:.1f} s")
+    if path:
+        graph.save(path)
+    return graph
+
+
+def dijkstra_time(graph, source, target):
+    indptr, indices, weights = graph._forward
+    best = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if node == target:
+            return cost
+        if cost > best[node]:
+            continue
+        for edge in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[edge]
+            new_cost = cost + weights[edge]
+            if new_cost < best.get(neighbour, float('inf')):
+                best[neighbour] = new_cost
+                heapq.heappush(heap, (new_cost, neighbour))
+    return float('inf')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_queries(query, pairs):
+    latencies = []
+    for source, target in pairs:
+        started = time.perf_counter()
+        query(source, target)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {'p50_ms': round(statistics.median(latencies), 3), 'p99_ms': round(percentile(latencies, 0.99), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--graph', help='Compiled .npz; built (and saved here) when missing')
+    parser.add_argument('--size', type=int, default=300, help='Grid side when building (300 = 90,000 nodes)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--astar-queries', type=int, default=30, help='The A* reference is slow; time fewer pairs')
+    parser.add_argument('--verify', type=int, default=10, help='Pairs checked against a plain Dijkstra')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--max-p50-ms', type=float, default=5.0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p50 slowdown before flagging (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    graph = load_graph(args.graph, args.size, args.seed)
+    rng = random.Random(args.seed)
+    pairs = [(rng.randrange(len(graph)), rng.randrange(len(graph))) for _ in range(args.queries)]
+
+    for source, target in pairs[:args.verify]:
+        expected, found = dijkstra_time(graph, source, target), graph.shortest_time(source, target)
+        if abs(found - expected) > 1e-6 * max(expected, 1.0):
+            sys.exit(f"shortest_time({source}, {target}) = {found}, Dijkstra says {expected}")
+
+    dataset = {'nodes': len(graph), 'edges': graph.num_edges}
+    results = {
+        'contraction hierarchy': time_queries(graph.shortest_time, pairs),
+        'a* fallback': time_queries(graph.astar_time, pairs[:args.astar_queries]),
+    }
+    print(f"graph: {dataset['nodes']} nodes, {dataset['edges']} directed edges")
+    print(f"{'method':<22} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<22} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+    failures = []
+    current = results['contraction hierarchy']
+    if current['p50_ms'] > args.max_p50_ms:
+        failures.append(f"contraction hierarchy p50 {current['p50_ms']:.1f} ms is over --max-p50-ms {args.max_p50_ms}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('dataset') != dataset:
+            print(f"note: baseline graph {baseline.get('dataset')} differs from this one")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'dataset': dataset, 'scenarios': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baseline saved to {args.baseline}")
+    elif baseline:
+        before = baseline['scenarios']['contraction hierarchy']
+        if current['p50_ms'] > before['p50_ms'] * (1 + args.tolerance) and current['p50_ms'] - before['p50_ms'] >= 1:
+            failures.append(f"contraction hierarchy: p50 {before['p50_ms']:.1f} -> {current['p50_ms']:.1f} ms")
+
+    for line in failures:
+        print(f"REGRESSION {line}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
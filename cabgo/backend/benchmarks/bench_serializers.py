@@ -0,0 +1,120 @@
+"""
+CPU per list response: ORM entities + hand-built dicts + stdlib JSON vs app.serializers shapes + orjson.
+
+Builds the admin user listing and an admin ride page the old way (full ORM
+entities, one dict per row built field by field with isoformat(), encoded by
+Flask's JSON provider) and through the column-projected shapes, on a
+generated dataset, and reports CPU milliseconds per response for each.
+
+    python benchmarks/bench_serializers.py --scale 0.05 --ride-page 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app import serializers  # noqa: E402
+from app.admin import build_admin_rides_query  # noqa: E402
+from app.models import DriverProfile, Ride, User  # noqa: E402
+from app.serializers import ADMIN_RIDE, USER_WITH_PROFILE, dumps  # noqa: E402
+from generate_dataset import config_for, generate  # noqa: E402
+
+
+def users_by_entities(app):
+    users_data = []
+    for user in User.query.all():
+        user_info = {
+            'id': user.id, 'email': user.email, 'full_name': user.full_name, 'phone_number': user.phone_number,
+            'is_driver': user.is_driver, 'is_admin': user.is_admin,
+            'created_at': user.created_at.isoformat() if user.created_at else None,
+            'updated_at': user.updated_at.isoformat() if user.updated_at else None,
+        }
+        if user.is_driver and user.driver_profile:
+            user_info['driver_profile'] = {
+                'id': user.driver_profile.id, 'license_number': user.driver_profile.license_number,
+                'is_verified': user.driver_profile.is_verified,
+                'availability_status': user.driver_profile.availability_status,
+            }
+        users_data.append(user_info)
+    return app.json.dumps({'users': users_data})
+
+
+def users_by_shape(app):
+    rows = db.session.query(*USER_WITH_PROFILE.columns).outerjoin(DriverProfile, DriverProfile.user_id == User.id)
+    return dumps({'users': USER_WITH_PROFILE.dump_all(rows)})
+
+
+def rides_by_entities(app, page):
+    rides_data = []
+    query = Ride.query.options(joinedload(Ride.passenger), joinedload(Ride.driver), joinedload(Ride.pickup_location),
+                               joinedload(Ride.dropoff_location))
+    for ride in query.order_by(Ride.requested_at.desc(), Ride.id.desc()).limit(page):
+        passenger, driver = ride.passenger, ride.driver
+        pickup, dropoff = ride.pickup_location, ride.dropoff_location
+        rides_data.append({
+            'id': ride.id, 'status': ride.status,
+            'passenger': {'id': passenger.id, 'full_name': passenger.full_name, 'email': passenger.email},
+            'driver': {'id': driver.id, 'full_name': driver.full_name, 'email': driver.email} if driver else None,
+            'pickup_location': {'latitude': pickup.latitude, 'longitude': pickup.longitude, 'address': pickup.address_line1},
+            'dropoff_location': {'latitude': dropoff.latitude, 'longitude': dropoff.longitude, 'address': dropoff.address_line1},
+            'requested_at': ride.requested_at.isoformat() if ride.requested_at else None,
+            'accepted_at': ride.accepted_at.isoformat() if ride.accepted_at else None,
+            'started_at': ride.started_at.isoformat() if ride.started_at else None,
+            'completed_at': ride.completed_at.isoformat() if ride.completed_at else None,
+            'cancelled_at': ride.cancelled_at.isoformat() if ride.cancelled_at else None,
+            'estimated_fare': ride.estimated_fare, 'actual_fare': ride.actual_fare,
+            'payment_status': ride.payment_status, 'vehicle_type_requested': ride.vehicle_type_requested,
+        })
+    return app.json.dumps({'rides': rides_data})
+
+
+def rides_by_shape(app, page):
+    return dumps({'rides': ADMIN_RIDE.dump_all(build_admin_rides_query().limit(page))})
+
+
+def cpu_ms(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.remove()  # Cold identity map each time, as in a fresh request
+        started = time.process_time()
+        func()
+        best = min(best, time.process_time() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='Dataset from generate_dataset.py (default: a temporary one at --scale)')
+    parser.add_argument('--scale', type=float, default=0.05)
+    parser.add_argument('--ride-page', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = args.database or os.path.join(tmp, 'bench.db')
+        if not os.path.exists(database):
+            generate(database, users=int(100000 * args.scale), drivers=int(10000 * args.scale),
+                     rides=int(1000000 * args.scale), locations=int(50000 * args.scale), log=lambda message: None)
+        app = create_app(config_class=config_for(database))
+        with app.app_context():
+            encoder = 'orjson' if serializers.orjson is not None else 'json (orjson not installed)'
+            users = User.query.count()
+            print(f"shape encoder: {encoder}")
+            print(f"{'response':<28} {'entities ms':>12} {'shapes ms':>10} {'speedup':>8}")
+            for name, old, new in (
+                (f'admin users ({users})', lambda: users_by_entities(app), lambda: users_by_shape(app)),
+                (f'admin rides ({args.ride_page})', lambda: rides_by_entities(app, args.ride_page),
+                 lambda: rides_by_shape(app, args.ride_page)),
+            ):
+                old_ms, new_ms = cpu_ms(old, args.repeat), cpu_ms(new, args.repeat)
+                print(f"{name:<28} {old_ms:>12.1f} {new_ms:>10.1f} {old_ms / new_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
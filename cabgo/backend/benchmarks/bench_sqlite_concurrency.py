@@ -0,0 +1,115 @@
+"""
+Concurrent read/write throughput on SQLite, default settings vs the production PRAGMAs.
+
+Reader threads run ride-history style indexed SELECTs while writer threads
+insert-and-commit rows, for a fixed duration per profile, on a fresh database
+file. Reports reads/s, writes/s and "database is locked" errors.
+
+    python benchmarks/bench_sqlite_concurrency.py --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.sqlite_pragmas import apply_pragmas  # noqa: E402
+from config import SQLITE_TUNED_PRAGMAS, engine_options_for  # noqa: E402
+
+PROFILES = {
+    'default': {},
+    'tuned': SQLITE_TUNED_PRAGMAS,
+}
+
+
+def setup(engine, rows):
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE rides (id INTEGER PRIMARY KEY, passenger_id INTEGER NOT NULL, "
+            "status VARCHAR(50) NOT NULL, requested_at DATETIME NOT NULL, estimated_fare FLOAT)"
+        ))
+        connection.execute(text("CREATE INDEX ix_rides_passenger ON rides (passenger_id, requested_at, id)"))
+        connection.execute(
+            text("INSERT INTO rides (passenger_id, status, requested_at, estimated_fare) "
+                 "VALUES (:p, 'COMPLETED', datetime('now', :offset), :fare)"),
+            [{'p': i % 1000, 'offset': f'-{i} seconds', 'fare': 100.0} for i in range(rows)]
+        )
+
+
+def run(profile, args, directory):
+    path = os.path.join(directory, f'{profile}.db')
+    uri = f'sqlite:///{path}'
+    engine = create_engine(uri, **engine_options_for(uri, pool_size=args.readers + args.writers, max_overflow=0))
+    apply_pragmas(engine, PROFILES[profile])
+    setup(engine, args.rows)
+
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def reader():
+        done = 0
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            with engine.connect() as connection:
+                connection.execute(
+                    text("SELECT id, status, requested_at, estimated_fare FROM rides WHERE passenger_id = :p "
+                         "ORDER BY requested_at DESC, id DESC LIMIT 20"),
+                    {'p': rng.randrange(1000)}
+                ).fetchall()
+            done += 1
+        with lock:
+            counts['reads'] += done
+
+    def writer():
+        done = locked = 0
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(
+                        text("INSERT INTO rides (passenger_id, status, requested_at, estimated_fare) "
+                             "VALUES (:p, 'REQUESTED', datetime('now'), 90.0)"),
+                        {'p': rng.randrange(1000)}
+                    )
+                done += 1
+            except OperationalError:
+                locked += 1
+        with lock:
+            counts['writes'] += done
+            counts['locked'] += locked
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {name: value / args.seconds if name != 'locked' else value for name, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'profile':>8} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+        for profile in PROFILES:
+            result = run(profile, args, directory)
+            print(f"{profile:>8} {result['reads']:>10.0f} {result['writes']:>10.0f} {result['locked']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Builds a city-scale synthetic dataset in a SQLite file for the endpoint benchmarks.
+
+Defaults: 10^5 users (10^4 of them drivers, each with a DriverProfile and a
+Vehicle), 10^6 rides over the last --days, and ~5*10^4 Locations clustered
+around hotspots in a few cities so pickups repeat the way real ones do. Rows
+go in through Core executemany inserts in chunks; the platform counters and
+the hourly rollups are then rebuilt from the tables.
+
+Known accounts (password: --password):
+    admin@bench.cabgo           admin (user 1)
+    driver0@bench.cabgo ...     drivers (users 2 .. drivers+1)
+    rider0@bench.cabgo ...      passengers, rider0 with the most rides
+
+    python benchmarks/generate_dataset.py --database /tmp/cabgo_bench.db
+    python benchmarks/generate_dataset.py --database /tmp/small.db --scale 0.01
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.hashing import password_hasher  # noqa: E402
+from app.models import User, DriverProfile, Vehicle, Location, Ride  # noqa: E402
+from config import Config  # noqa: E402
+
+# (city, state, latitude, longitude, share of locations and rides)
+CITIES = [
+    ('Bengaluru', 'KA', 12.9716, 77.5946, 0.35),
+    ('Mumbai', 'MH', 19.0760, 72.8777, 0.25),
+    ('Delhi', 'DL', 28.6139, 77.2090, 0.2),
+    ('Hyderabad', 'TS', 17.3850, 78.4867, 0.1),
+    ('Chennai', 'TN', 13.0827, 80.2707, 0.1),
+]
+HOTSPOTS_PER_CITY = 40
+HOTSPOT_SPREAD_DEG = 0.01     # ~1 km around a hotspot
+CITY_SPREAD_DEG = 0.08        # Hotspots within ~9 km of the centre
+VEHICLE_TYPES = ['SEDAN', 'HATCHBACK', 'SUV', 'MINIVAN', 'MOTORCYCLE']
+VEHICLE_TYPE_SHARE = [0.4, 0.3, 0.15, 0.05, 0.1]
+# Final statuses of rides older than ACTIVE_WINDOW; newer ones are still open
+FINAL_STATUSES = ['COMPLETED', 'CANCELLED_PASSENGER', 'CANCELLED_DRIVER', 'CANCELLED_ADMIN', 'NO_DRIVERS_FOUND']
+FINAL_STATUS_SHARE = [0.8, 0.09, 0.05, 0.01, 0.05]
+ACTIVE_STATUSES = ['REQUESTED', 'ACCEPTED', 'IN_PROGRESS']
+ACTIVE_WINDOW = datetime.timedelta(hours=2)
+CHUNK = 20000
+
+
+class DatasetConfig(Config):
+    TESTING = True
+    DISPATCH_IN_PROCESS = False
+    LOCATION_FLUSH_INTERVAL_SECONDS = 0
+    SURGE_RECOMPUTE_INTERVAL_SECONDS = 0
+    DRIVER_INDEX_RESYNC_INTERVAL_SECONDS = 0
+    SPEED_PROFILE_RELOAD_INTERVAL_SECONDS = 0
+    SPEED_PROFILE_PATH = None
+    ROLLUP_INTERVAL_SECONDS = 0
+    ROLLUP_LAG_SECONDS = 0
+    PASSWORD_HASH_WORKERS = 0
+    PLATFORM_COUNTERS_ENABLED = True  # The datasets are built with counters; /stats reads them
+
+
+def config_for(database):
+    return type('BenchDatabaseConfig', (DatasetConfig,), {'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.abspath(database)})
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(insert(model.__table__), rows[start:start + CHUNK])
+    db.session.commit()
+
+
+def _locations(rng, count):
+    """Unique snapped points around per-city hotspots: [(city index, lat, lon)]."""
+    shares = np.array([city[4] for city in CITIES])
+    points = []
+    for index, (_, _, lat, lon, _) in enumerate(CITIES):
+        hotspots = rng.normal((lat, lon), CITY_SPREAD_DEG, size=(HOTSPOTS_PER_CITY, 2))
+        wanted = int(count * shares[index] / shares.sum())
+        picks = hotspots[rng.integers(0, HOTSPOTS_PER_CITY, size=wanted * 2)]
+        coords = np.round(picks + rng.normal(0, HOTSPOT_SPREAD_DEG, size=picks.shape), 4)
+        coords = np.unique(coords, axis=0)[:wanted]
+        rng.shuffle(coords)
+        points.extend((index, float(p_lat), float(p_lon)) for p_lat, p_lon in coords)
+    return points
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * np.arcsin(np.sqrt(a))
+
+
+def generate(database, users=100000, drivers=10000, rides=1000000, locations=50000, days=90,
+             password='bench-password', seed=7, log=print):
+    """Creates the schema in `database` (which must not exist) and fills it. Returns row counts."""
+    if os.path.exists(database):
+        raise FileExistsError(f"{database} already exists; remove it or pick another path")
+    rng = np.random.default_rng(seed)
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    drivers = min(drivers, users - 1)
+    app = create_app(config_class=config_for(database))
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        started = time.perf_counter()
+
+        password_hash = password_hasher.hash(password)  # Shared by every account: one hash, not 10^5
+        created = [now - datetime.timedelta(days=days + 30) * float(f) for f in rng.random(users)]
+        user_rows = [{
+            'id': 1, 'email': 'admin@bench.cabgo', 'password_hash': password_hash, 'full_name': 'Bench Admin',
+            'phone_number': '+910000000000', 'is_admin': True, 'is_driver': False,
+            'created_at': created[0], 'updated_at': created[0],
+        }]
+        for i in range(1, users):
+            is_driver = i <= drivers
+            number = i - 1 if is_driver else i - drivers - 1
+            user_rows.append({
+                'id': i + 1,
+                'email': f"{'driver' if is_driver else 'rider'}{number}@bench.cabgo",
+                'password_hash': password_hash,
+                'full_name': f"{'Driver' if is_driver else 'Rider'} {number}",
+                'phone_number': f'+91{i:010d}',
+                'is_admin': False, 'is_driver': is_driver,
+                'created_at': created[i], 'updated_at': created[i],
+            })
+        _insert(User, user_rows)
+        log(f"users: {len(user_rows)} ({time.perf_counter() - started:.1f}s)")
+
+        points = _locations(rng, locations)
+        location_rows = [{
+            'id': i + 1, 'latitude': lat, 'longitude': lon, 'address_line1': f'{i + 1} Bench Road',
+            'city': CITIES[city][0], 'state': CITIES[city][1], 'created_at': now,
+        } for i, (city, lat, lon) in enumerate(points)]
+        _insert(Location, location_rows)
+        log(f"locations: {len(location_rows)} ({time.perf_counter() - started:.1f}s)")
+
+        location_city = np.array([city for city, _, _ in points])
+        location_lat = np.array([lat for _, lat, _ in points])
+        location_lon = np.array([lon for _, _, lon in points])
+        by_city = [np.flatnonzero(location_city == index) for index in range(len(CITIES))]
+
+        # Drivers: 70% verified; half of those online near a hotspot
+        verified = rng.random(drivers) < 0.7
+        availability = np.where(verified, rng.choice(['AVAILABLE', 'BUSY', 'OFFLINE'], size=drivers, p=[0.35, 0.15, 0.5]), 'OFFLINE')
+        driver_spots = rng.integers(0, len(points), size=drivers)
+        profile_rows, vehicle_rows = [], []
+        for i in range(drivers):
+            online = availability[i] != 'OFFLINE'
+            spot = driver_spots[i]
+            profile_rows.append({
+                'id': i + 1, 'user_id': i + 2, 'license_number': f'BENCH-DL-{i:08d}',
+                'is_verified': bool(verified[i]), 'availability_status': str(availability[i]),
+                'current_latitude': float(location_lat[spot] + rng.normal(0, 0.003)) if online else None,
+                'current_longitude': float(location_lon[spot] + rng.normal(0, 0.003)) if online else None,
+                'last_location_update': now if online else None,
+                'created_at': created[i + 1], 'updated_at': created[i + 1],
+            })
+            vehicle_rows.append({
+                'id': i + 1, 'driver_id': i + 2, 'make': 'Bench', 'model': 'Model', 'year': 2015 + i % 10,
+                'color': 'White', 'license_plate': f'KA{i:08d}',
+                'vehicle_type': str(rng.choice(VEHICLE_TYPES, p=VEHICLE_TYPE_SHARE)),
+                'is_active': bool(verified[i]), 'created_at': created[i + 1], 'updated_at': created[i + 1],
+            })
+        _insert(DriverProfile, profile_rows)
+        _insert(Vehicle, vehicle_rows)
+        log(f"drivers: {len(profile_rows)} profiles and vehicles ({time.perf_counter() - started:.1f}s)")
+
+        # Rides: log-normal activity per passenger, heaviest first (rider0 has the longest history);
+        # pickups and dropoffs in the same city
+        activity = np.sort(rng.lognormal(0, 1, size=users - drivers - 1))[::-1]
+        passengers = drivers + 2 + rng.choice(len(activity), size=rides, p=activity / activity.sum())
+        ride_city = rng.choice(len(CITIES), size=rides, p=np.array([city[4] for city in CITIES]))
+        pickup = np.empty(rides, dtype=np.int64)
+        dropoff = np.empty(rides, dtype=np.int64)
+        for index, candidates in enumerate(by_city):
+            mask = ride_city == index
+            pickup[mask] = rng.choice(candidates, size=mask.sum())
+            dropoff[mask] = rng.choice(candidates, size=mask.sum())
+        distance_km = _haversine_km(location_lat[pickup], location_lon[pickup], location_lat[dropoff], location_lon[dropoff])
+        fare = np.round(50.0 + 12.0 * distance_km * rng.uniform(0.9, 1.6, size=rides), 2)
+        age_seconds = np.sort(rng.uniform(0, days * 86400, size=rides))[::-1]
+        final = rng.choice(FINAL_STATUSES, size=rides, p=FINAL_STATUS_SHARE)
+        active = rng.choice(ACTIVE_STATUSES, size=rides)
+        minutes = np.maximum(distance_km * 2.5, 3.0)
+        vehicle_type = rng.choice(VEHICLE_TYPES, size=rides, p=VEHICLE_TYPE_SHARE)
+        assigned_driver = rng.integers(2, drivers + 2, size=rides)
+        paid = rng.random(rides) < 0.95
+
+        count = 0
+        for start in range(0, rides, CHUNK):
+            rows = []
+            for j in range(start, min(start + CHUNK, rides)):
+                requested_at = now - datetime.timedelta(seconds=float(age_seconds[j]))
+                status = str(active[j]) if now - requested_at < ACTIVE_WINDOW else str(final[j])
+                row = {
+                    'id': j + 1, 'passenger_id': int(passengers[j]), 'driver_id': None,
+                    'pickup_location_id': int(pickup[j]) + 1, 'dropoff_location_id': int(dropoff[j]) + 1,
+                    'status': status, 'requested_at': requested_at, 'accepted_at': None, 'started_at': None,
+                    'completed_at': None, 'cancelled_at': None, 'estimated_fare': float(fare[j]), 'actual_fare': None,
+                    'payment_status': 'PENDING', 'vehicle_type_requested': str(vehicle_type[j]),
+                }
+                if status not in ('REQUESTED', 'NO_DRIVERS_FOUND', 'CANCELLED_PASSENGER'):
+                    row['driver_id'] = int(assigned_driver[j])
+                    row['accepted_at'] = requested_at + datetime.timedelta(seconds=90)
+                if status in ('IN_PROGRESS', 'COMPLETED'):
+                    row['started_at'] = requested_at + datetime.timedelta(minutes=6)
+                if status == 'COMPLETED':
+                    row['completed_at'] = row['started_at'] + datetime.timedelta(minutes=float(minutes[j]))
+                    row['actual_fare'] = row['estimated_fare']
+                    row['payment_status'] = 'PAID' if paid[j] else 'PENDING'
+                elif status.startswith('CANCELLED') or status == 'NO_DRIVERS_FOUND':
+                    row['cancelled_at'] = requested_at + datetime.timedelta(minutes=3)
+                rows.append(row)
+            db.session.execute(insert(Ride.__table__), rows)
+            count += len(rows)
+            if count % (CHUNK * 10) == 0:
+                log(f"rides: {count} ({time.perf_counter() - started:.1f}s)")
+        db.session.commit()
+        if count % (CHUNK * 10):
+            log(f"rides: {count} ({time.perf_counter() - started:.1f}s)")
+
+        from app.platform_stats import platform_counters
+        from app.rollups import ride_rollups
+        platform_counters.rebuild()
+        ride_rollups.update()
+        db.session.execute(text('ANALYZE'))  # Planner statistics, as a long-lived database would have
+        db.session.commit()
+        log(f"counters, rollups and ANALYZE done ({time.perf_counter() - started:.1f}s)")
+        db.session.remove()
+    return {'users': len(user_rows), 'drivers': drivers, 'locations': len(location_rows), 'rides': count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file to create')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplies every row count below')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--drivers', type=int, default=10000)
+    parser.add_argument('--rides', type=int, default=1000000)
+    parser.add_argument('--locations', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    counts = generate(
+        args.database,
+        users=max(int(args.users * args.scale), 10), drivers=max(int(args.drivers * args.scale), 2),
+        rides=max(int(args.rides * args.scale), 100), locations=max(int(args.locations * args.scale), 50),
+        days=args.days, password=args.password, seed=args.seed,
+    )
+    print(', '.join(f"{name}: {value}" for name, value in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+Closed-loop load simulator: drivers pinging their position, passengers booking, cancelling and paging history.
+
+Serves a live create_app instance (production-like background tasks, tuned
+SQLite PRAGMAs, in-process dispatch) from a threaded WSGI server on a local
+port, and runs one client thread per simulated user over keep-alive HTTP:
+
+  * each driver sends PATCH /api/drivers/availability with a random-walk
+    position, every --ping-interval seconds on average;
+  * each passenger waits an exponential think time (--think mean), books a
+    ride, cancels it with probability --cancel-rate after a short delay, and
+    reads its history with probability --history-rate.
+
+A user's next action waits for the previous response (closed loop), so
+offered load rises with the number of users, not with a fixed rate. Every
+entry of --passengers is one stage of --duration seconds; per stage the
+simulator reports throughput, 5xx/transport error rate, 4xx rate and latency
+percentiles per endpoint. Saturation shows as the stage where total req/s
+stops growing while p99 keeps climbing.
+
+    python benchmarks/simulate_load.py --database /tmp/cabgo_bench.db --drivers 200 --passengers 10,50,100,200
+"""
+import argparse
+import collections
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select  # noqa: E402
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import DriverProfile, User  # noqa: E402
+from app.tokens import issue_tokens  # noqa: E402
+from config import Config, SQLITE_TUNED_PRAGMAS  # noqa: E402
+from generate_dataset import CITIES, config_for, generate  # noqa: E402
+
+CITY, _, CENTER_LAT, CENTER_LON, _ = CITIES[0]
+CITY_RADIUS_DEG = 0.08
+
+
+class _QuietHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like a client behind a real load balancer
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def load_config(database):
+    base = config_for(database)
+    return type('LoadConfig', (base,), {
+        'TESTING': False,
+        'DISPATCH_IN_PROCESS': True,
+        'LOCATION_FLUSH_INTERVAL_SECONDS': Config.LOCATION_FLUSH_INTERVAL_SECONDS,
+        'SURGE_RECOMPUTE_INTERVAL_SECONDS': Config.SURGE_RECOMPUTE_INTERVAL_SECONDS,
+        'DRIVER_INDEX_RESYNC_INTERVAL_SECONDS': Config.DRIVER_INDEX_RESYNC_INTERVAL_SECONDS,
+        'ROLLUP_INTERVAL_SECONDS': Config.ROLLUP_INTERVAL_SECONDS,
+        'SQLITE_PRAGMAS': SQLITE_TUNED_PRAGMAS,
+    })
+
+
+class Recorder:
+    """Client-side outcomes per endpoint; only samples taken while `recording` is set are kept."""
+
+    def __init__(self):
+        self.recording = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latencies = collections.defaultdict(list)
+            self.errors = collections.Counter()
+            self.rejected = collections.Counter()
+
+    def add(self, endpoint, seconds, status):
+        if not self.recording:
+            return
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if status is None or status >= 500:
+                self.errors[endpoint] += 1
+            elif status >= 400:
+                self.rejected[endpoint] += 1
+
+
+class SimulatedUser(threading.Thread):
+    def __init__(self, port, headers, recorder, stop, rng):
+        super().__init__(daemon=True)
+        self.port = port
+        self.headers = dict(headers, **{'Content-Type': 'application/json'})
+        self.recorder = recorder
+        self.stop = stop
+        self.rng = rng
+        self._connection = None
+
+    def request(self, endpoint, method, path, body=None):
+        """Sends one request; returns (status, parsed JSON or None). Transport failures count as errors."""
+        started = time.perf_counter()
+        status, payload = None, None
+        try:
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self._connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=self.headers)
+            response = self._connection.getresponse()
+            raw = response.read()
+            status = response.status
+            if response.getheader('Content-Type', '').startswith('application/json'):
+                payload = json.loads(raw)
+        except (OSError, http.client.HTTPException):
+            self._connection.close()
+            self._connection = None
+        self.recorder.add(endpoint, time.perf_counter() - started, status)
+        return status, payload
+
+    def pause(self, mean_seconds):
+        return self.stop.wait(self.rng.expovariate(1.0 / mean_seconds)) if mean_seconds > 0 else self.stop.is_set()
+
+
+class Driver(SimulatedUser):
+    def __init__(self, *args, ping_interval, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ping_interval = ping_interval
+        self.lat = CENTER_LAT + self.rng.uniform(-CITY_RADIUS_DEG, CITY_RADIUS_DEG)
+        self.lon = CENTER_LON + self.rng.uniform(-CITY_RADIUS_DEG, CITY_RADIUS_DEG)
+
+    def run(self):
+        while not self.pause(self.ping_interval):
+            self.lat += self.rng.gauss(0, 0.0005)  # ~50 m between pings
+            self.lon += self.rng.gauss(0, 0.0005)
+            self.request('PATCH /api/drivers/availability', 'PATCH', '/api/drivers/availability',
+                         {'availability_status': 'AVAILABLE', 'latitude': self.lat, 'longitude': self.lon})
+
+
+class Passenger(SimulatedUser):
+    def __init__(self, *args, think, cancel_rate, history_rate, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.think = think
+        self.cancel_rate = cancel_rate
+        self.history_rate = history_rate
+
+    def _point(self):
+        return {'latitude': CENTER_LAT + self.rng.gauss(0, CITY_RADIUS_DEG / 2),
+                'longitude': CENTER_LON + self.rng.gauss(0, CITY_RADIUS_DEG / 2), 'city': CITY}
+
+    def run(self):
+        while not self.pause(self.think):
+            status, payload = self.request('POST /api/rides/book-ride', 'POST', '/api/rides/book-ride',
+                                           {'pickup_location': self._point(), 'dropoff_location': self._point()})
+            if status == 201 and self.rng.random() < self.cancel_rate:
+                if self.pause(2.0):
+                    break
+                self.request('POST /api/rides/<id>/cancel', 'POST', f"/api/rides/{payload['ride']['id']}/cancel")
+            if self.rng.random() < self.history_rate:
+                self.request('GET /api/rides/history', 'GET', '/api/rides/history')
+
+
+def percentile(ordered, q):
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def summarize(recorder, seconds):
+    rows = {}
+    everything = []
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        everything += latencies
+        rows[endpoint] = _row(sorted(latencies), recorder.errors[endpoint], recorder.rejected[endpoint], seconds)
+    if everything:
+        rows['total'] = _row(sorted(everything), sum(recorder.errors.values()), sum(recorder.rejected.values()), seconds)
+    return rows
+
+
+def _row(ordered, errors, rejected, seconds):
+    return {
+        'requests_per_s': round(len(ordered) / seconds, 1),
+        'error_rate': round(errors / len(ordered), 4),
+        'rejected_rate': round(rejected / len(ordered), 4),
+        'p50_ms': round(percentile(ordered, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite dataset from generate_dataset.py; generated when missing')
+    parser.add_argument('--scale', type=float, default=0.1, help='Dataset scale when generating')
+    parser.add_argument('--drivers', type=int, default=100)
+    parser.add_argument('--passengers', default='10,25,50', help='Comma-separated passenger counts, one stage each')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds measured per stage')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds at the start of each stage')
+    parser.add_argument('--ping-interval', type=float, default=4.0, help='Mean seconds between a driver\'s pings')
+    parser.add_argument('--think', type=float, default=5.0, help='Mean passenger think time in seconds')
+    parser.add_argument('--cancel-rate', type=float, default=0.3)
+    parser.add_argument('--history-rate', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Also write the per-stage results to this file')
+    args = parser.parse_args()
+    stages = [int(count) for count in args.passengers.split(',')]
+
+    if not os.path.exists(args.database):
+        generate(args.database, users=int(100000 * args.scale), drivers=int(10000 * args.scale),
+                 rides=int(1000000 * args.scale), locations=int(50000 * args.scale))
+
+    app = create_app(config_class=load_config(args.database))
+    with app.app_context():
+        drivers = db.session.execute(
+            select(DriverProfile.user_id, DriverProfile.id).where(DriverProfile.is_verified.is_(True))
+            .order_by(DriverProfile.id).limit(args.drivers)
+        ).all()
+        riders = db.session.scalars(
+            select(User.id).where(User.is_driver.is_(False), User.is_admin.is_(False)).order_by(User.id).limit(max(stages))
+        ).all()
+        driver_headers = [{'Authorization': f"Bearer {issue_tokens(user_id, False, True, profile_id)[0]}"}
+                          for user_id, profile_id in drivers]
+        rider_headers = [{'Authorization': f"Bearer {issue_tokens(user_id, False, False, None)[0]}"} for user_id in riders]
+        db.session.remove()
+    if len(rider_headers) < max(stages):
+        parser.error(f"the dataset has only {len(rider_headers)} passengers")
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{len(driver_headers)} drivers pinging every ~{args.ping_interval:g}s; "
+          f"passengers think ~{args.think:g}s; {args.duration:g}s per stage on port {server.server_port}")
+
+    try:
+        for passengers in stages:
+            stop = threading.Event()
+            users = [Driver(server.server_port, headers, recorder, stop, random.Random(rng.random()),
+                            ping_interval=args.ping_interval) for headers in driver_headers]
+            users += [Passenger(server.server_port, headers, recorder, stop, random.Random(rng.random()),
+                                think=args.think, cancel_rate=args.cancel_rate, history_rate=args.history_rate)
+                      for headers in rider_headers[:passengers]]
+            recorder.reset()
+            for user in users:
+                user.start()
+            time.sleep(args.warmup)
+            recorder.recording = True
+            time.sleep(args.duration)
+            recorder.recording = False
+            stop.set()
+            for user in users:
+                user.join()
+
+            rows = summarize(recorder, args.duration)
+            results.append({'drivers': len(driver_headers), 'passengers': passengers, 'endpoints': rows})
+            print(f"\n{passengers} passengers")
+            print(f"{'endpoint':<34} {'req/s':>8} {'errors':>7} {'4xx':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            for endpoint, row in rows.items():
+                print(f"{endpoint:<34} {row['requests_per_s']:>8.1f} {row['error_rate']:>7.2%} {row['rejected_rate']:>7.2%} "
+                      f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
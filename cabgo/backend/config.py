@@ -5,17 +5,107 @@ from dotenv import load_dotenv
 basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env')) # Load environment variables from .env
 
+# Concurrent readers alongside one writer: WAL journal, fsync only at checkpoints,
+# 64 MiB page cache, 256 MiB memory-mapped reads, wait up to 5 s on a locked database
+SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -65536, # Negative = KiB
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+def engine_options_for(uri, pool_size=10, max_overflow=20):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI: pool sizing, plus health checks for server databases."""
+    options = {'pool_size': pool_size, 'max_overflow': max_overflow}
+    if not uri.startswith('sqlite'):
+        options.update(pool_pre_ping=True, pool_recycle=1800)
+    return options
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-default-secret-key-for-dev'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(hours=1) # Example: 1 hour
     JWT_REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=30) # Example: 30 days
+    DRIVER_INDEX_CELL_SIZE_DEG = 0.01 # ~1.1 km grid cells for the nearby-driver index
+    # Each worker re-reads driver profiles changed by other processes this often (0 = never)
+    DRIVER_INDEX_RESYNC_INTERVAL_SECONDS = float(os.environ.get('DRIVER_INDEX_RESYNC_INTERVAL_SECONDS') or 2)
+    # Batch dispatch. Run it in-process (one worker only) or with `flask dispatch` as its own process
+    DISPATCH_IN_PROCESS = os.environ.get('DISPATCH_IN_PROCESS', '0') == '1'
+    DISPATCH_INTERVAL_SECONDS = float(os.environ.get('DISPATCH_INTERVAL_SECONDS') or 2)
+    DISPATCH_MAX_BATCH_SIZE = 500
+    DISPATCH_RADIUS_KM = 5
+    DISPATCH_CANDIDATES_PER_RIDE = 10
+    DISPATCH_DISTANCE_WEIGHT = 0.5 # Cost = pickup ETA (minutes) + weight * pickup distance (km)
+    # Driver GPS pings are coalesced in memory and written in bulk
+    LOCATION_FLUSH_INTERVAL_SECONDS = float(os.environ.get('LOCATION_FLUSH_INTERVAL_SECONDS') or 5)
+    LOCATION_BUFFER_MAX_ENTRIES = 100000
+    # Booking locations are snapped (5 decimals ~ 1.1 m) and deduplicated
+    LOCATION_SNAP_DECIMALS = 5
+    LOCATION_CACHE_MAX_ENTRIES = 100000
+    # Surge pricing: multiplier = 1 + sensitivity * (open requests / available drivers - threshold), per cell
+    SURGE_CELL_SIZE_DEG = 0.02 # ~2.2 km zones
+    SURGE_RECOMPUTE_INTERVAL_SECONDS = float(os.environ.get('SURGE_RECOMPUTE_INTERVAL_SECONDS') or 30)
+    SURGE_SENSITIVITY = 0.5
+    SURGE_DEMAND_SUPPLY_THRESHOLD = 1.0
+    SURGE_MAX_MULTIPLIER = 3.0
+    # Road network for ETAs: a .npz built with `flask build-road-graph`, or a directory with nodes.csv/edges.csv
+    # (compiled, contraction hierarchy included, on every start: only for small extracts)
+    ROAD_GRAPH_PATH = os.environ.get('ROAD_GRAPH_PATH')
+    ROAD_GRAPH_SNAP_RADIUS_KM = 0.5
+    ROUTE_CACHE_SIZE = 50000
+    # Speeds learned from completed rides; refresh with `flask update-speed-profiles`
+    SPEED_PROFILE_PATH = os.environ.get('SPEED_PROFILE_PATH') or os.path.join(basedir, 'speed_profiles.npz')
+    SPEED_PROFILE_ZONE_SIZE_DEG = 0.05
+    SPEED_PROFILE_MIN_SAMPLES = 5
+    # Only `flask update-speed-profiles --loop` updates (one process); app processes reload the file when it changes
+    SPEED_PROFILE_UPDATE_INTERVAL_SECONDS = float(os.environ.get('SPEED_PROFILE_UPDATE_INTERVAL_SECONDS') or 300)
+    SPEED_PROFILE_RELOAD_INTERVAL_SECONDS = float(os.environ.get('SPEED_PROFILE_RELOAD_INTERVAL_SECONDS') or 60)
+    # Authenticated-user snapshots cached per process (invalidated on commit, TTL bounds cross-process staleness)
+    USER_CACHE_TTL_SECONDS = 30
+    USER_CACHE_MAX_ENTRIES = 10000
+    # Optional read replica: @read_replica handlers read from it, writes and read-after-write use the primary
+    SQLALCHEMY_BINDS = {'replica': os.environ['READ_REPLICA_DATABASE_URL']} if os.environ.get('READ_REPLICA_DATABASE_URL') else {}
+    READ_REPLICA_STICKY_SECONDS = 5 # A user's reads stay on the primary this long after they commit a write
+    # Access-token revocations are stored in token_revocations; each worker reloads other workers' revocations this often
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS') or 1)
+    # Per-request SQL counts and timing, logged after each request; shapes repeated this often are logged as N+1s
+    SQL_INSTRUMENTATION_ENABLED = True
+    SQL_N_PLUS_ONE_THRESHOLD = 5
+    SQL_STATS_HEADERS = None # X-DB-Query-Count etc. on responses; None = only when DEBUG
+    # Prometheus text at /metrics. With several worker processes, point METRICS_MULTIPROC_DIR at a directory
+    # shared by them (emptied on deploy); each worker writes its snapshot there and /metrics merges them
+    METRICS_ENABLED = True
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL_SECONDS = 5
+    # PRAGMAs run on every new SQLite connection (ignored for other databases)
+    SQLITE_PRAGMAS = {}
+    # Password hashing runs in a process pool; beyond workers + max pending, auth requests get a 503
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+    # Per web worker process, so N gunicorn workers run N * PASSWORD_HASH_WORKERS hashing processes; 0 = inline
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_MAX_PENDING = 32
+    PASSWORD_HASH_TIMEOUT_SECONDS = 10
+    # Optional: admin dashboard reads materialized counters, at the cost of a counter upsert on every
+    # user/driver/ride/vehicle flush. Off = GROUP BY per /stats request
+    PLATFORM_COUNTERS_ENABLED = os.environ.get('PLATFORM_COUNTERS_ENABLED', '0') == '1'
+    # Hourly ride/revenue rollups for /api/admin/analytics; refresh with `flask update-ride-rollups`
+    ROLLUP_INTERVAL_SECONDS = float(os.environ.get('ROLLUP_INTERVAL_SECONDS') or 60)
+    ROLLUP_LAG_SECONDS = 60 # Leave the newest minute for in-flight transactions
+    ROLLUP_BATCH_SIZE = 5000
+    EXPORT_BATCH_SIZE = 1000 # Rows fetched and encoded per chunk of a streamed admin export
+    # ASGI entry point (asgi.py): the hot driver endpoints run on the event loop, everything else in a thread pool
+    ASYNC_FAST_PATH_ENABLED = os.environ.get('ASYNC_FAST_PATH_ENABLED', '1') == '1'
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL') # None = SQLALCHEMY_DATABASE_URI with its async driver
+    ASGI_WSGI_WORKERS = int(os.environ.get('ASGI_WSGI_WORKERS') or 16) # Threads serving the Flask app under ASGI
     # Add other general configurations here
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'busy_timeout': 5000}
     # Add development-specific configurations here
 
 class TestingConfig(Config):
@@ -23,6 +113,16 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'test.db') # Use a separate DB for testing
     WTF_CSRF_ENABLED = False # Disable CSRF forms in testing for convenience
+    DISPATCH_IN_PROCESS = False # Tests drive dispatch windows explicitly
+    LOCATION_FLUSH_INTERVAL_SECONDS = 0 # Tests flush the location buffer explicitly
+    SURGE_RECOMPUTE_INTERVAL_SECONDS = 0 # Tests recompute surge explicitly
+    DRIVER_INDEX_RESYNC_INTERVAL_SECONDS = 0 # Tests resync the driver index explicitly
+    SPEED_PROFILE_PATH = None # Keep learned speeds in memory only
+    ROLLUP_INTERVAL_SECONDS = 0 # Tests run the rollup job explicitly
+    TOKEN_REVOCATION_SYNC_SECONDS = 0 # Tests sync revocations explicitly
+    PLATFORM_COUNTERS_ENABLED = True # Exercise the counters; the GROUP BY path is covered by switching them off
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000' # Cheap hashes keep the suite fast
+    PASSWORD_HASH_WORKERS = 0 # Hash inline; the pool is exercised directly in test_hashing.py
     DEBUG = True # Often helpful for debugging tests
     # Ensure JWT tokens expire quickly or use fixed tokens for testing if needed
     # For simplicity, we'll use the default expiry for now.
@@ -30,6 +130,12 @@ class TestingConfig(Config):
 class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db') # Default to app.db if not set
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options_for(
+        SQLALCHEMY_DATABASE_URI,
+        pool_size=int(os.environ.get('DB_POOL_SIZE') or 10),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    )
+    SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS
     # Add production-specific configurations here
     # For example, ensure DEBUG and TESTING are False
     DEBUG = False
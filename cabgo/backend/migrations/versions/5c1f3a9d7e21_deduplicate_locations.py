@@ -0,0 +1,66 @@
+"""Deduplicate locations and add a unique (latitude, longitude) index
+
+Revision ID: 5c1f3a9d7e21
+Revises: 98a71da6d12e
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f3a9d7e21'
+down_revision = '98a71da6d12e'
+branch_labels = None
+depends_on = None
+
+
+# LOCATION_SNAP_DECIMALS at the time of this revision; new bookings are rounded the same way
+SNAP_DECIMALS = 5
+
+
+def upgrade():
+    # Snap existing rows with Python's round(), exactly as LocationInterner.snap does, so
+    # lookups of new bookings hit them; then keep the lowest id per snapped point
+    connection = op.get_bind()
+    locations = sa.table('locations', sa.column('id'), sa.column('latitude'), sa.column('longitude'))
+    rides = sa.table('rides', sa.column('pickup_location_id'), sa.column('dropoff_location_id'))
+
+    kept = {}        # snapped (lat, lon) -> lowest id
+    moved = []       # kept rows whose stored coordinates change
+    duplicates = []  # rows folded into a kept one
+    rows = connection.execute(
+        sa.select(locations.c.id, locations.c.latitude, locations.c.longitude).order_by(locations.c.id)
+    )
+    for location_id, latitude, longitude in rows:
+        point = (round(float(latitude), SNAP_DECIMALS), round(float(longitude), SNAP_DECIMALS))
+        if point in kept:
+            duplicates.append({'old_id': location_id, 'new_id': kept[point]})
+            continue
+        kept[point] = location_id
+        if point != (latitude, longitude):
+            moved.append({'location_id': location_id, 'snapped_latitude': point[0], 'snapped_longitude': point[1]})
+
+    if duplicates:
+        for column in ('pickup_location_id', 'dropoff_location_id'):
+            connection.execute(
+                rides.update().where(rides.c[column] == sa.bindparam('old_id')).values({column: sa.bindparam('new_id')}),
+                duplicates
+            )
+        connection.execute(locations.delete().where(locations.c.id == sa.bindparam('old_id')), duplicates)
+    if moved:
+        connection.execute(
+            locations.update().where(locations.c.id == sa.bindparam('location_id')).values(
+                latitude=sa.bindparam('snapped_latitude'), longitude=sa.bindparam('snapped_longitude')
+            ),
+            moved
+        )
+
+    with op.batch_alter_table('locations', schema=None) as batch_op:
+        batch_op.create_index('ux_locations_latitude_longitude', ['latitude', 'longitude'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('locations', schema=None) as batch_op:
+        batch_op.drop_index('ux_locations_latitude_longitude')
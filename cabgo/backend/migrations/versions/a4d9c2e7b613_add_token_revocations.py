@@ -0,0 +1,33 @@
+"""Add token_revocations shared by all worker processes
+
+Revision ID: a4d9c2e7b613
+Revises: f1c9a7d3e582
+Create Date: 2026-10-17 18:42:05.219384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9c2e7b613'
+down_revision = 'f1c9a7d3e582'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('token_revocations',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('revoked_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('token_revocations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_token_revocations_revoked_at'), ['revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('token_revocations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_revocations_revoked_at'))
+
+    op.drop_table('token_revocations')
@@ -0,0 +1,30 @@
+"""Add platform_counters for the admin dashboard
+
+Revision ID: b7e4d2c91f05
+Revises: 5c1f3a9d7e21
+Create Date: 2026-10-17 14:03:27.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4d2c91f05'
+down_revision = '5c1f3a9d7e21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left empty: the app seeds it from GROUP BY counts on the first dashboard read
+    # (or run `flask rebuild-platform-counters`)
+    op.create_table('platform_counters',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('platform_counters')
@@ -0,0 +1,26 @@
+"""Index driver_profiles.updated_at for the driver index resync
+
+Revision ID: c6e1f8a2d940
+Revises: a4d9c2e7b613
+Create Date: 2026-10-17 20:11:48.603127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e1f8a2d940'
+down_revision = 'a4d9c2e7b613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('driver_profiles', schema=None) as batch_op:
+        batch_op.create_index('ix_driver_profiles_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('driver_profiles', schema=None) as batch_op:
+        batch_op.drop_index('ix_driver_profiles_updated_at')
@@ -0,0 +1,49 @@
+"""Add hourly ride rollups, rollup watermarks and ride timestamp indexes
+
+Revision ID: e3a8f6b1c4d7
+Revises: b7e4d2c91f05
+Create Date: 2026-10-17 15:21:09.847312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a8f6b1c4d7'
+down_revision = 'b7e4d2c91f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Both tables start empty; the first `flask update-ride-rollups` run backfills all history
+    op.create_table('ride_hourly_rollups',
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('city', sa.String(length=100), nullable=False),
+    sa.Column('vehicle_type', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('ride_count', sa.Integer(), nullable=False),
+    sa.Column('fare_total', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket_start', 'city', 'vehicle_type', 'status')
+    )
+    op.create_table('rollup_watermarks',
+    sa.Column('stream', sa.String(length=50), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('last_ride_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('stream')
+    )
+    with op.batch_alter_table('rides', schema=None) as batch_op:
+        batch_op.create_index('ix_rides_requested_at_id', ['requested_at', 'id'], unique=False)
+        batch_op.create_index('ix_rides_completed_at_id', ['completed_at', 'id'], unique=False)
+        batch_op.create_index('ix_rides_cancelled_at_id', ['cancelled_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('rides', schema=None) as batch_op:
+        batch_op.drop_index('ix_rides_cancelled_at_id')
+        batch_op.drop_index('ix_rides_completed_at_id')
+        batch_op.drop_index('ix_rides_requested_at_id')
+
+    op.drop_table('rollup_watermarks')
+    op.drop_table('ride_hourly_rollups')
@@ -0,0 +1,50 @@
+"""Composite indexes for ride history, admin listing, completed-ride scans and driver availability
+
+Revision ID: f1c9a7d3e582
+Revises: e3a8f6b1c4d7
+Create Date: 2026-10-17 16:40:52.109734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c9a7d3e582'
+down_revision = 'e3a8f6b1c4d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Each single-column index is a prefix of its composite replacement, so drop it
+    with op.batch_alter_table('rides', schema=None) as batch_op:
+        batch_op.create_index('ix_rides_passenger_id_requested_at', ['passenger_id', 'requested_at', 'id'], unique=False)
+        batch_op.create_index('ix_rides_status_requested_at', ['status', 'requested_at', 'id'], unique=False)
+        batch_op.create_index('ix_rides_driver_id_requested_at', ['driver_id', 'requested_at', 'id'], unique=False)
+        # Every completed_at scan also filters status = 'COMPLETED'
+        batch_op.create_index('ix_rides_status_completed_at', ['status', 'completed_at', 'id'], unique=False)
+        batch_op.drop_index('ix_rides_completed_at_id')
+        batch_op.drop_index('ix_rides_passenger_id')
+        batch_op.drop_index('ix_rides_status')
+        batch_op.drop_index('ix_rides_driver_id')
+
+    with op.batch_alter_table('driver_profiles', schema=None) as batch_op:
+        batch_op.create_index('ix_driver_profiles_availability_verified', ['availability_status', 'is_verified'], unique=False)
+        batch_op.drop_index('ix_driver_profiles_availability_status')
+
+
+def downgrade():
+    with op.batch_alter_table('driver_profiles', schema=None) as batch_op:
+        batch_op.create_index('ix_driver_profiles_availability_status', ['availability_status'], unique=False)
+        batch_op.drop_index('ix_driver_profiles_availability_verified')
+
+    with op.batch_alter_table('rides', schema=None) as batch_op:
+        batch_op.create_index('ix_rides_driver_id', ['driver_id'], unique=False)
+        batch_op.create_index('ix_rides_status', ['status'], unique=False)
+        batch_op.create_index('ix_rides_passenger_id', ['passenger_id'], unique=False)
+        batch_op.create_index('ix_rides_completed_at_id', ['completed_at', 'id'], unique=False)
+        batch_op.drop_index('ix_rides_status_completed_at')
+        batch_op.drop_index('ix_rides_driver_id_requested_at')
+        batch_op.drop_index('ix_rides_status_requested_at')
+        batch_op.drop_index('ix_rides_passenger_id_requested_at')
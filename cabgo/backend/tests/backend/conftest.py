@@ -1,6 +1,17 @@
+import contextlib
+
 import pytest
 from app import create_app, db
 from app.models import User # Import other models as needed for setup/teardown
+from app.geo_index import driver_index
+from app.location_buffer import location_buffer
+from app.surge import surge_engine
+from app.speed_profiles import speed_profiles
+from app.location_cache import location_interner
+from app.user_cache import user_cache
+from app.tokens import token_revocations
+from app.query_stats import query_stats
+from app.metrics import metrics
 from config import TestingConfig # Use TestingConfig
 
 @pytest.fixture(scope='session')
@@ -9,10 +20,10 @@ def app():
     # Pass TestingConfig directly to create_app
     app = create_app(config_class=TestingConfig)
     with app.app_context():
-        db.create_all() # Create all tables
+        db.create_all(bind_key=None) # Create all tables (on the primary; a replica bind is a copy)
         yield app
         db.session.remove() # Clean up session
-        db.drop_all()     # Drop all tables after tests are done
+        db.drop_all(bind_key=None)     # Drop all tables after tests are done
 
 @pytest.fixture(scope='function') 
 def client(app):
@@ -30,8 +41,35 @@ def init_database(app):
         for table in reversed(meta.sorted_tables):
             db.session.execute(table.delete())
         db.session.commit()
+        # In-memory state mirrors table rows, so drop it along with them
+        driver_index.reset()
+        location_buffer.clear()
+        surge_engine.reset()
+        speed_profiles.reset()
+        location_interner.clear()
+        user_cache.clear()
+        token_revocations.clear()
+        metrics.reset()
     yield db
 
+@pytest.fixture(scope='function')
+def query_budget():
+    """
+    Context manager asserting the block runs at most `max_queries` SQL statements
+    and no statement shape `max_repeats` times or more (default: the N+1 threshold):
+
+        with query_budget(3):
+            client.get('/api/rides/history', headers=headers)
+    """
+    @contextlib.contextmanager
+    def budget(max_queries, max_repeats=None):
+        with query_stats.capture() as stats:
+            yield stats
+        assert stats.count <= max_queries, f"Query budget of {max_queries} exceeded: {stats.report()}"
+        repeated = stats.repeated(max_repeats or query_stats.n_plus_one_threshold)
+        assert not repeated, f"Repeated statements (N+1?): {stats.report()}"
+    return budget
+
 @pytest.fixture(scope='function')
 def new_user_data():
     """Provides data for a new user registration."""
@@ -436,3 +436,239 @@ def test_verify_driver_profile_success(client, admin_auth_headers, new_user_data
         assert associated_user is not None
         assert associated_user.is_driver is True
 
+
+def test_list_all_rides_filters_and_pages(client, admin_auth_headers, init_database):
+    """GET /api/admin/rides pages with a cursor, filters by status and streams NDJSON."""
+    ride_payload = {
+        "pickup_location": {"latitude": 34.0522, "longitude": -118.2437, "address_line1": "123 Main St"},
+        "dropoff_location": {"latitude": 34.0522, "longitude": -118.2537}
+    }
+    ride_ids = [client.post('/api/rides/book-ride', json=ride_payload, headers=admin_auth_headers).get_json()['ride']['id']
+                for _ in range(3)]
+    client.patch(f'/api/admin/rides/{ride_ids[0]}/cancel-by-admin', headers=admin_auth_headers)
+
+    first_page = client.get('/api/admin/rides?limit=2', headers=admin_auth_headers).get_json()
+    assert [r['id'] for r in first_page['rides']] == [ride_ids[2], ride_ids[1]]
+    assert first_page['rides'][0]['passenger']['email'] == 'admin@example.com'
+    assert first_page['rides'][0]['pickup_location']['address'] == '123 Main St'
+    second_page = client.get(f"/api/admin/rides?limit=2&before={first_page['next_cursor']}", headers=admin_auth_headers).get_json()
+    assert [r['id'] for r in second_page['rides']] == [ride_ids[0]]
+    assert second_page['next_cursor'] is None
+
+    cancelled = client.get('/api/admin/rides?status=CANCELLED_ADMIN', headers=admin_auth_headers).get_json()
+    assert [r['id'] for r in cancelled['rides']] == [ride_ids[0]]
+    assert client.get('/api/admin/rides?status=BOGUS', headers=admin_auth_headers).status_code == 400
+    assert client.get('/api/admin/rides?from=2000-01-01T00:00:00Z&to=2000-01-02', headers=admin_auth_headers).get_json()['rides'] == []
+
+    streamed = client.get('/api/admin/rides?format=ndjson', headers=admin_auth_headers)
+    assert streamed.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert [r['id'] for r in lines] == sorted(ride_ids, reverse=True)
+
+def test_platform_counters_track_orm_and_bulk_changes(client, admin_auth_headers, init_database):
+    """The counters table must agree with fresh GROUP BY counts after inserts, updates, deletes and bulk SQL."""
+    from app.dispatch import dispatch_engine
+    from app.platform_stats import build_stats, count_by_group, platform_counters
+
+    assert client.get('/api/admin/stats', headers=admin_auth_headers).status_code == 200  # Seeds the counters
+    assert platform_counters.read() is not None
+
+    with client.application.app_context():
+        driver = User(email='counted-driver@example.com', is_driver=True)
+        driver.set_password('password')
+        passenger = User(email='counted-passenger@example.com')
+        passenger.set_password('password')
+        db.session.add_all([driver, passenger])
+        db.session.flush()
+        db.session.add_all([
+            DriverProfile(user_id=driver.id, license_number='COUNTED', is_verified=True, availability_status='AVAILABLE',
+                          current_latitude=12.97, current_longitude=77.59),
+            Vehicle(driver_id=driver.id, make='Tata', model='Nexon', license_plate='CNT1', vehicle_type='SUV'),
+            Vehicle(driver_id=driver.id, make='Tata', model='Tiago', license_plate='CNT2', vehicle_type='HATCHBACK', is_active=False),
+        ])
+        pickup, dropoff = Location(latitude=12.97, longitude=77.59), Location(latitude=12.99, longitude=77.61)
+        db.session.add_all([pickup, dropoff])
+        db.session.flush()
+        rides = [Ride(passenger_id=passenger.id, pickup_location_id=pickup.id, dropoff_location_id=dropoff.id) for _ in range(3)]
+        db.session.add_all(rides)
+        db.session.commit()
+        ride_ids = [ride.id for ride in rides]
+        driver_id = driver.id
+
+    assert dict(dispatch_engine.run_once(reload_index=True))  # Core UPDATE: one REQUESTED -> ACCEPTED
+
+    db.session.expire_all()
+    requested = Ride.query.filter(Ride.id.in_(ride_ids), Ride.status == 'REQUESTED').all()
+    assert len(requested) == 2
+    db.session.expire(requested[0], ['status'])
+    requested[0].status = 'CANCELLED_PASSENGER'  # Old value of the expired column is loaded via active_history
+    db.session.delete(requested[1])
+    db.session.commit()
+
+    for ride in Ride.query.filter_by(driver_id=driver_id):
+        ride.driver_id = None
+    db.session.commit()
+    assert client.delete(f'/api/admin/users/{driver_id}', headers=admin_auth_headers).status_code == 200  # Bulk vehicle delete
+
+    counted = platform_counters.read()
+    expected = count_by_group()
+    assert {k: v for k, v in counted.items() if v} == expected
+    stats = client.get('/api/admin/stats', headers=admin_auth_headers).get_json()['platform_statistics']
+    assert stats == build_stats(expected)
+    assert stats['vehicles']['total'] == 0
+    assert stats['rides']['total'] == 2
+
+def test_stats_fall_back_to_grouped_counts_without_counters(client, admin_auth_headers, init_database):
+    from app.models import PlatformCounter
+    from app.platform_stats import build_stats, count_by_group, platform_counters
+
+    counters = lambda: dict(db.session.query(PlatformCounter.name, PlatformCounter.value))
+    before = counters()
+    platform_counters.enabled = False
+    try:
+        user = User(email='uncounted@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        stats = client.get('/api/admin/stats', headers=admin_auth_headers).get_json()['platform_statistics']
+        assert stats == build_stats(count_by_group())
+        assert counters() == before  # Neither the flush hook nor /stats touched the table
+    finally:
+        platform_counters.enabled = True
+
+def test_platform_counter_rebuild_locks_out_writers_while_counting(app, init_database):
+    """A delta committed between the GROUP BY and the rewrite would be wiped out, so rebuild must lock first."""
+    from sqlalchemy import create_engine, event, update
+    from sqlalchemy.exc import OperationalError
+    from app.models import PlatformCounter
+    from app.platform_stats import platform_counters
+
+    table = PlatformCounter.__table__
+    other_process = create_engine(db.engine.url, connect_args={'timeout': 0})
+    attempts = []
+
+    def write_during_count(conn, cursor, statement, parameters, context, executemany):
+        if attempts or not statement.lstrip().upper().startswith('SELECT'):
+            return
+        try:
+            with other_process.begin() as connection:
+                connection.execute(update(table).values(value=table.c.value + 1))
+            attempts.append('committed')
+        except OperationalError:
+            attempts.append('blocked')
+
+    event.listen(db.engine, 'before_cursor_execute', write_during_count)
+    try:
+        platform_counters.rebuild()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', write_during_count)
+        other_process.dispose()
+    assert attempts == ['blocked']
+
+def test_ride_rollups_fill_incrementally_and_serve_timeseries(client, admin_auth_headers, init_database):
+    """The job folds each ride event in exactly once; the endpoint reads only the rollups."""
+    import datetime
+    from app.models import RideHourlyRollup
+    from app.rollups import ride_rollups
+
+    passenger = User(email='rollup-passenger@example.com')
+    passenger.set_password('password')
+    db.session.add(passenger)
+    pune, mumbai = Location(latitude=18.52, longitude=73.85, city='Pune'), Location(latitude=19.07, longitude=72.87, city='Mumbai')
+    db.session.add_all([pune, mumbai])
+    db.session.flush()
+    base = datetime.datetime(2026, 3, 2, 9, 0)
+
+    def ride(pickup, minutes, **fields):
+        ride = Ride(passenger_id=passenger.id, pickup_location_id=pickup.id, dropoff_location_id=mumbai.id,
+                    requested_at=base + datetime.timedelta(minutes=minutes), vehicle_type_requested='SEDAN', **fields)
+        db.session.add(ride)
+        return ride
+
+    ride(pune, 5, estimated_fare=100.0, status='COMPLETED', actual_fare=120.0, completed_at=base + datetime.timedelta(minutes=70))
+    ride(pune, 20, estimated_fare=80.0)
+    ride(mumbai, 65, estimated_fare=50.0, status='CANCELLED_PASSENGER', cancelled_at=base + datetime.timedelta(minutes=66))
+    db.session.commit()
+
+    now = base + datetime.timedelta(hours=3)
+    assert ride_rollups.update(now=now) == {'requested': 3, 'completed': 1, 'cancelled': 1}
+    assert ride_rollups.update(now=now) == {'requested': 0, 'completed': 0, 'cancelled': 0}
+
+    ride(pune, 40, estimated_fare=70.0)  # Older than the watermark: only ROLLUP_LAG_SECONDS protects against this
+    late = ride(mumbai, 130, estimated_fare=30.0)
+    db.session.commit()
+    assert ride_rollups.update(now=now)['requested'] == 1
+    assert db.session.query(db.func.sum(RideHourlyRollup.ride_count)).scalar() == 6
+
+    params = {'from': '2026-03-02T00:00:00Z', 'to': '2026-03-03T00:00:00Z', 'group_by': 'city,status'}
+    response = client.get('/api/admin/analytics/timeseries', headers=admin_auth_headers, query_string=params)
+    assert response.status_code == 200
+    series = response.get_json()['series']
+    assert {'bucket': '2026-03-02T09:00:00', 'city': 'Pune', 'status': 'REQUESTED', 'rides': 2, 'fare_total': 180.0} in series
+    assert {'bucket': '2026-03-02T10:00:00', 'city': 'Pune', 'status': 'COMPLETED', 'rides': 1, 'fare_total': 120.0} in series
+    assert {'bucket': '2026-03-02T10:00:00', 'city': 'Mumbai', 'status': 'CANCELLED_PASSENGER', 'rides': 1, 'fare_total': 50.0} in series
+    assert response.get_json()['watermarks']['requested'] == late.requested_at.isoformat()
+
+    daily = client.get('/api/admin/analytics/timeseries', headers=admin_auth_headers,
+                       query_string={'from': '2026-03-01', 'to': '2026-03-04', 'granularity': 'day', 'status': 'REQUESTED', 'group_by': ''})
+    assert daily.get_json()['series'] == [{'bucket': '2026-03-02T00:00:00', 'rides': 4, 'fare_total': 260.0}]
+
+    bad = client.get('/api/admin/analytics/timeseries', headers=admin_auth_headers, query_string={'group_by': 'driver'})
+    assert bad.status_code == 400
+
+def test_admin_exports_stream_ndjson_and_csv(client, admin_auth_headers, init_database):
+    """GET /api/admin/export/<users|drivers|rides> stream every row in batches, as NDJSON or CSV."""
+    import csv
+    driver_id = client.post('/api/auth/register', json={'email': 'export-driver@example.com', 'password': 'password',
+                                                        'full_name': 'Export Driver'}).get_json()['user']['id']
+    client.post('/api/auth/register', json={'email': 'export-rider@example.com', 'password': 'password',
+                                            'full_name': '=HYPERLINK("http://example.com")'})
+    with client.application.app_context():
+        db.session.get(User, driver_id).is_driver = True
+        db.session.add(DriverProfile(user_id=driver_id, license_number='EXPORT1', is_verified=True))
+        db.session.commit()
+    ride_payload = {
+        "pickup_location": {"latitude": 34.0522, "longitude": -118.2437, "address_line1": "123 Main St"},
+        "dropoff_location": {"latitude": 34.0522, "longitude": -118.2537}
+    }
+    ride_ids = [client.post('/api/rides/book-ride', json=ride_payload, headers=admin_auth_headers).get_json()['ride']['id']
+                for _ in range(2)]
+    client.application.config['EXPORT_BATCH_SIZE'] = 2
+    try:
+        users = client.get('/api/admin/export/users', headers=admin_auth_headers)
+        assert users.is_streamed and users.mimetype == 'application/x-ndjson'
+        assert users.headers['Content-Disposition'] == 'attachment; filename="users.ndjson"'
+        chunks = list(users.response)
+        assert len(chunks) == 2  # Three users in batches of two
+        lines = [json.loads(line) for line in b''.join(chunks).splitlines()]
+        assert [u['email'] for u in lines] == ['admin@example.com', 'export-driver@example.com', 'export-rider@example.com']
+        assert lines[1]['driver_profile']['license_number'] == 'EXPORT1'
+        assert 'driver_profile' not in lines[2]
+
+        users_csv = client.get('/api/admin/export/users?format=csv', headers=admin_auth_headers)
+        assert users_csv.mimetype == 'text/csv'
+        rows = list(csv.DictReader(users_csv.get_data(as_text=True).splitlines()))
+        assert [row['email'] for row in rows] == [u['email'] for u in lines]
+        assert rows[1]['driver_profile.license_number'] == 'EXPORT1'
+        assert rows[2]['driver_profile.license_number'] == ''
+        assert rows[0]['created_at'] == lines[0]['created_at']
+        # Formula-like text is neutralised in CSV only
+        assert lines[2]['full_name'] == '=HYPERLINK("http://example.com")'
+        assert rows[2]['full_name'] == '\'=HYPERLINK("http://example.com")'
+
+        drivers = client.get('/api/admin/export/drivers?format=csv', headers=admin_auth_headers)
+        rows = list(csv.DictReader(drivers.get_data(as_text=True).splitlines()))
+        assert [(row['user.email'], row['is_verified']) for row in rows] == [('export-driver@example.com', 'True')]
+
+        rides = client.get('/api/admin/export/rides?status=REQUESTED', headers=admin_auth_headers)
+        assert [json.loads(line)['id'] for line in rides.get_data(as_text=True).splitlines()] == sorted(ride_ids, reverse=True)
+        rides_csv = client.get('/api/admin/export/rides?format=csv', headers=admin_auth_headers)
+        rows = list(csv.DictReader(rides_csv.get_data(as_text=True).splitlines()))
+        assert [(row['passenger.email'], row['driver.id'], row['pickup_location.address']) for row in rows] == \
+            [('admin@example.com', '', '123 Main St')] * 2
+        assert rows[0]['pickup_location.longitude'] == '-118.2437'  # Numbers are not text
+    finally:
+        client.application.config['EXPORT_BATCH_SIZE'] = 1000
+
+    assert client.get('/api/admin/export/users?format=xml', headers=admin_auth_headers).status_code == 400
+    assert client.get('/api/admin/export/rides?status=BOGUS', headers=admin_auth_headers).status_code == 400
@@ -47,3 +47,126 @@ def test_login_user_wrong_password(client, new_user_data, init_database):
     assert response.status_code == 401, f"Expected 401, got {response.status_code}. Response: {response.data.decode()}"
     json_data = response.get_json()
     assert 'Invalid email or password' in json_data['message']
+
+def test_authenticated_user_is_cached_and_invalidated_on_commit(client, new_user_data, admin_auth_headers):
+    """Repeat requests skip the user SELECT; an admin change to the user evicts the snapshot."""
+    from sqlalchemy import event
+    from app import db
+    from app.user_cache import user_cache
+
+    client.post('/api/auth/register', json=new_user_data)
+    token = client.post('/api/auth/login', json={'email': new_user_data['email'], 'password': new_user_data['password']}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/api/auth/me', headers=headers).get_json()['full_name'] == 'Test User'
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert not [s for s in statements if 'FROM users' in s]
+
+    user_id = User.query.filter_by(email=new_user_data['email']).first().id
+    client.patch(f'/api/admin/users/{user_id}', headers=admin_auth_headers, json={'full_name': 'Renamed'})
+    assert client.get('/api/auth/me', headers=headers).get_json()['full_name'] == 'Renamed'
+    assert user_cache.get(user_id).full_name == 'Renamed'
+
+def test_login_returns_claims_bearing_access_and_refresh_tokens(client, new_user_data, init_database):
+    """The access token carries role claims; the refresh token renews it and cannot be used as one."""
+    from app.tokens import decode_token
+
+    client.post('/api/auth/register', json=new_user_data)
+    login_json = client.post('/api/auth/login', json={'email': new_user_data['email'], 'password': new_user_data['password']}).get_json()
+    claims = decode_token(login_json['token'])
+    assert claims['type'] == 'access'
+    assert claims['is_admin'] is False and claims['is_driver'] is False
+    assert claims['driver_profile_id'] is None
+    assert login_json['expires_in'] == 3600
+
+    refresh_response = client.post('/api/auth/refresh', json={'refresh_token': login_json['refresh_token']})
+    assert refresh_response.status_code == 200
+    assert client.get('/api/auth/me', headers={'Authorization': f"Bearer {refresh_response.get_json()['token']}"}).status_code == 200
+
+    assert client.get('/api/auth/me', headers={'Authorization': f"Bearer {login_json['refresh_token']}"}).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': login_json['token']}).status_code == 401
+    assert client.post('/api/auth/refresh', json={}).status_code == 400
+
+def test_legacy_tokens_without_claims_are_still_accepted(app, client, new_user_data, admin_auth_headers):
+    """Tokens minted before claims were added fall back to loading the user."""
+    import datetime
+    import jwt
+
+    client.post('/api/auth/register', json=new_user_data)
+    admin = User.query.filter_by(email='admin@example.com').first()
+    legacy = jwt.encode(
+        {'user_id': admin.id, 'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)},
+        app.config['SECRET_KEY'], algorithm='HS256'
+    )
+    assert client.get('/api/admin/users', headers={'Authorization': f'Bearer {legacy}'}).status_code == 200
+
+def test_admin_role_change_revokes_outstanding_access_tokens(client, admin_auth_headers, init_database):
+    """admin_required trusts claims without a query, so demotion must revoke the old token until it is refreshed."""
+    from sqlalchemy import event
+    from app import db
+    from app.user_cache import user_cache
+
+    second_admin = {'email': 'second@example.com', 'password': 'secondpassword', 'full_name': 'Second Admin'}
+    client.post('/api/auth/register', json=second_admin)
+    user = User.query.filter_by(email=second_admin['email']).first()
+    client.patch(f'/api/admin/users/{user.id}', headers=admin_auth_headers, json={'is_admin': True})
+    login_json = client.post('/api/auth/login', json={'email': second_admin['email'], 'password': second_admin['password']}).get_json()
+    headers = {'Authorization': f"Bearer {login_json['token']}"}
+
+    user_cache.clear()
+    db.session.expunge_all()
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert client.get('/api/admin/rides/999999', headers=headers).status_code == 404
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert statements and not [s for s in statements if 'FROM users' in s]  # Authorized from the claims alone
+
+    client.patch(f'/api/admin/users/{user.id}', headers=admin_auth_headers, json={'is_admin': False})
+    assert client.get('/api/admin/users', headers=headers).status_code == 401
+
+    refreshed = client.post('/api/auth/refresh', json={'refresh_token': login_json['refresh_token']}).get_json()['token']
+    assert client.get('/api/admin/users', headers={'Authorization': f'Bearer {refreshed}'}).status_code == 403
+
+def test_revocations_and_refresh_see_other_workers_changes(client, admin_auth_headers, init_database):
+    """Another process's revocation is honoured after a sync, and refresh reads the user row, not the cache."""
+    from sqlalchemy import update
+    from app import db
+    from app.tokens import decode_token, token_revocations
+    from app.user_cache import user_cache
+
+    second_admin = {'email': 'worker@example.com', 'password': 'workerpassword'}
+    client.post('/api/auth/register', json=second_admin)
+    user = User.query.filter_by(email=second_admin['email']).first()
+    client.patch(f'/api/admin/users/{user.id}', headers=admin_auth_headers, json={'is_admin': True})
+    login_json = client.post('/api/auth/login', json=second_admin).get_json()
+    headers = {'Authorization': f"Bearer {login_json['token']}"}
+    assert client.get('/api/auth/me', headers=headers).status_code == 200  # Caches the admin snapshot
+
+    # Demoted by another worker: its revocation row and user update are all this process sees
+    client.patch(f'/api/admin/users/{user.id}', headers=admin_auth_headers, json={'is_admin': False})
+    token_revocations.clear()
+    assert client.get('/api/admin/users', headers=headers).status_code == 200
+    with client.application.app_context():
+        assert token_revocations.sync() == 1
+    assert client.get('/api/admin/users', headers=headers).status_code == 401
+
+    # The same role change reaches refresh even while this process still caches the old snapshot
+    db.session.execute(update(User).where(User.id == user.id).values(is_admin=True))
+    db.session.commit()
+    user_cache.clear()
+    assert user_cache.get(user.id).is_admin
+    db.session.execute(update(User).where(User.id == user.id).values(is_admin=False))  # Core: no cache invalidation
+    db.session.commit()
+    assert user_cache.cached(user.id)[0].is_admin
+    refreshed = client.post('/api/auth/refresh', json={'refresh_token': login_json['refresh_token']}).get_json()['token']
+    with client.application.app_context():
+        assert decode_token(refreshed)['is_admin'] is False
@@ -0,0 +1,68 @@
+import shutil
+
+import pytest
+
+from app import create_app, db
+from app.db_routing import recent_writers
+from app.dispatch import dispatch_engine
+from app.models import User
+from config import TestingConfig
+
+PICKUP = {'latitude': 12.971601, 'longitude': 77.594602}
+DROPOFF = {'latitude': 12.935200, 'longitude': 77.624500}
+
+
+@pytest.fixture
+def replica_app(app, tmp_path):
+    """An app whose 'replica' bind is a second SQLite file, snapshotted from the primary on demand."""
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{primary}'
+        SQLALCHEMY_BINDS = {'replica': f'sqlite:///{replica}'}
+
+    replica_app = create_app(config_class=ReplicaConfig)
+
+    def sync_replica():
+        for engine in db.engines.values():
+            engine.dispose()
+        shutil.copy(primary, replica)
+
+    with replica_app.app_context():
+        db.create_all(bind_key=None)  # The replica gets its tables from the snapshot
+        replica_app.sync_replica = sync_replica
+        yield replica_app
+        db.session.remove()
+    dispatch_engine.app = app  # create_app rebinds the module-level engines; point dispatch back
+    recent_writers.clear()
+
+
+def _login(client, email):
+    client.post('/api/auth/register', json={'email': email, 'password': 'password'})
+    token = client.post('/api/auth/login', json={'email': email, 'password': 'password'}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_read_only_handlers_use_the_replica_until_the_user_writes(replica_app):
+    client = replica_app.test_client()
+    passenger = _login(client, 'rider@example.com')
+    admin = _login(client, 'boss@example.com')
+    User.query.filter_by(email='boss@example.com').update({'is_admin': True})
+    db.session.commit()
+    admin = _login(client, 'boss@example.com')
+
+    book = lambda: client.post('/api/rides/book-ride', headers=passenger,
+                               json={'pickup_location': PICKUP, 'dropoff_location': DROPOFF})
+    assert book().status_code == 201
+    replica_app.sync_replica()
+    assert book().status_code == 201  # Only on the primary now
+    recent_writers.clear()  # Pretend the sticky window has passed
+
+    assert len(client.get('/api/rides/history', headers=passenger).get_json()['rides']) == 1
+    assert len(client.get('/api/admin/rides', headers=admin).get_json()['rides']) == 1
+    assert len(client.get('/api/admin/rides?format=ndjson', headers=admin).get_data(as_text=True).splitlines()) == 1
+
+    # Writes go to the primary, and the writer then reads their own writes
+    assert book().status_code == 201
+    assert len(client.get('/api/rides/history', headers=passenger).get_json()['rides']) == 3
+    assert len(client.get('/api/admin/rides', headers=admin).get_json()['rides']) == 1  # Admin still on the replica
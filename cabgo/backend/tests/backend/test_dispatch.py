@@ -0,0 +1,96 @@
+import itertools
+import numpy as np
+from app import db
+from app.dispatch import dispatch_engine, solve_assignment
+from app.models import User, DriverProfile, Ride, Location
+
+def _brute_force_cost(cost):
+    n, m = cost.shape
+    if n <= m:
+        return min(sum(cost[i, cols[i]] for i in range(n)) for cols in itertools.permutations(range(m), n))
+    return _brute_force_cost(cost.T)
+
+def test_solve_assignment_is_optimal():
+    rng = np.random.default_rng(3)
+    for shape in [(1, 1), (3, 3), (3, 5), (5, 3), (6, 6)]:
+        cost = rng.uniform(0, 100, size=shape)
+        pairs = solve_assignment(cost)
+        assert len(pairs) == min(shape)
+        assert len({r for r, _ in pairs}) == len({c for _, c in pairs}) == len(pairs)
+        assert sum(cost[r, c] for r, c in pairs) == _brute_force_cost(cost)
+
+def _user(email, is_driver=False):
+    user = User(email=email, is_driver=is_driver)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def _ride(passenger, lat, lon):
+    pickup = Location(latitude=lat, longitude=lon)
+    dropoff = Location(latitude=lat + 0.05, longitude=lon + 0.05)
+    db.session.add_all([pickup, dropoff])
+    db.session.flush()
+    ride = Ride(passenger_id=passenger.id, pickup_location_id=pickup.id, dropoff_location_id=dropoff.id)
+    db.session.add(ride)
+    return ride
+
+def test_run_once_assigns_globally_optimal_drivers(app, init_database):
+    """Greedy matching would give ride A its nearest driver and send ride B the far one."""
+    passenger = _user('passenger@example.com')
+    ride_a = _ride(passenger, 12.970, 77.590)
+    ride_b = _ride(passenger, 12.990, 77.590)
+    far_ride = _ride(passenger, 20.0, 80.0)
+    shared = _user('shared@example.com', is_driver=True)
+    south = _user('south@example.com', is_driver=True)
+    db.session.add_all([
+        DriverProfile(user_id=shared.id, license_number='SHARED', is_verified=True, availability_status='AVAILABLE',
+                      current_latitude=12.975, current_longitude=77.590),
+        DriverProfile(user_id=south.id, license_number='SOUTH', is_verified=True, availability_status='AVAILABLE',
+                      current_latitude=12.960, current_longitude=77.590),
+    ])
+    db.session.commit()
+
+    assignments = dict(dispatch_engine.run_once())
+    assert assignments == {ride_a.id: south.id, ride_b.id: shared.id}
+
+    db.session.expire_all()
+    assert db.session.get(Ride, ride_a.id).status == 'ACCEPTED'
+    assert db.session.get(Ride, ride_a.id).accepted_at is not None
+    assert db.session.get(Ride, far_ride.id).status == 'REQUESTED'
+    assert {p.availability_status for p in DriverProfile.query.all()} == {'BUSY'}
+    assert dispatch_engine.run_once() == []
+
+def test_cancelled_accepted_ride_frees_driver_for_redispatch(client, admin_auth_headers, init_database):
+    """Both cancel paths put the BUSY driver back to AVAILABLE and into the index, so the next run can use them."""
+    from app.geo_index import driver_index
+
+    with client.application.app_context():
+        passenger = _user('passenger@example.com')
+        driver = _user('driver@example.com', is_driver=True)
+        profile = DriverProfile(user_id=driver.id, license_number='FREED', is_verified=True, availability_status='AVAILABLE',
+                                current_latitude=12.975, current_longitude=77.590)
+        db.session.add(profile)
+        first = _ride(passenger, 12.970, 77.590)
+        db.session.commit()
+        profile_id, driver_id, passenger_id, first_id = profile.id, driver.id, passenger.id, first.id
+        assert dispatch_engine.run_once() == [(first_id, driver_id)]
+        assert profile_id not in driver_index
+
+    token = client.post('/api/auth/login', json={'email': 'passenger@example.com', 'password': 'password'}).get_json()['token']
+    response = client.post(f'/api/rides/{first_id}/cancel', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+
+    with client.application.app_context():
+        assert db.session.get(DriverProfile, profile_id).availability_status == 'AVAILABLE'
+        assert profile_id in driver_index
+        second = _ride(db.session.get(User, passenger_id), 12.971, 77.590)
+        db.session.commit()
+        second_id = second.id
+        assert dispatch_engine.run_once() == [(second_id, driver_id)]
+
+    response = client.patch(f'/api/admin/rides/{second_id}/cancel-by-admin', headers=admin_auth_headers)
+    assert response.status_code == 200
+    with client.application.app_context():
+        assert db.session.get(DriverProfile, profile_id).availability_status == 'AVAILABLE'
+        assert profile_id in driver_index
@@ -1,3 +1,4 @@
+import datetime
 import pytest
 import json
 from app import db
@@ -133,3 +134,172 @@ def test_update_availability_unauthenticated(client, init_database):
     json_data = response.get_json()
     assert 'token is missing' in json_data.get('message', '').lower() or \
            'authorization header is missing' in json_data.get('message', '').lower() # Accommodate different possible messages
+
+def _make_available_driver(email, license_number, lat, lon, is_verified=True):
+    user = User(email=email, full_name=email.split('@')[0], is_driver=True)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+    profile = DriverProfile(user_id=user.id, license_number=license_number, is_verified=is_verified,
+                            availability_status='AVAILABLE', current_latitude=lat, current_longitude=lon)
+    db.session.add(profile)
+    db.session.commit()
+    return profile
+
+def test_nearby_drivers_sorted_and_limited(client, init_database):
+    """Test /nearby returns the k closest verified AVAILABLE drivers within the radius."""
+    with client.application.app_context():
+        _make_available_driver('near@example.com', 'NEAR1', 12.9720, 77.5950)
+        _make_available_driver('mid@example.com', 'MID1', 12.9800, 77.6000)
+        _make_available_driver('far@example.com', 'FAR1', 13.5000, 78.0000)
+        _make_available_driver('unverified@example.com', 'UNV1', 12.9716, 77.5946, is_verified=False)
+
+    response = client.get('/api/drivers/nearby?lat=12.9716&lon=77.5946&radius_km=5&k=1')
+    assert response.status_code == 200
+    drivers = response.get_json()['drivers']
+    assert len(drivers) == 1
+    assert drivers[0]['current_latitude'] == 12.9720
+
+    response = client.get('/api/drivers/nearby?lat=12.9716&lon=77.5946&radius_km=5&k=10')
+    distances = [d['distance_km'] for d in response.get_json()['drivers']]
+    assert len(distances) == 2
+    assert distances == sorted(distances)
+
+def test_nearby_drivers_tracks_availability_updates(client, driver_auth_headers, init_database):
+    """Test the index follows PATCH /availability without a reload."""
+    with client.application.app_context():
+        profile = DriverProfile.query.filter_by(license_number='DRIVERLIC' + str(User.query.filter_by(email='driver@example.com').first().id)).first()
+        profile.is_verified = True
+        db.session.commit()
+
+    nearby_url = '/api/drivers/nearby?lat=12.3456&lon=78.9101&radius_km=2'
+    assert client.get(nearby_url).get_json()['drivers'] == []
+
+    payload = {'availability_status': 'AVAILABLE', 'latitude': 12.3460, 'longitude': 78.9105}
+    client.patch('/api/drivers/availability', headers=driver_auth_headers, json=payload)
+    assert len(client.get(nearby_url).get_json()['drivers']) == 1
+
+    client.patch('/api/drivers/availability', headers=driver_auth_headers, json={'availability_status': 'OFFLINE'})
+    assert client.get(nearby_url).get_json()['drivers'] == []
+
+def test_index_resync_picks_up_other_processes_changes(client, init_database):
+    """Core UPDATEs stand in for another worker: resync drops, adds and moves drivers from updated_at."""
+    from sqlalchemy import update
+    from app.geo_index import driver_index
+
+    with client.application.app_context():
+        busy_id = _make_available_driver('busy@example.com', 'BUSY1', 12.9720, 77.5950).id
+        back_id = _make_available_driver('back@example.com', 'BACK1', 12.9730, 77.5960).id
+        driver_index.ensure_loaded()
+        db.session.execute(update(DriverProfile).where(DriverProfile.id == back_id).values(availability_status='OFFLINE'))
+        db.session.commit()
+        driver_index.resync()
+        assert back_id not in driver_index
+
+        db.session.execute(update(DriverProfile).where(DriverProfile.id == busy_id).values(availability_status='BUSY'))
+        db.session.execute(update(DriverProfile).where(DriverProfile.id == back_id)
+                           .values(availability_status='AVAILABLE', current_latitude=12.9800))
+        db.session.commit()
+        assert busy_id in driver_index
+        assert driver_index.resync() == 2
+        assert busy_id not in driver_index
+        assert driver_index.get(back_id)[0] == 12.9800
+
+def test_nearby_drivers_requires_coordinates(client, init_database):
+    response = client.get('/api/drivers/nearby?lat=12.97')
+    assert response.status_code == 400
+
+def test_location_pings_are_buffered_until_flush(client, driver_auth_headers, init_database):
+    """Pings update reads immediately but reach DriverProfile only on flush, coalesced to the latest."""
+    from app.location_buffer import location_buffer
+
+    client.patch('/api/drivers/availability', headers=driver_auth_headers,
+                 json={'availability_status': 'AVAILABLE', 'latitude': 12.0, 'longitude': 77.0})
+    for lat in (12.001, 12.002, 12.003):
+        response = client.post('/api/drivers/location', headers=driver_auth_headers, json={'latitude': lat, 'longitude': 77.0})
+        assert response.status_code == 202
+    # Same-status PATCH with coordinates is a ping too
+    client.patch('/api/drivers/availability', headers=driver_auth_headers,
+                 json={'availability_status': 'AVAILABLE', 'latitude': 12.004, 'longitude': 77.0})
+
+    with client.application.app_context():
+        profile = DriverProfile.query.first()
+        assert profile.current_latitude == 12.0
+        assert location_buffer.get(profile.id)[0] == 12.004
+
+        assert location_buffer.flush() == 1
+        db.session.expire_all()
+        assert DriverProfile.query.first().current_latitude == 12.004
+        assert len(location_buffer) == 0
+
+def test_availability_ping_rejects_bad_coordinates(client, driver_auth_headers, init_database):
+    """A same-status PATCH is validated like a /location ping before it reaches the buffer or index."""
+    from app.location_buffer import location_buffer
+
+    client.patch('/api/drivers/availability', headers=driver_auth_headers, json={'availability_status': 'AVAILABLE'})
+    for lat in ('abc', None, [1], 999):
+        for status in ('AVAILABLE', 'BUSY'):
+            response = client.patch('/api/drivers/availability', headers=driver_auth_headers,
+                                    json={'availability_status': status, 'latitude': lat, 'longitude': 77.0})
+            assert response.status_code == 400
+    assert len(location_buffer) == 0
+    assert client.get('/api/drivers/nearby?lat=12.0&lon=77.0').status_code == 200
+    with client.application.app_context():
+        assert DriverProfile.query.first().availability_status == 'AVAILABLE'
+
+def test_flush_drops_unwritable_rows(client, driver_auth_headers, init_database):
+    from app.location_buffer import location_buffer
+
+    with client.application.app_context():
+        profile_id = DriverProfile.query.first().id
+        location_buffer.record(profile_id, 12.5, 77.5)
+        location_buffer.record(profile_id + 1000, 'abc', 77.0)  # Cannot be bound as a float
+        assert location_buffer.flush() == 1
+        assert len(location_buffer) == 0
+        db.session.expire_all()
+        assert db.session.get(DriverProfile, profile_id).current_latitude == 12.5
+
+def test_flush_keeps_newer_committed_position(client, driver_auth_headers, init_database):
+    """A buffered ping older than the row's last_location_update must not move the driver back."""
+    from app.location_buffer import location_buffer
+
+    client.patch('/api/drivers/availability', headers=driver_auth_headers,
+                 json={'availability_status': 'AVAILABLE', 'latitude': 12.5, 'longitude': 77.5})
+    with client.application.app_context():
+        profile = DriverProfile.query.first()
+        stale = profile.last_location_update - datetime.timedelta(seconds=10)
+        location_buffer.record(profile.id, 11.0, 76.0, stale)
+        location_buffer.flush()
+        db.session.expire_all()
+        assert db.session.get(DriverProfile, profile.id).current_latitude == 12.5
+
+def test_full_buffer_wakes_flusher_instead_of_writing_inline(client, driver_auth_headers, init_database, monkeypatch):
+    """With a background flusher running, a full buffer hands the flush to its thread."""
+    import threading
+    from app.background import PeriodicTask
+    from app.location_buffer import location_buffer
+
+    flushed_on = []
+    done = threading.Event()
+
+    def flush():
+        flushed_on.append(threading.current_thread())
+        done.set()
+
+    task = PeriodicTask(client.application, 3600, flush, name='test-flush')
+    task.start()
+    monkeypatch.setattr(location_buffer, '_task', task)
+    monkeypatch.setattr(location_buffer, 'max_entries', 1)
+    try:
+        location_buffer.record(1, 12.0, 77.0)
+        location_buffer.record(2, 12.1, 77.1)
+        assert done.wait(5)
+        assert flushed_on == [task._thread]
+        assert len(location_buffer) == 2  # Accepted past the bound until the flush lands
+    finally:
+        task.stop()
+        location_buffer.clear()
+
+def test_location_ping_requires_coordinates(client, driver_auth_headers, init_database):
+    response = client.post('/api/drivers/location', headers=driver_auth_headers, json={'latitude': 'north'})
+    assert response.status_code == 400
@@ -0,0 +1,188 @@
+import asyncio
+import json
+
+from app import db
+from app.db_routing import recent_writers
+from app.fast_path import async_database_url, create_asgi_app
+from app.geo_index import driver_index
+from app.location_buffer import location_buffer
+from app.models import DriverProfile, User
+from app.platform_stats import count_by_group, platform_counters
+
+
+class ASGIClient:
+    """Drives an ASGI app in-process: one request at a time, inside a lifespan startup/shutdown."""
+
+    def __init__(self, asgi):
+        self.asgi = asgi
+
+    async def __aenter__(self):
+        await self._lifespan('startup')
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._lifespan('shutdown')
+
+    async def _lifespan(self, phase):
+        sent = []
+
+        async def receive():
+            return {'type': f'lifespan.{phase}'}
+
+        async def send(message):
+            sent.append(message)
+            raise _LifespanDone
+
+        try:
+            await self.asgi({'type': 'lifespan', 'asgi': {'version': '3.0'}}, receive, send)
+        except _LifespanDone:
+            pass
+        assert sent[0]['type'] == f'lifespan.{phase}.complete', sent
+
+    async def request(self, method, path, json_body=None, headers=None, query=''):
+        body = json.dumps(json_body).encode() if json_body is not None else b''
+        header_list = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        if json_body is not None:
+            header_list.append((b'content-type', b'application/json'))
+        header_list.append((b'content-length', str(len(body)).encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'headers': header_list, 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        done = asyncio.Event()
+        response = {'body': b''}
+
+        async def receive():
+            if pending:
+                return pending.pop()
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {k.decode().lower(): v.decode() for k, v in message['headers']}
+            elif message['type'] == 'http.response.body':
+                response['body'] += message.get('body', b'')
+                if not message.get('more_body'):
+                    done.set()
+
+        await self.asgi(scope, receive, send)
+        await done.wait()
+        return response['status'], json.loads(response['body']) if response['body'] else None
+
+
+class _LifespanDone(Exception):
+    pass
+
+
+def _register_driver(client, email, verified=True):
+    user_id = client.post('/api/auth/register', json={'email': email, 'password': 'password'}).get_json()['user']['id']
+    with client.application.app_context():
+        db.session.get(User, user_id).is_driver = True
+        profile = DriverProfile(user_id=user_id, license_number=f'FAST{user_id}', is_verified=verified)
+        db.session.add(profile)
+        db.session.commit()
+        profile_id = profile.id
+    token = client.post('/api/auth/login', json={'email': email, 'password': 'password'}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}, profile_id
+
+
+def test_async_database_url():
+    assert str(async_database_url('sqlite:////tmp/cabgo.db')) == 'sqlite+aiosqlite:////tmp/cabgo.db'
+    try:
+        async_database_url('mysql://user@host/cabgo')
+    except ValueError as e:
+        assert 'ASYNC_DATABASE_URL' in str(e)
+    else:
+        raise AssertionError('expected ValueError')
+
+
+def test_fast_path_serves_driver_endpoints_like_flask(client, init_database):
+    """Toggles, pings and nearby lookups on the event loop answer as the Flask handlers do."""
+    headers, profile_id = _register_driver(client, 'fast-driver@example.com')
+    rider = client.post('/api/auth/register', json={'email': 'fast-rider@example.com', 'password': 'password'})
+    assert rider.status_code == 201
+    rider_token = client.post('/api/auth/login', json={'email': 'fast-rider@example.com', 'password': 'password'}).get_json()['token']
+    with client.application.app_context():
+        platform_counters.rebuild()
+
+    asgi = create_asgi_app(client.application)
+    recent_writers.clear()
+
+    async def scenario():
+        async with ASGIClient(asgi) as fast:
+            toggled = await fast.request('PATCH', '/api/drivers/availability', {
+                'availability_status': 'AVAILABLE', 'latitude': 40.0, 'longitude': -74.0}, headers)
+            assert toggled == (200, {'message': 'Driver availability updated successfully.',
+                                     'driver_id': toggled[1]['driver_id'], 'new_status': 'AVAILABLE'})
+            assert profile_id in driver_index
+
+            assert await fast.request('POST', '/api/drivers/location', {'latitude': 40.001, 'longitude': -74.0}, headers) == \
+                (202, {'message': 'Location accepted.', 'driver_id': toggled[1]['driver_id']})
+            assert location_buffer.get(profile_id)[:2] == (40.001, -74.0)
+
+            status, nearby = await fast.request('GET', '/api/drivers/nearby', query='lat=40.0&lon=-74.0&radius_km=2')
+            assert status == 200
+            assert [(d['driver_profile_id'], d['current_latitude']) for d in nearby['drivers']] == [(profile_id, 40.001)]
+
+            # Validation and auth failures carry the Flask handlers' messages
+            assert await fast.request('GET', '/api/drivers/nearby', query='lat=100&lon=0') == (400, {'message': 'lat/lon out of range'})
+            assert await fast.request('POST', '/api/drivers/location', {'latitude': 'x', 'longitude': 1}, headers) == \
+                (400, {'message': 'Latitude and longitude must be numeric.'})
+            assert await fast.request('PATCH', '/api/drivers/availability', {'availability_status': 'NAPPING'}, headers) == \
+                (400, {'message': "Invalid availability status. Must be one of: ['AVAILABLE', 'BUSY', 'OFFLINE']"})
+            assert await fast.request('PATCH', '/api/drivers/availability', {
+                'availability_status': 'AVAILABLE', 'latitude': 'abc', 'longitude': -74.0}, headers) == \
+                (400, {'message': 'Latitude and longitude must be numeric.'})
+            assert location_buffer.get(profile_id)[:2] == (40.001, -74.0)
+            assert await fast.request('POST', '/api/drivers/location', {'latitude': 1, 'longitude': 1}) == \
+                (401, {'message': 'Token is missing!'})
+            assert await fast.request('POST', '/api/drivers/location', {'latitude': 1, 'longitude': 1},
+                                      {'Authorization': f'Bearer {rider_token}'}) == \
+                (404, {'message': 'Driver profile not found for this user.'})
+
+            # Everything else is served by the Flask app through the thread pool
+            status, available = await fast.request('GET', '/api/drivers/available')
+            assert status == 200 and [d['driver_profile_id'] for d in available['drivers']] == [profile_id]
+
+            offline = await fast.request('PATCH', '/api/drivers/availability', {'availability_status': 'OFFLINE'}, headers)
+            assert offline[1]['new_status'] == 'OFFLINE'
+            assert profile_id not in driver_index
+            # The driver's next Flask reads stay on the primary
+            assert recent_writers.wrote_recently(offline[1]['driver_id'])
+
+    asyncio.run(scenario())
+
+    with client.application.app_context():
+        db.session.expire_all()
+        profile = db.session.get(DriverProfile, profile_id)
+        # The OFFLINE commit took the buffered ping with it
+        assert (profile.availability_status, profile.current_latitude) == ('OFFLINE', 40.001)
+        # The async session's flushes moved the availability counters like the Flask ones do
+        assert {k: v for k, v in platform_counters.read().items() if v} == count_by_group()
+
+    # The Flask handlers give the same answers
+    response = client.patch('/api/drivers/availability', json={'availability_status': 'NAPPING'}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == "Invalid availability status. Must be one of: ['AVAILABLE', 'BUSY', 'OFFLINE']"
+
+
+def test_fast_path_can_be_disabled(client, init_database):
+    headers, profile_id = _register_driver(client, 'slow-driver@example.com')
+    client.application.config['ASYNC_FAST_PATH_ENABLED'] = False
+    try:
+        asgi = create_asgi_app(client.application)
+    finally:
+        client.application.config['ASYNC_FAST_PATH_ENABLED'] = True
+
+    async def scenario():
+        async with ASGIClient(asgi) as slow:
+            return await slow.request('POST', '/api/drivers/location', {'latitude': 1, 'longitude': 1}, headers)
+
+    assert asyncio.run(scenario())[0] == 202
+    assert asgi.fast_path.engine is None  # Served by the Flask handler
+    assert location_buffer.get(profile_id)[:2] == (1, 1)
+    location_buffer.clear()  # Nothing left to flush at exit, after the tables are dropped
@@ -0,0 +1,32 @@
+import random
+from app.geo_index import SpatialGridIndex
+from app.utils import calculate_distance
+
+def test_nearest_matches_brute_force():
+    """Grid lookups must return exactly what a full haversine scan would."""
+    rng = random.Random(7)
+    index = SpatialGridIndex(cell_size_deg=0.01)
+    points = {}
+    for key in range(2000):
+        lat, lon = 28.6 + rng.uniform(-0.3, 0.3), 77.2 + rng.uniform(-0.3, 0.3)
+        index.upsert(key, lat, lon)
+        points[key] = (lat, lon)
+
+    for _ in range(20):
+        q_lat, q_lon = 28.6 + rng.uniform(-0.3, 0.3), 77.2 + rng.uniform(-0.3, 0.3)
+        expected = sorted(
+            (calculate_distance(q_lat, q_lon, lat, lon), key) for key, (lat, lon) in points.items()
+        )
+        expected = [key for distance, key in expected if distance <= 3][:5]
+        result = [key for _, key, _, _, _ in index.nearest(q_lat, q_lon, radius_km=3, k=5)]
+        assert result == expected
+
+def test_upsert_moves_point_between_cells():
+    index = SpatialGridIndex(cell_size_deg=0.01)
+    index.upsert('a', 10.0, 10.0)
+    index.upsert('a', 10.5, 10.5)
+    assert len(index) == 1
+    assert index.nearest(10.0, 10.0, radius_km=1) == []
+    assert index.nearest(10.5, 10.5, radius_km=1)[0][1] == 'a'
+    index.remove('a')
+    assert len(index) == 0 and index.cell_counts() == {}
@@ -0,0 +1,45 @@
+import pytest
+
+from app.hashing import PasswordHasher, PasswordHashingBusy
+
+
+def test_pool_hashes_and_verifies_out_of_process():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1, max_pending=1)
+    try:
+        password_hash = hasher.hash('secret')
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(password_hash, 'secret')
+        assert not hasher.verify(password_hash, 'wrong')
+        # Not forked from a web worker that already runs threads
+        assert hasher._get_executor()[0]._mp_context.get_start_method() in ('forkserver', 'spawn')
+    finally:
+        hasher.shutdown()
+
+
+def test_saturated_pool_sheds_instead_of_queueing():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1, max_pending=0)
+    try:
+        hasher.hash('warm-up')  # Start the worker process
+        _, slots = hasher._get_executor()
+        assert slots.acquire(blocking=False)  # Occupy the only slot, as an in-flight hash would
+        try:
+            with pytest.raises(PasswordHashingBusy):
+                hasher.verify('pbkdf2:sha256:1000$salt$hash', 'secret')
+        finally:
+            slots.release()
+        assert hasher.hash('secret')
+    finally:
+        hasher.shutdown()
+
+
+def test_login_returns_503_when_hashing_is_saturated(app, client, new_user_data, init_database, monkeypatch):
+    from app.hashing import password_hasher
+
+    client.post('/api/auth/register', json=new_user_data)
+
+    def busy(*args):
+        raise PasswordHashingBusy()
+    monkeypatch.setattr(password_hasher, '_run', busy)
+    response = client.post('/api/auth/login', json={'email': new_user_data['email'], 'password': new_user_data['password']})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,57 @@
+import os
+import re
+import subprocess
+import sys
+
+from app.metrics import metrics
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+def _sample(text, name, **labels):
+    """Value of the series `name` whose labels include `labels`, or None."""
+    for line in text.splitlines():
+        match = re.match(rf'^{re.escape(name)}(?:\{{(.*)\}})? (\S+)$', line)
+        if match:
+            found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(1) or ''))
+            if all(found.get(key) == str(value) for key, value in labels.items()):
+                return float(match.group(2))
+    return None
+
+def test_metrics_exposes_request_latency_and_index_sizes(client, admin_auth_headers):
+    for user_id in (1, 2, 999999):
+        client.get(f'/api/admin/users/{user_id}', headers=admin_auth_headers)
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    endpoint = '/api/admin/users/<int:user_id>'
+    assert _sample(text, 'cabgo_http_requests_total', endpoint=endpoint, status=404) >= 1
+    assert _sample(text, 'cabgo_http_request_duration_seconds_count', endpoint=endpoint) == 3
+    assert _sample(text, 'cabgo_http_request_duration_seconds_bucket', endpoint=endpoint, le='+Inf') == 3
+    assert _sample(text, 'cabgo_http_requests_in_flight') == 1  # The scrape itself
+    assert _sample(text, 'cabgo_db_pool_checkouts_total', engine='primary') >= 1
+    assert _sample(text, 'cabgo_index_entries', index='driver_locations') == 0
+    assert '# TYPE cabgo_http_request_duration_seconds histogram' in text
+
+def test_metrics_merge_worker_processes(client, init_database, tmp_path, monkeypatch):
+    """An exited worker's counters are summed into the scrape; its gauges are dropped."""
+    worker = (
+        "from app import create_app\n"
+        "from config import TestingConfig\n"
+        "client = create_app(config_class=TestingConfig).test_client()\n"
+        "for _ in range(3):\n"
+        "    client.get('/health')\n"
+    )
+    env = dict(os.environ, METRICS_MULTIPROC_DIR=str(tmp_path))
+    subprocess.run([sys.executable, '-c', worker], cwd=BACKEND_DIR, env=env, check=True, timeout=60)
+    assert len(list(tmp_path.glob('*.json'))) == 1  # Written at exit
+
+    monkeypatch.setattr(metrics, 'multiproc_dir', str(tmp_path))
+    client.get('/health')
+    text = client.get('/metrics').get_data(as_text=True)
+
+    assert _sample(text, 'cabgo_http_requests_total', endpoint='/health', status=200) == 4
+    assert _sample(text, 'cabgo_http_request_duration_seconds_count', endpoint='/health') == 4
+    assert _sample(text, 'cabgo_index_entries', index='user_cache', pid=os.getpid()) is not None
+    assert len([line for line in text.splitlines() if line.startswith('cabgo_index_entries{index="user_cache"')]) == 1
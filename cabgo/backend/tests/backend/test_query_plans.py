@@ -0,0 +1,75 @@
+"""EXPLAIN QUERY PLAN regression tests: hot queries must be served from indexes, never full table scans."""
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.admin import build_admin_rides_query
+from app.dispatch import dispatch_engine
+from app.geo_index import driver_index
+from app.location_cache import location_interner
+from app.rides import build_ride_history_query
+from app.rollups import query_timeseries, ride_rollups
+from app.speed_profiles import speed_profiles
+from app.surge import surge_engine
+from app.user_cache import user_cache
+
+CURSOR = (datetime.datetime(2026, 1, 1), 100)
+
+# Queries that page in index order; a temp B-tree sort there means the whole match set is read per page
+KEYSET_ORDERED = {
+    'ride history', 'ride history, next page', 'admin rides', 'admin rides by status',
+    'admin rides by status, next page', 'admin rides by driver', 'speed profile update', 'speed profile update, past watermark',
+    'rollup update',
+}
+
+HOT_QUERIES = {
+    'ride history': lambda: build_ride_history_query(1).limit(21).all(),
+    'ride history, next page': lambda: build_ride_history_query(1, CURSOR).limit(21).all(),
+    'admin rides': lambda: build_admin_rides_query().limit(101).all(),
+    'admin rides by status': lambda: build_admin_rides_query(status='REQUESTED').limit(101).all(),
+    'admin rides by status, next page': lambda: build_admin_rides_query(status='COMPLETED', cursor=CURSOR).limit(101).all(),
+    'admin rides by driver': lambda: build_admin_rides_query(driver_id=1).limit(101).all(),
+    'admin rides by date': lambda: build_admin_rides_query(date_from=CURSOR[0], date_to=CURSOR[0]).limit(101).all(),
+    'pending rides for dispatch': lambda: dispatch_engine._pending_rides(500),
+    'available drivers load': lambda: (driver_index.reset(), driver_index.ensure_loaded()),
+    'available drivers resync': lambda: (driver_index.ensure_loaded(), setattr(driver_index, '_watermark', CURSOR[0]),
+                                         driver_index.resync()),
+    'open demand by zone': lambda: surge_engine.load_demand(),
+    'speed profile update': lambda: speed_profiles.update_from_rides(),
+    'speed profile update, past watermark': lambda: (setattr(speed_profiles, 'watermark', CURSOR),
+                                                     speed_profiles.update_from_rides()),
+    'rollup update': lambda: ride_rollups.update(),
+    'rollup timeseries': lambda: query_timeseries(CURSOR[0], CURSOR[0] + datetime.timedelta(days=30)),
+    'authenticated user': lambda: db.session.execute(user_cache.load_statement(1)).first(),
+    'location lookup': lambda: location_interner._select_id(db.session, (12.97, 77.59)),
+}
+
+
+def _captured_selects(run):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return statements
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_query_uses_indexes(app, init_database, name):
+    statements = _captured_selects(HOT_QUERIES[name])
+    assert statements, f"{name} ran no SELECT"
+    for statement, parameters in statements:
+        plan = [row[-1] for row in db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        full_scans = [step for step in plan if step.startswith('SCAN') and 'USING' not in step]
+        assert not full_scans, f"{name} falls back to a full table scan:\n{statement}\nplan: {plan}"
+        if name in KEYSET_ORDERED:
+            assert not any('TEMP B-TREE FOR ORDER BY' in step for step in plan), \
+                f"{name} sorts instead of reading an index in order:\n{statement}\nplan: {plan}"
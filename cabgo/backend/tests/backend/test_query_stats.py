@@ -0,0 +1,58 @@
+import logging
+
+from app import db
+from app.models import User, DriverProfile
+from app.query_stats import query_stats, statement_shape
+
+RIDE = {'pickup_location': {'latitude': 12.9716, 'longitude': 77.5946, 'address_line1': 'MG Road'},
+        'dropoff_location': {'latitude': 12.9352, 'longitude': 77.6245}}
+
+def _add_available_drivers(count):
+    for i in range(count):
+        user = User(email=f'driver{i}@example.com', password_hash='x', full_name=f'Driver {i}', is_driver=True)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(DriverProfile(user_id=user.id, license_number=f'LIC{i}', is_verified=True,
+                                     availability_status='AVAILABLE', current_latitude=12.97, current_longitude=77.59))
+    db.session.commit()
+
+def test_statement_shape_collapses_literals_and_in_lists():
+    assert statement_shape("SELECT *\n  FROM users WHERE id IN (?, ?, ?) AND email = 'a@b.c' LIMIT 10") == \
+        statement_shape("SELECT * FROM users WHERE id IN (?, ?) AND email = 'x@y.z' LIMIT 20") == \
+        "SELECT * FROM users WHERE id IN (?...) AND email = ? LIMIT ?"
+
+def test_debug_responses_carry_query_headers(client, admin_auth_headers):
+    response = client.get('/api/admin/users', headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Query-Count']) >= 1
+    assert float(response.headers['X-DB-Time-Ms']) >= 0
+    assert response.headers['X-DB-Repeated-Queries'] == '0'
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+
+def test_repeated_statements_are_logged_as_n_plus_one(client, init_database, caplog):
+    _add_available_drivers(query_stats.n_plus_one_threshold)
+    app = client.application
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        with app.test_request_context('/n-plus-one'):
+            app.preprocess_request()
+            for user_id in [u.id for u in User.query.all()]:
+                db.session.expunge_all()
+                db.session.get(User, user_id) # One SELECT per user, the classic N+1
+            app.process_response(app.response_class())
+    assert any('Possible N+1 in GET /n-plus-one' in record.getMessage() for record in caplog.records)
+
+def test_hot_endpoints_stay_within_query_budget(client, admin_auth_headers, query_budget):
+    for _ in range(8):
+        client.post('/api/rides/book-ride', json=RIDE, headers=admin_auth_headers)
+    _add_available_drivers(8)
+    db.session.expunge_all()
+
+    with query_budget(2):
+        assert client.get('/api/rides/history', headers=admin_auth_headers).status_code == 200
+    with query_budget(2):
+        assert client.get('/api/admin/rides', headers=admin_auth_headers).status_code == 200
+    with query_budget(2):
+        assert client.get('/api/admin/users', headers=admin_auth_headers).status_code == 200
+    with query_budget(2):
+        response = client.get('/api/drivers/available')
+        assert len(response.get_json()['drivers']) == 8
@@ -0,0 +1,47 @@
+from app.models import Location, Ride
+
+PICKUP = {'latitude': 12.971601, 'longitude': 77.594602, 'address_line1': 'MG Road'}
+DROPOFF = {'latitude': 12.935200, 'longitude': 77.624500}
+
+def _book(client, headers, pickup=PICKUP, dropoff=DROPOFF):
+    return client.post('/api/rides/book-ride', headers=headers,
+                       json={'pickup_location': pickup, 'dropoff_location': dropoff})
+
+def test_repeat_bookings_reuse_locations(client, admin_auth_headers):
+    """Bookings at the same snapped points share Location rows."""
+    first = _book(client, admin_auth_headers).get_json()['ride']
+    # Differs only past the 5th decimal, so it snaps to the same pickup
+    nearby = dict(PICKUP, latitude=12.9716012)
+    second = _book(client, admin_auth_headers, pickup=nearby).get_json()['ride']
+
+    assert first['pickup_location']['id'] == second['pickup_location']['id']
+    assert first['dropoff_location']['id'] == second['dropoff_location']['id']
+    assert first['pickup_location']['latitude'] == 12.9716
+    with client.application.app_context():
+        assert Location.query.count() == 2
+        assert Ride.query.count() == 2
+
+def test_book_ride_rejects_non_numeric_coordinates(client, admin_auth_headers):
+    response = _book(client, admin_auth_headers, pickup={'latitude': 'here', 'longitude': 77.5})
+    assert response.status_code == 400
+
+def test_history_is_keyset_paginated(client, admin_auth_headers):
+    booked = [_book(client, admin_auth_headers).get_json()['ride']['id'] for _ in range(5)]
+
+    seen = []
+    url = '/api/rides/history?limit=2'
+    while url:
+        response = client.get(url, headers=admin_auth_headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['rides']) <= 2
+        seen.extend(ride['id'] for ride in page['rides'])
+        url = f"/api/rides/history?limit=2&before={page['next_cursor']}" if page['next_cursor'] else None
+
+    assert seen == sorted(booked, reverse=True)
+    ride = client.get('/api/rides/history?limit=1', headers=admin_auth_headers).get_json()['rides'][0]
+    assert ride['pickup_location'] == {'latitude': 12.9716, 'longitude': 77.5946, 'address': 'MG Road'}
+
+def test_history_rejects_bad_paging_params(client, admin_auth_headers):
+    assert client.get('/api/rides/history?limit=0', headers=admin_auth_headers).status_code == 400
+    assert client.get('/api/rides/history?before=garbage', headers=admin_auth_headers).status_code == 400
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from app.routing import RoadGraph, EtaEngine
+from app.utils import calculate_distance, predict_eta
+
+def _write_grid(tmp_path, size=6, spacing_deg=0.01):
+    """A size x size street grid; the middle row is a 60 km/h arterial, the rest 20 km/h."""
+    nodes = ['node_id,lat,lon']
+    edges = ['source,target,length_m,speed_kmh,oneway']
+    for r in range(size):
+        for c in range(size):
+            nodes.append(f'{r}-{c},{12.9 + r * spacing_deg},{77.5 + c * spacing_deg}')
+            if c + 1 < size:
+                length = calculate_distance(0, 0, 0, spacing_deg) * 1000
+                edges.append(f'{r}-{c},{r}-{c + 1},{length},{60 if r == size // 2 else 20},0')
+            if r + 1 < size:
+                length = calculate_distance(0, 0, spacing_deg, 0) * 1000
+                edges.append(f'{r}-{c},{r + 1}-{c},{length},20,0')
+    (tmp_path / 'nodes.csv').write_text('\n'.join(nodes))
+    (tmp_path / 'edges.csv').write_text('\n'.join(edges))
+    return tmp_path
+
+def _dijkstra(graph, source):
+    import heapq
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        for e in range(graph.indptr[node], graph.indptr[node + 1]):
+            n, nd = int(graph.indices[e]), d + float(graph.travel_s[e])
+            if nd < dist.get(n, float('inf')):
+                dist[n] = nd
+                heapq.heappush(heap, (nd, n))
+    return dist
+
+def test_hierarchy_astar_and_one_to_many_match_dijkstra(tmp_path):
+    graph = RoadGraph.load(str(_write_grid(tmp_path)))
+    assert len(graph) == 36
+    assert graph.hierarchy is not None
+    for source in (0, 14, 35):
+        reference = _dijkstra(graph, source)
+        for target in range(len(graph)):
+            assert graph.shortest_time(source, target) == pytest.approx(reference[target], rel=1e-6)
+            assert graph.astar_time(source, target) == pytest.approx(reference[target], rel=1e-6)
+
+    reference = _dijkstra(graph, 0)
+
+    # Grid edges are two-way, so times into node 0 equal times out of it
+    into_origin = graph.times_to(0, range(len(graph)))
+    for node, seconds in into_origin.items():
+        assert seconds == pytest.approx(reference[node], rel=1e-6)
+
+def test_graph_roundtrips_through_npz(tmp_path):
+    graph = RoadGraph.load(str(_write_grid(tmp_path)))
+    graph.save(str(tmp_path / 'graph.npz'))
+    loaded = RoadGraph.load(str(tmp_path / 'graph.npz'))
+    assert np.array_equal(loaded.indptr, graph.indptr)
+    assert np.array_equal(loaded.hierarchy.rank, graph.hierarchy.rank)
+    assert loaded.shortest_time(0, 35) == pytest.approx(graph.shortest_time(0, 35))
+
+def test_graph_without_hierarchy_falls_back_to_astar(tmp_path):
+    graph = RoadGraph.load(str(_write_grid(tmp_path)))
+    np.savez_compressed(str(tmp_path / 'old.npz'), lat=graph.lat, lon=graph.lon, indptr=graph.indptr,
+                        indices=graph.indices, travel_s=graph.travel_s)
+    loaded = RoadGraph.load(str(tmp_path / 'old.npz'))
+    assert loaded.hierarchy is None
+    assert loaded.shortest_time(0, 35) == pytest.approx(graph.shortest_time(0, 35), rel=1e-6)
+
+def test_hierarchy_on_one_way_and_disconnected_streets(tmp_path):
+    (tmp_path / 'nodes.csv').write_text('node_id,lat,lon\na,12.90,77.50\nb,12.90,77.51\nc,12.91,77.51\nd,13.5,78.0\ne,13.5,78.01')
+    (tmp_path / 'edges.csv').write_text('source,target,length_m,speed_kmh,oneway\n'
+                                        'a,b,1000,36,1\nb,c,1000,36,1\nc,a,1000,36,1\nd,e,1000,36,0')
+    graph = RoadGraph.load(str(tmp_path))
+    assert graph.shortest_time(0, 2) == pytest.approx(200)
+    assert graph.shortest_time(2, 0) == pytest.approx(100)
+    assert graph.shortest_time(0, 3) == float('inf')
+    assert graph.shortest_time(4, 3) == pytest.approx(100)
+
+def test_eta_engine_uses_graph_and_falls_back(tmp_path):
+    engine = EtaEngine()
+    far_from_roads = engine.travel_time_minutes(10.0, 70.0, 10.1, 70.1)
+    assert far_from_roads == pytest.approx(predict_eta(calculate_distance(10.0, 70.0, 10.1, 70.1)))
+
+    engine.load_graph(str(_write_grid(tmp_path)))
+    # Along the 60 km/h arterial the road ETA beats the 30 km/h straight-line guess
+    on_arterial = engine.travel_time_minutes(12.93, 77.5, 12.93, 77.55)
+    assert on_arterial < predict_eta(calculate_distance(12.93, 77.5, 12.93, 77.55))
+
+    origins = [(12.9, 77.5), (12.95, 77.55), (10.0, 70.0)]
+    batch = engine.travel_times_to(12.93, 77.52, origins)
+    for (lat, lon), minutes in zip(origins, batch):
+        assert minutes == pytest.approx(engine.travel_time_minutes(lat, lon, 12.93, 77.52))
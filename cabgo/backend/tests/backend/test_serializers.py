@@ -0,0 +1,64 @@
+import datetime
+import json
+
+from app import db, serializers
+from app.models import User, DriverProfile
+from app.serializers import Shape, dumps
+
+PAYLOAD = {
+    'at': datetime.datetime(2026, 3, 1, 8, 30, 15, 250000),
+    'on_the_hour': datetime.datetime(2026, 3, 1, 9, 0),
+    'day': datetime.date(2027, 1, 31),
+    'fare': 123.45, 'none': None, 'flags': [True, False], 'nested': {'name': 'Ünïcode'},
+}
+
+def test_dumps_matches_isoformat_with_and_without_orjson(monkeypatch):
+    expected = {
+        'at': '2026-03-01T08:30:15.250000', 'on_the_hour': '2026-03-01T09:00:00', 'day': '2027-01-31',
+        'fare': 123.45, 'none': None, 'flags': [True, False], 'nested': {'name': 'Ünïcode'},
+    }
+    assert json.loads(dumps(PAYLOAD)) == expected
+    monkeypatch.setattr(serializers, 'orjson', None)
+    assert json.loads(dumps(PAYLOAD)) == expected
+
+def test_shape_nests_and_drops_absent_objects():
+    shape = Shape({
+        'id': User.id,
+        'profile': Shape({'id': DriverProfile.id}, present_if=DriverProfile.id, omit_when_absent=True),
+        'owner': Shape({'id': User.email}, present_if=User.email),
+    })
+    assert len(shape.columns) == 5
+    assert shape.dump((1, 7, 7, 'a@b.c', 'a@b.c')) == {'id': 1, 'profile': {'id': 7}, 'owner': {'id': 'a@b.c'}}
+    assert shape.dump((2, None, None, None, None)) == {'id': 2, 'owner': None}
+
+def test_admin_user_listing_shapes_drivers_and_passengers(client, admin_auth_headers, new_user_data):
+    client.post('/api/auth/register', json=new_user_data)
+    with client.application.app_context():
+        driver = User.query.filter_by(email=new_user_data['email']).first()
+        driver.is_driver = True
+        db.session.add(DriverProfile(user_id=driver.id, license_number='SER-1', is_verified=True,
+                                     license_expiry_date=datetime.date(2030, 5, 1)))
+        db.session.commit()
+        driver_id = driver.id
+
+    users = {user['email']: user for user in client.get('/api/admin/users', headers=admin_auth_headers).get_json()['users']}
+    assert 'driver_profile' not in users['admin@example.com']
+    assert users[new_user_data['email']]['driver_profile']['license_number'] == 'SER-1'
+    assert users[new_user_data['email']]['created_at'].startswith(str(datetime.date.today().year))
+
+    detail = client.get(f'/api/admin/users/{driver_id}', headers=admin_auth_headers).get_json()['user']
+    assert detail['driver_profile']['license_expiry_date'] == '2030-05-01'
+    assert detail['vehicles'] == []
+
+def test_admin_ride_detail_shape(client, admin_auth_headers):
+    ride = client.post('/api/rides/book-ride', headers=admin_auth_headers, json={
+        'pickup_location': {'latitude': 12.9716, 'longitude': 77.5946, 'address_line1': 'MG Road', 'city': 'Bengaluru'},
+        'dropoff_location': {'latitude': 12.9352, 'longitude': 77.6245},
+    }).get_json()['ride']
+
+    detail = client.get(f"/api/admin/rides/{ride['id']}", headers=admin_auth_headers).get_json()['ride']
+    assert detail['driver'] is None
+    assert detail['passenger']['email'] == 'admin@example.com'
+    assert detail['pickup_location'] == {'id': ride['pickup_location']['id'], 'latitude': 12.9716, 'longitude': 77.5946,
+                                         'address_line1': 'MG Road', 'city': 'Bengaluru', 'postal_code': None}
+    assert detail['requested_at'] == ride['requested_at']
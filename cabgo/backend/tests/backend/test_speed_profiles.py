@@ -0,0 +1,71 @@
+import datetime
+import pytest
+from app import db
+from app.models import User, Ride, Location
+from app.speed_profiles import speed_profiles, SpeedProfileTable
+from app.utils import calculate_distance, predict_eta
+
+MONDAY_8AM = datetime.datetime(2025, 6, 2, 8, 0)
+
+def _completed_ride(passenger_id, minutes, started_at=MONDAY_8AM):
+    pickup = Location.query.filter_by(latitude=12.97, longitude=77.59).first() or Location(latitude=12.97, longitude=77.59)
+    dropoff = Location.query.filter_by(latitude=13.01, longitude=77.59).first() or Location(latitude=13.01, longitude=77.59)
+    db.session.add_all([pickup, dropoff])
+    db.session.flush()
+    ride = Ride(passenger_id=passenger_id, pickup_location_id=pickup.id, dropoff_location_id=dropoff.id,
+                status='COMPLETED', started_at=started_at, completed_at=started_at + datetime.timedelta(minutes=minutes))
+    db.session.add(ride)
+    return ride
+
+def test_speeds_are_learned_incrementally(app, init_database, tmp_path):
+    passenger = User(email='p@example.com', password_hash='x')
+    db.session.add(passenger)
+    db.session.flush()
+    for _ in range(5):
+        _completed_ride(passenger.id, minutes=20)
+    db.session.commit()
+
+    distance = calculate_distance(12.97, 77.59, 13.01, 77.59)
+    assert speed_profiles.update_from_rides() == 5
+    assert speed_profiles.lookup(12.97, 77.59, MONDAY_8AM) == pytest.approx(distance * 3, rel=1e-5)
+    assert speed_profiles.lookup(12.97, 77.59, MONDAY_8AM + datetime.timedelta(hours=1)) is None
+    assert predict_eta(distance, latitude=12.97, longitude=77.59, when=MONDAY_8AM) == pytest.approx(20, rel=1e-5)
+    assert predict_eta(distance) == pytest.approx(distance * 2) # No location: constant 30 km/h
+
+    # Only rides past the watermark are scanned on the next run
+    assert speed_profiles.update_from_rides() == 0
+    for _ in range(5):
+        _completed_ride(passenger.id, minutes=40, started_at=MONDAY_8AM + datetime.timedelta(days=1))
+    db.session.commit()
+    assert speed_profiles.update_from_rides() == 5
+    assert speed_profiles.lookup(12.97, 77.59, MONDAY_8AM) == pytest.approx(distance * 3, rel=1e-5)
+
+    path = str(tmp_path / 'speeds.npz')
+    speed_profiles.save(path)
+    restored = SpeedProfileTable()
+    restored.load(path)
+    assert restored.watermark == speed_profiles.watermark
+    assert restored.lookup(12.97, 77.59, MONDAY_8AM + datetime.timedelta(days=1)) == pytest.approx(distance * 1.5, rel=1e-5)
+
+def test_reload_picks_up_file_written_by_updater(app, init_database, tmp_path):
+    passenger = User(email='p@example.com', password_hash='x')
+    db.session.add(passenger)
+    db.session.flush()
+    for _ in range(5):
+        _completed_ride(passenger.id, minutes=20)
+    db.session.commit()
+
+    path = str(tmp_path / 'speeds.npz')
+    worker = SpeedProfileTable()
+    worker.path = path
+    assert not worker.reload_if_changed() # Nothing written yet
+
+    updater = SpeedProfileTable()
+    updater.path = path
+    assert updater.update_from_rides() == 5
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['speeds.npz'] # Temp file renamed into place
+
+    assert worker.reload_if_changed()
+    assert worker.watermark == updater.watermark
+    assert worker.lookup(12.97, 77.59, MONDAY_8AM) == pytest.approx(updater.lookup(12.97, 77.59, MONDAY_8AM))
+    assert not worker.reload_if_changed() # Unchanged file is not read again
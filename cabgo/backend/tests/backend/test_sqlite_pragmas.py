@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, text
+
+from app.sqlite_pragmas import apply_pragmas
+from config import SQLITE_TUNED_PRAGMAS, engine_options_for
+
+
+def test_tuned_pragmas_apply_to_every_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}", **engine_options_for('sqlite://', pool_size=2, max_overflow=0))
+    apply_pragmas(engine, SQLITE_TUNED_PRAGMAS)
+    try:
+        for _ in range(2):
+            with engine.connect() as connection:
+                pragma = lambda name: connection.execute(text(f"PRAGMA {name}")).scalar()
+                assert pragma('journal_mode') == 'wal'
+                assert pragma('synchronous') == 1  # NORMAL
+                assert pragma('busy_timeout') == 5000
+                assert pragma('cache_size') == -65536
+                assert pragma('temp_store') == 2  # MEMORY
+    finally:
+        engine.dispose()
+
+
+def test_server_databases_get_pool_health_checks():
+    assert engine_options_for('postgresql://db/cabgo', pool_size=5) == {
+        'pool_size': 5, 'max_overflow': 20, 'pool_pre_ping': True, 'pool_recycle': 1800
+    }
+    assert 'pool_pre_ping' not in engine_options_for('sqlite:///app.db')
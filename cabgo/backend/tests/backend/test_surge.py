@@ -0,0 +1,49 @@
+from app.surge import surge_engine
+
+PICKUP = {'latitude': 12.9716, 'longitude': 77.5946}
+DROPOFF = {'latitude': 12.9352, 'longitude': 77.6245}
+
+def _book(client, headers):
+    return client.post('/api/rides/book-ride', headers=headers,
+                       json={'pickup_location': PICKUP, 'dropoff_location': DROPOFF})
+
+def test_booking_uses_cached_zone_multiplier(client, admin_auth_headers):
+    """Bookings count towards demand, but the multiplier only changes on recompute."""
+    first = _book(client, admin_auth_headers).get_json()['ride']
+    assert first['surge_multiplier'] == 1.0
+
+    for _ in range(4):
+        _book(client, admin_auth_headers)
+    assert _book(client, admin_auth_headers).get_json()['ride']['surge_multiplier'] == 1.0
+
+    surge_engine.recompute()  # 6 open requests, no drivers in the zone
+    surged = _book(client, admin_auth_headers).get_json()['ride']
+    assert surged['surge_multiplier'] == 3.0
+    assert surged['estimated_fare'] == first['estimated_fare'] * 3.0
+
+def test_cancelled_rides_leave_demand(client, admin_auth_headers):
+    ride_ids = [_book(client, admin_auth_headers).get_json()['ride']['id'] for _ in range(4)]
+    surge_engine.recompute()
+    assert surge_engine.multiplier_at(PICKUP['latitude'], PICKUP['longitude']) == 2.5
+
+    for ride_id in ride_ids[:3]:
+        client.post(f'/api/rides/{ride_id}/cancel', headers=admin_auth_headers)
+        client.post(f'/api/rides/{ride_id}/cancel', headers=admin_auth_headers) # Repeat is a no-op
+    surge_engine.recompute()
+    assert surge_engine.multiplier_at(PICKUP['latitude'], PICKUP['longitude']) == 1.0
+
+def test_demand_follows_rides_changed_elsewhere(client, admin_auth_headers, init_database):
+    """Rides moved out of REQUESTED by another process leave demand at the next recompute."""
+    from sqlalchemy import update
+    from app import db
+    from app.models import Ride
+
+    ride_ids = [_book(client, admin_auth_headers).get_json()['ride']['id'] for _ in range(4)]
+    surge_engine.recompute()
+    assert surge_engine.multiplier_at(PICKUP['latitude'], PICKUP['longitude']) == 2.5
+
+    with client.application.app_context():
+        db.session.execute(update(Ride).where(Ride.id.in_(ride_ids[:3])).values(status='ACCEPTED'))
+        db.session.commit()
+        surge_engine.recompute()
+    assert surge_engine.multiplier_at(PICKUP['latitude'], PICKUP['longitude']) == 1.0
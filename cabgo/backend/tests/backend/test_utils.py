@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from app.utils import (calculate_distance, calculate_distances, calculate_fare, calculate_fares,
+                       predict_eta, predict_etas, quote_rides)
+
+ORIGINS = [(12.9716, 77.5946), (28.6139, 77.2090), (19.0760, 72.8777)]
+DESTINATIONS = [(13.0827, 80.2707), (28.7041, 77.1025), (18.5204, 73.8567)]
+
+def test_batch_distances_match_scalar():
+    """Element-wise, one-to-many and many-to-many variants agree with the scalar Haversine."""
+    elementwise = calculate_distances(ORIGINS, DESTINATIONS)
+    for i, (o, d) in enumerate(zip(ORIGINS, DESTINATIONS)):
+        assert elementwise[i] == pytest.approx(calculate_distance(*o, *d), rel=1e-12)
+
+    one_to_many = calculate_distances(ORIGINS[0], DESTINATIONS)
+    assert one_to_many.shape == (3,)
+
+    matrix = calculate_distances(ORIGINS, DESTINATIONS, pairwise=True)
+    assert matrix.shape == (3, 3)
+    for i, o in enumerate(ORIGINS):
+        for j, d in enumerate(DESTINATIONS):
+            assert matrix[i, j] == pytest.approx(calculate_distance(*o, *d), rel=1e-12)
+
+def test_batch_fares_and_etas_match_scalar():
+    distances = np.array([0.0, 3.5, 12.0])
+    types = ['SEDAN', 'SUV', 'HATCHBACK']
+    surge = [1.0, 1.5, 2.0]
+    fares = calculate_fares(distances, vehicle_types=types, surge_multipliers=surge)
+    for i in range(3):
+        assert fares[i] == pytest.approx(calculate_fare(distances[i], vehicle_type=types[i], surge_multiplier=surge[i]))
+        assert predict_etas(distances)[i] == pytest.approx(predict_eta(distances[i]))
+    assert np.isinf(predict_etas([1.0], average_speed_kmh=0)[0])
+
+def test_quote_rides_pairwise_shapes():
+    quote = quote_rides(ORIGINS, DESTINATIONS[:2], pairwise=True)
+    assert quote['distance_km'].shape == quote['fare'].shape == quote['eta_minutes'].shape == (3, 2)